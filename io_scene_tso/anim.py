@@ -1,6 +1,8 @@
 """Read and write The Sims Online anim files."""
 
+import array
 import dataclasses
+import io
 import mathutils
 import pathlib
 import struct
@@ -10,7 +12,7 @@ import typing
 from . import utils
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class TimeProperty:
     """A time property."""
 
@@ -18,12 +20,15 @@ class TimeProperty:
     property_lists: list[utils.PropertyList]
 
 
+TIME_PROPERTY_MIN_SIZE = 8  # a time and an empty list of property lists
+
+
 def read_time_properties(file: typing.BinaryIO) -> list[TimeProperty]:
     """Read time properties from a file."""
-    count = struct.unpack('>I', file.read(4))[0]
+    count = utils.read_count(file, "Time properties", TIME_PROPERTY_MIN_SIZE)
     return [
         TimeProperty(
-            struct.unpack('>I', file.read(4))[0],
+            utils.unpack(file, '>I', "Time property")[0],
             utils.read_property_lists(file),
         )
         for _ in range(count)
@@ -38,16 +43,19 @@ def write_time_properties(file: typing.BinaryIO, time_properties: list[TimePrope
         utils.write_property_lists(file, time_property.property_lists)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class TimePropertyList:
     """A time property list."""
 
     time_properties: list[TimeProperty]
 
 
+TIME_PROPERTY_LIST_MIN_SIZE = 4  # an empty list of time properties
+
+
 def read_time_property_lists(file: typing.BinaryIO) -> list[TimePropertyList]:
     """Read time property lists from a file."""
-    count = struct.unpack('>I', file.read(4))[0]
+    count = utils.read_count(file, "Time property lists", TIME_PROPERTY_LIST_MIN_SIZE)
     return [
         TimePropertyList(
             read_time_properties(file),
@@ -63,7 +71,7 @@ def write_time_property_lists(file: typing.BinaryIO, time_property_lists: list[T
         write_time_properties(file, time_property_list.time_properties)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Motion:
     """An anim motion."""
 
@@ -78,22 +86,25 @@ class Motion:
     time_property_lists: list[TimePropertyList]
 
 
+MOTION_MIN_SIZE = 25  # a motion with an empty bone name and no property lists
+
+
 def read_motion(file: typing.BinaryIO) -> Motion:
     """Read an anim motion from a file."""
-    file.read(4)
+    utils.read_exact(file, 4, "Motion")
 
     bone_name = utils.read_string(file)
-    frame_count = struct.unpack('>I', file.read(4))[0]
-    duration = struct.unpack('<f', file.read(4))[0]
-    uses_positions = struct.unpack('<B', file.read(1))[0] != 0
-    uses_rotations = struct.unpack('<B', file.read(1))[0] != 0
-    position_offset = struct.unpack('>i', file.read(4))[0]
-    rotation_offset = struct.unpack('>i', file.read(4))[0]
-
-    has_property_lists = struct.unpack('<B', file.read(1))[0]
+    frame_count = utils.unpack(file, '>I', "Motion")[0]
+    duration = utils.unpack(file, '<f', "Motion")[0]
+    uses_positions = utils.unpack(file, '<B', "Motion")[0] != 0
+    uses_rotations = utils.unpack(file, '<B', "Motion")[0] != 0
+    position_offset = utils.unpack(file, '>i', "Motion")[0]
+    rotation_offset = utils.unpack(file, '>i', "Motion")[0]
+
+    has_property_lists = utils.unpack(file, '<B', "Motion")[0]
     property_lists = utils.read_property_lists(file) if has_property_lists else []
 
-    has_time_property_lists = struct.unpack('<B', file.read(1))[0]
+    has_time_property_lists = utils.unpack(file, '<B', "Motion")[0]
     time_property_lists = read_time_property_lists(file) if has_time_property_lists else []
 
     return Motion(
@@ -109,6 +120,33 @@ def read_motion(file: typing.BinaryIO) -> Motion:
     )
 
 
+def check_pool_run(motion: Motion, offset: int, pool: str, run_offset: int, pool_count: int) -> None:
+    """Check that the frames of a motion are within a translation or rotation pool."""
+    if run_offset < 0 or run_offset + motion.frame_count > pool_count:
+        message = (
+            f"Motion {motion.bone_name} at offset {offset} uses {pool} {run_offset} to "
+            f"{run_offset + motion.frame_count}, but the anim only has {pool_count} {pool}"
+        )
+        raise utils.FileReadError(message)
+
+
+def read_motions(file: typing.BinaryIO, translation_count: int, rotation_count: int) -> list[Motion]:
+    """Read the motions of an anim, checking that their frames are within the translation and rotation pools."""
+    motions_count = utils.read_count(file, "Motions", MOTION_MIN_SIZE)
+    motions = []
+
+    for _ in range(motions_count):
+        offset = file.tell()
+        motion = read_motion(file)
+        if motion.uses_positions:
+            check_pool_run(motion, offset, "translations", motion.position_offset, translation_count)
+        if motion.uses_rotations:
+            check_pool_run(motion, offset, "rotations", motion.rotation_offset, rotation_count)
+        motions.append(motion)
+
+    return motions
+
+
 def write_motion(file: typing.BinaryIO, motion: Motion) -> None:
     """Write a motion to a file."""
     file.write(struct.pack('>I', 1))
@@ -129,17 +167,100 @@ def write_motion(file: typing.BinaryIO, motion: Motion) -> None:
         write_time_property_lists(file, motion.time_property_lists)
 
 
+def pack_translation(translation: mathutils.Vector) -> bytes:
+    """Pack a translation as it is stored in a file."""
+    return struct.pack('<3f', *translation.xzy)
+
+
 def write_translation(file: typing.BinaryIO, translation: mathutils.Vector) -> None:
     """Write a translation to a file."""
-    file.write(struct.pack('<3f', *translation.xzy))
+    file.write(pack_translation(translation))
+
+
+def pack_rotation(rotation: mathutils.Quaternion) -> bytes:
+    """Pack a rotation as it is stored in a file."""
+    return struct.pack('<4f', rotation.x, rotation.z, rotation.y, rotation.w)
 
 
 def write_rotation(file: typing.BinaryIO, rotation: mathutils.Quaternion) -> None:
     """Write a rotation to a file."""
-    file.write(struct.pack('<f', rotation.x))
-    file.write(struct.pack('<f', rotation.z))
-    file.write(struct.pack('<f', rotation.y))
-    file.write(struct.pack('<f', rotation.w))
+    file.write(pack_rotation(rotation))
+
+
+@dataclasses.dataclass
+class ArrayPool:
+    """A flat translation or rotation pool in file order, which shares identical frame runs between motions."""
+
+    width: int  # the number of floats per frame
+    values: array.array = dataclasses.field(default_factory=lambda: array.array('f'))
+    offsets: dict[bytes, int] = dataclasses.field(default_factory=dict)
+
+    def add_run(self, run: bytes) -> int:
+        """Add the native floats of a motion, returning the offset of an identical earlier run if there is one."""
+        offset = self.offsets.get(run)
+        if offset is None:
+            offset = len(self.values) // self.width
+            self.values.frombytes(run)
+            self.offsets[run] = offset
+
+        return offset
+
+
+@dataclasses.dataclass
+class AnimHeader:
+    """Description of an anim file without the contents of its pools."""
+
+    name: str
+    duration: float
+    distance: float
+    moves: bool
+    translation_count: int
+    rotation_count: int
+    motions: list[Motion]
+
+
+def read_pool(file: typing.BinaryIO, section: str, width: int, *, read_values: bool) -> tuple[int, array.array]:
+    """Read the frame count and floats of a translation or rotation pool, or seek past the floats."""
+    count = utils.read_count(file, section, width * 4)
+    if not read_values:
+        file.seek(count * width * 4, io.SEEK_CUR)
+        return count, array.array('f')
+
+    return count, utils.read_float_array(file, count * width, section)
+
+
+def read_anim_sections(
+    file: typing.BinaryIO,
+    *,
+    read_pools: bool,
+) -> tuple[AnimHeader, array.array, array.array]:
+    """Read an anim from a file, with its pools in flat arrays, or empty arrays when seeking past the pools."""
+    version = utils.unpack(file, '>I', "Anim header")[0]
+    if version != 0x02:
+        message = f"Unsupported anim version {version}"
+        raise utils.FileReadError(message)
+
+    name = utils.read_string_16_bit_length_be(file)
+
+    duration = utils.unpack(file, '<f', "Anim header")[0]
+    distance = utils.unpack(file, '<f', "Anim header")[0]
+    moves = utils.unpack(file, '<b', "Anim header")[0] != 0
+
+    translation_count, translations = read_pool(file, "Translations", 3, read_values=read_pools)
+    rotation_count, rotations = read_pool(file, "Rotations", 4, read_values=read_pools)
+
+    motions = read_motions(file, translation_count, rotation_count)
+
+    header = AnimHeader(
+        name,
+        duration,
+        distance,
+        moves,
+        translation_count,
+        rotation_count,
+        motions,
+    )
+    return header, translations, rotations
 
 
 @dataclasses.dataclass
@@ -157,36 +278,68 @@ class Anim:
 
 def read_anim(file: typing.BinaryIO) -> Anim:
     """Read an anim from a file."""
-    version = struct.unpack('>I', file.read(4))[0]
-    if version != 0x02:
-        raise utils.FileReadError
+    return expand_anim(read_compact_anim(file))
 
-    name = utils.read_string_16_bit_length_be(file)
 
-    duration = struct.unpack('<f', file.read(4))[0]
-    distance = struct.unpack('<f', file.read(4))[0]
-    moves = struct.unpack('<b', file.read(1))[0] != 0
+@dataclasses.dataclass
+class CompactAnim:
+    """An anim with its translation and rotation pools stored in flat arrays."""
 
-    translation_count = struct.unpack('>I', file.read(4))[0]
-    translations = [struct.unpack('<3f', file.read(12)) for _ in range(translation_count)]
+    name: str
+    duration: float
+    distance: float
+    moves: bool
+    translations: array.array  # 3 per translation
+    rotations: array.array  # 4 per rotation
+    motions: list[Motion]
 
-    rotation_count = struct.unpack('>I', file.read(4))[0]
-    rotations = [struct.unpack('<4f', file.read(16)) for _ in range(rotation_count)]
 
-    motions_count = struct.unpack('>I', file.read(4))[0]
-    motions = [read_motion(file) for _ in range(motions_count)]
+def read_compact_anim(file: typing.BinaryIO) -> CompactAnim:
+    """Read an anim from a file, keeping its pools in flat arrays."""
+    header, translations, rotations = read_anim_sections(file, read_pools=True)
 
-    return Anim(
-        name,
-        duration,
-        distance,
-        moves,
+    return CompactAnim(
+        header.name,
+        header.duration,
+        header.distance,
+        header.moves,
         translations,
         rotations,
-        motions,
+        header.motions,
+    )
+
+
+def compact_anim(animation: Anim) -> CompactAnim:
+    """Convert an anim to one with its pools stored in flat arrays."""
+    return CompactAnim(
+        animation.name,
+        animation.duration,
+        animation.distance,
+        animation.moves,
+        array.array('f', [value for translation in animation.translations for value in translation]),
+        array.array('f', [value for rotation in animation.rotations for value in rotation]),
+        animation.motions,
     )
 
 
+def expand_anim(compact: CompactAnim) -> Anim:
+    """Convert an anim with its pools stored in flat arrays to an anim."""
+    return Anim(
+        compact.name,
+        compact.duration,
+        compact.distance,
+        compact.moves,
+        list(zip(*[iter(compact.translations)] * 3, strict=True)),
+        list(zip(*[iter(compact.rotations)] * 4, strict=True)),
+        compact.motions,
+    )
+
+
+def read_anim_header(file: typing.BinaryIO) -> AnimHeader:
+    """Read an anim from a file, seeking past its translation and rotation pools."""
+    return read_anim_sections(file, read_pools=False)[0]
+
+
 def write_anim(file: typing.BinaryIO, animation: Anim) -> None:
     """Write an anim to a file."""
     file.write(struct.pack('>I', 0x02))
@@ -210,14 +363,52 @@ def write_anim(file: typing.BinaryIO, animation: Anim) -> None:
         write_motion(file, motion)
 
 
-def read_file(file_path: pathlib.Path) -> Anim:
+def write_compact_anim(file: typing.BinaryIO, animation: CompactAnim) -> None:
+    """Write an anim with its pools stored in flat arrays to a file."""
+    file.write(struct.pack('>I', 0x02))
+
+    utils.write_string_16_bit_length_be(file, animation.name)
+
+    file.write(struct.pack('<f', animation.duration))
+    file.write(struct.pack('<f', animation.distance))
+    file.write(struct.pack('B', animation.moves))
+
+    file.write(struct.pack('>I', len(animation.translations) // 3))
+    utils.write_float_array(file, animation.translations)
+
+    file.write(struct.pack('>I', len(animation.rotations) // 4))
+    utils.write_float_array(file, animation.rotations)
+
+    file.write(struct.pack('>I', len(animation.motions)))
+    for motion in animation.motions:
+        write_motion(file, motion)
+
+
+def read_file(file_path: utils.FilePath) -> Anim:
     """Read an anim file."""
     try:
         with file_path.open(mode='rb') as file:
             anim = read_anim(file)
 
             if len(file.read(1)) != 0:
-                raise utils.FileReadError
+                message = f"Unexpected data after the end of the anim at offset {file.tell() - 1}"
+                raise utils.FileReadError(message)
+
+            return anim
+
+    except (OSError, struct.error) as exception:
+        raise utils.FileReadError from exception
+
+
+def read_compact_file(file_path: utils.FilePath) -> CompactAnim:
+    """Read an anim file, keeping its pools in flat arrays."""
+    try:
+        with file_path.open(mode='rb') as file:
+            anim = read_compact_anim(file)
+
+            if len(file.read(1)) != 0:
+                message = f"Unexpected data after the end of the anim at offset {file.tell() - 1}"
+                raise utils.FileReadError(message)
 
             return anim
 
@@ -225,7 +416,29 @@ def read_file(file_path: pathlib.Path) -> Anim:
         raise utils.FileReadError from exception
 
 
+def read_header_file(file_path: utils.FilePath) -> AnimHeader:
+    """Read the header of an anim file."""
+    try:
+        with file_path.open(mode='rb') as file:
+            header = read_anim_header(file)
+
+            if len(file.read(1)) != 0:
+                message = f"Unexpected data after the end of the anim at offset {file.tell() - 1}"
+                raise utils.FileReadError(message)
+
+            return header
+
+    except (OSError, struct.error) as exception:
+        raise utils.FileReadError from exception
+
+
 def write_file(file_path: pathlib.Path, animation: Anim) -> None:
     """Write an anim file."""
     with file_path.open('wb') as file:
         write_anim(file, animation)
+
+
+def write_compact_file(file_path: pathlib.Path, animation: CompactAnim) -> None:
+    """Write an anim file from an anim with its pools stored in flat arrays."""
+    with file_path.open('wb') as file:
+        write_compact_anim(file, animation)
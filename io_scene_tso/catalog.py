@@ -0,0 +1,227 @@
+"""Index the metadata of skel, mesh and anim files in a SQLite database so they can be found with queries.
+
+Every table has a path column, so a query like
+
+    SELECT DISTINCT path FROM motions WHERE bone_name = 'R_HAND'
+
+finds the anims that animate a bone, and
+
+    SELECT path FROM events WHERE name = 'sound'
+
+the anims that fire an event, and
+
+    SELECT path FROM meshes WHERE NOT EXISTS (
+        SELECT * FROM mesh_bones WHERE mesh_bones.path = meshes.path AND bone_name NOT IN (
+            SELECT bone_name FROM skel_bones JOIN skels USING (path) WHERE skels.name = 'adult'
+        )
+    )
+
+the meshes whose bones are all in a skel.
+"""
+
+import dataclasses
+import pathlib
+import sqlite3
+
+from . import anim
+from . import mesh
+from . import skel
+from . import utils
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS skels (
+    path TEXT PRIMARY KEY REFERENCES files(path) ON DELETE CASCADE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS skel_bones (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    bone_index INTEGER NOT NULL,
+    bone_name TEXT NOT NULL,
+    parent_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meshes (
+    path TEXT PRIMARY KEY REFERENCES files(path) ON DELETE CASCADE,
+    vertex_count INTEGER NOT NULL,
+    blended_vertex_count INTEGER NOT NULL,
+    face_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mesh_bones (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    bone_index INTEGER NOT NULL,
+    bone_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS anims (
+    path TEXT PRIMARY KEY REFERENCES files(path) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    duration REAL NOT NULL,
+    distance REAL NOT NULL,
+    moves INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS motions (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    bone_name TEXT NOT NULL,
+    frame_count INTEGER NOT NULL,
+    uses_positions INTEGER NOT NULL,
+    uses_rotations INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    bone_name TEXT NOT NULL,
+    time INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS skel_bones_name ON skel_bones(bone_name);
+CREATE INDEX IF NOT EXISTS mesh_bones_name ON mesh_bones(bone_name);
+CREATE INDEX IF NOT EXISTS anims_name ON anims(name);
+CREATE INDEX IF NOT EXISTS motions_bone_name ON motions(bone_name);
+CREATE INDEX IF NOT EXISTS events_name ON events(name);
+"""
+
+FILE_TYPES = {".skel": "skel", ".mesh": "mesh", ".anim": "anim"}
+
+
+@dataclasses.dataclass
+class IndexStats:
+    """The number of files indexed, skipped because they had not changed, removed and failed to be read."""
+
+    indexed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    failed: int = 0
+
+
+def connect(database_path: pathlib.Path) -> sqlite3.Connection:
+    """Open a catalog database, creating its tables if they do not exist."""
+    connection = sqlite3.connect(database_path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def index_skel(connection: sqlite3.Connection, path: str, file_path: pathlib.Path) -> None:
+    """Add the name and bones of a skel file to the catalog."""
+    skeleton = skel.read_file(file_path)
+
+    connection.execute("INSERT INTO skels VALUES (?, ?)", (path, skeleton.name))
+    connection.executemany(
+        "INSERT INTO skel_bones VALUES (?, ?, ?, ?)",
+        [(path, index, bone.name, bone.parent) for index, bone in enumerate(skeleton.bones)],
+    )
+
+
+def index_mesh(connection: sqlite3.Connection, path: str, file_path: pathlib.Path) -> None:
+    """Add the bones and vertex counts of a mesh file to the catalog."""
+    mesh_data = mesh.read_compact_file(file_path)
+
+    connection.execute(
+        "INSERT INTO meshes VALUES (?, ?, ?, ?)",
+        (path, len(mesh_data.positions) // 3, len(mesh_data.blend_positions) // 3, len(mesh_data.faces) // 3),
+    )
+    connection.executemany(
+        "INSERT INTO mesh_bones VALUES (?, ?, ?)",
+        [(path, index, bone_name) for index, bone_name in enumerate(mesh_data.bones)],
+    )
+
+
+def index_anim(connection: sqlite3.Connection, path: str, file_path: pathlib.Path) -> None:
+    """Add the header, motions and events of an anim file to the catalog, without reading its pools."""
+    header = anim.read_header_file(file_path)
+
+    connection.execute(
+        "INSERT INTO anims VALUES (?, ?, ?, ?, ?)",
+        (path, header.name, header.duration, header.distance, header.moves),
+    )
+    connection.executemany(
+        "INSERT INTO motions VALUES (?, ?, ?, ?, ?)",
+        [
+            (path, motion.bone_name, motion.frame_count, motion.uses_positions, motion.uses_rotations)
+            for motion in header.motions
+        ],
+    )
+    connection.executemany(
+        "INSERT INTO events VALUES (?, ?, ?, ?, ?)",
+        [
+            (path, motion.bone_name, time_property.time, prop.name, prop.value)
+            for motion in header.motions
+            for time_property_list in motion.time_property_lists
+            for time_property in time_property_list.time_properties
+            for property_list in time_property.property_lists
+            for prop in property_list.properties
+        ],
+    )
+
+
+INDEXERS = {"skel": index_skel, "mesh": index_mesh, "anim": index_anim}
+
+
+def index_directory(database_path: pathlib.Path, directory: pathlib.Path) -> IndexStats:
+    """Index the skel, mesh and anim files in a directory, only reading the ones that changed since last time."""
+    stats = IndexStats()
+    directory = directory.resolve()
+
+    with connect(database_path) as connection:
+        indexed_files = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in connection.execute("SELECT path, mtime_ns, size FROM files")
+            if pathlib.Path(path).is_relative_to(directory)
+        }
+        found_paths = set()
+
+        for file_path in sorted(directory.rglob("*")):
+            file_type = FILE_TYPES.get(file_path.suffix.lower())
+            if file_type is None or not file_path.is_file():
+                continue
+
+            path = str(file_path)
+            found_paths.add(path)
+
+            stat = file_path.stat()
+            if indexed_files.get(path) == (stat.st_mtime_ns, stat.st_size):
+                stats.unchanged += 1
+                continue
+
+            connection.execute("DELETE FROM files WHERE path = ?", (path,))
+            connection.execute(
+                "INSERT INTO files VALUES (?, ?, ?, ?, NULL)",
+                (path, file_type, stat.st_mtime_ns, stat.st_size),
+            )
+
+            try:
+                INDEXERS[file_type](connection, path, file_path)
+                stats.indexed += 1
+            except utils.FileReadError as exception:
+                # keep the file so it is not read again until it changes
+                connection.execute("UPDATE files SET error = ? WHERE path = ?", (utils.error_message(exception), path))
+                stats.failed += 1
+
+        for path in indexed_files.keys() - found_paths:
+            connection.execute("DELETE FROM files WHERE path = ?", (path,))
+            stats.removed += 1
+
+    connection.close()
+
+    return stats
+
+
+def query(database_path: pathlib.Path, sql: str, parameters: tuple[object, ...] = ()) -> list[sqlite3.Row]:
+    """Run a read only query on a catalog."""
+    connection = sqlite3.connect(f"{database_path.resolve().as_uri()}?mode=ro", uri=True)
+    connection.row_factory = sqlite3.Row
+    try:
+        return connection.execute(sql, parameters).fetchall()
+    finally:
+        connection.close()
+
+
+def query_paths(database_path: pathlib.Path, sql: str) -> list[pathlib.Path]:
+    """Run a read only query on a catalog whose first column is file paths, returning the distinct paths."""
+    return [pathlib.Path(path) for path in dict.fromkeys(row[0] for row in query(database_path, sql))]
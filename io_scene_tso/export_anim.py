@@ -1,168 +1,395 @@
 """Export The Sims Online anim files."""
 
 import bpy
-import itertools
-import mathutils
+import collections
+import concurrent.futures
+import dataclasses
+import numpy as np
 import pathlib
 
 from . import anim
+from . import resample
+from . import rest_pose
+from . import transforms
 from . import utils
 
 
-def export_anim(
-    output_directory: pathlib.Path,
+BONE_ROTATION_OFFSET_INVERTED_QUATERNION = np.array(utils.BONE_ROTATION_OFFSET_INVERTED.to_quaternion())
+
+
+@dataclasses.dataclass
+class BoneSamples:
+    """The sampled location and rotation channels of a bone."""
+
+    bone_name: str
+    locations: np.ndarray | None
+    rotations: np.ndarray | None
+
+
+def sample_action(
     armature_object: bpy.types.Object,
     action: bpy.types.Action,
-) -> None:
-    """Export an anim file."""
-    translations = []
-    rotations = []
-    motions = []
+) -> list[BoneSamples]:
+    """Sample the location and rotation fcurves of every animated bone at every frame."""
+    frames = range(int(action.frame_start), int(action.frame_end) + 1)
 
-    position_offset = 0
-    rotation_offset = 0
+    samples = []
 
     for bone in armature_object.pose.bones:
         location_data_path = bone.path_from_id("location")
         rotation_data_path = bone.path_from_id("rotation_quaternion")
 
-        uses_positions = False
-        uses_rotations = False
+        locations = None
+        rotations = None
 
         if action.fcurves.find(location_data_path):
-            uses_positions = True
+            fcurves = [action.fcurves.find(location_data_path, index=index) for index in range(3)]
+            locations = np.array(
+                [[fcurve.evaluate(frame) for fcurve in fcurves] for frame in frames],
+                dtype=np.float32,
+            ).reshape((-1, 3))
+
         if action.fcurves.find(rotation_data_path):
-            uses_rotations = True
+            fcurves = [action.fcurves.find(rotation_data_path, index=index) for index in range(4)]
+            rotations = np.array(
+                [[fcurve.evaluate(frame) for fcurve in fcurves] for frame in frames],
+                dtype=np.float32,
+            ).reshape((-1, 4))
 
-        if not uses_positions and not uses_rotations:
+        if locations is None and rotations is None:
             continue
 
-        bone_locations = []
-        bone_rotations = []
-
-        for frame in range(int(action.frame_start), int(action.frame_end) + 1):
-            if uses_positions:
-                bone_locations.append(
-                    mathutils.Vector(
-                        (
-                            action.fcurves.find(location_data_path, index=0).evaluate(frame),
-                            action.fcurves.find(location_data_path, index=1).evaluate(frame),
-                            action.fcurves.find(location_data_path, index=2).evaluate(frame),
-                        ),
-                    )
-                )
-
-            if uses_rotations:
-                bone_rotations.append(
-                    mathutils.Quaternion(
-                        (
-                            action.fcurves.find(rotation_data_path, index=0).evaluate(frame),
-                            action.fcurves.find(rotation_data_path, index=1).evaluate(frame),
-                            action.fcurves.find(rotation_data_path, index=2).evaluate(frame),
-                            action.fcurves.find(rotation_data_path, index=3).evaluate(frame),
-                        ),
-                    )
-                )
-
-        if all(location == mathutils.Vector() for location in bone_locations):
-            uses_positions = False
-
-        if all(rotation == mathutils.Quaternion() for rotation in bone_rotations):
-            uses_rotations = False
-
-        if not uses_positions and not uses_rotations:
-            continue
+        samples.append(BoneSamples(bone.name, locations, rotations))
 
-        parent_bone_matrix = mathutils.Matrix()
-        if bone.parent:
-            parent_bone_matrix = bone.parent.bone.matrix_local @ utils.BONE_ROTATION_OFFSET_INVERTED
+    return samples
 
-        for translation, rotation in itertools.zip_longest(bone_locations, bone_rotations):
-            translation_matrix = mathutils.Matrix()
-            if translation:
-                translation_matrix = mathutils.Matrix.Translation(translation)
 
-            rotation_matrix = mathutils.Matrix()
-            if rotation:
-                rotation_matrix = rotation.to_matrix().to_4x4()
+def is_rest_location(locations: np.ndarray | None, epsilon: float) -> bool:
+    """Check if a location channel stays within epsilon of the rest pose on every frame."""
+    return locations is None or bool((np.abs(locations) <= epsilon).all())
 
-            bone_matrix = bone.bone.convert_local_to_pose(
-                translation_matrix @ rotation_matrix,
-                bone.bone.matrix_local,
-            )
-            bone_matrix = parent_bone_matrix.inverted() @ bone_matrix
-            bone_matrix @= utils.BONE_ROTATION_OFFSET_INVERTED
-
-            if uses_positions:
-                translations.append(bone_matrix.to_translation() * utils.BONE_SCALE)
-            if uses_rotations:
-                rotations.append(bone_matrix.to_quaternion())
-
-        time_property_list = anim.TimePropertyList([])
-
-        for frame in range(int(action.frame_start), int(action.frame_end) + 1):
-            markers = [x for x in action.pose_markers if x.frame == frame]
-            if len(markers) == 0:
-                continue
-
-            time = int(round((frame - int(action.frame_start)) * 33.33333))
-            events = []
-
-            for marker in markers:
-                event_strings = marker.name.split(";")
-                for event_string in event_strings:
-                    event_components = event_string.split()
-                    if event_components[0] != bone.name:
-                        continue
-                    events.append(
-                        utils.Property(
-                            event_components[1],
-                            event_components[2],
-                        ),
-                    )
-
-            if len(events) == 0:
-                continue
-
-            time_property = anim.TimeProperty(
-                time,
-                [utils.PropertyList(events)],
+
+def is_rest_rotation(rotations: np.ndarray | None, epsilon: float) -> bool:
+    """Check if a rotation channel stays within epsilon of the rest pose on every frame."""
+    if rotations is None:
+        return True
+
+    # q and -q are the same rotation
+    return bool(
+        (1.0 - np.abs(rotations[:, 0]) <= epsilon).all() and (np.abs(rotations[:, 1:]) <= epsilon).all(),
+    )
+
+
+@dataclasses.dataclass
+class PoolStats:
+    """The number of translations and rotations written to the pools of anim files."""
+
+    translation_count: int = 0
+    rotation_count: int = 0
+    uncompressed_translation_count: int = 0
+    uncompressed_rotation_count: int = 0
+
+    def add(self, other: "PoolStats") -> None:
+        """Add the counts of another anim file."""
+        self.translation_count += other.translation_count
+        self.rotation_count += other.rotation_count
+        self.uncompressed_translation_count += other.uncompressed_translation_count
+        self.uncompressed_rotation_count += other.uncompressed_rotation_count
+
+    def size(self) -> int:
+        """Get the size of the written pools in bytes."""
+        return self.translation_count * 12 + self.rotation_count * 16
+
+    def uncompressed_size(self) -> int:
+        """Get the size the pools would have been without compression in bytes."""
+        return self.uncompressed_translation_count * 12 + self.uncompressed_rotation_count * 16
+
+
+@dataclasses.dataclass
+class AnimJob:
+    """An action and its samples copied out of Blender, so it can be converted to an anim file on any thread."""
+
+    file_path: pathlib.Path
+    name: str
+    frame_count: int
+    duration: int
+    distance: float
+    samples: list[BoneSamples]
+    rest: rest_pose.RestPose
+    events: dict[str, list[anim.TimeProperty]]  # the events of each bone
+
+
+def action_events(
+    action: bpy.types.Action,
+    frame_time: float = resample.TSO_FRAME_TIME,
+) -> dict[str, list[anim.TimeProperty]]:
+    """Get the events of each bone from the pose markers of an action, in the order of their frames.
+
+    Event times are in milliseconds from the first frame, at frame_time milliseconds per frame.
+    """
+    frame_start = int(action.frame_start)
+    frame_end = int(action.frame_end)
+
+    frame_events: dict[int, dict[str, list[utils.Property]]] = {}
+    for marker in sorted(action.pose_markers, key=lambda marker: marker.frame):
+        if not frame_start <= marker.frame <= frame_end:
+            continue
+
+        bone_events = frame_events.setdefault(marker.frame, {})
+        for event_string in marker.name.split(";"):
+            event_components = event_string.split()
+            bone_events.setdefault(event_components[0], []).append(
+                utils.Property(event_components[1], event_components[2]),
             )
-            time_property_list.time_properties.append(time_property)
 
-        time_property_lists = []
-        if len(time_property_list.time_properties):
-            time_property_lists.append(time_property_list)
-
-        motion = anim.Motion(
-            bone.name,
-            int(action.frame_end - action.frame_start) + 1,
-            round((action.frame_end) * 33.3333333),
-            uses_positions,
-            uses_rotations,
-            position_offset if uses_positions else -1,
-            rotation_offset if uses_rotations else -1,
-            [],
-            time_property_lists,
+    events: dict[str, list[anim.TimeProperty]] = {}
+    for frame, bone_events in frame_events.items():
+        time = round((frame - frame_start) * frame_time)
+        for bone_name, properties in bone_events.items():
+            events.setdefault(bone_name, []).append(anim.TimeProperty(time, [utils.PropertyList(properties)]))
+
+    return events
+
+
+def prepare_anim(
+    output_directory: pathlib.Path,
+    armature_object: bpy.types.Object,
+    action: bpy.types.Action,
+    samples: list[BoneSamples],
+    *,
+    frame_time: float = resample.TSO_FRAME_TIME,
+) -> AnimJob:
+    """Copy everything an anim file is converted from out of Blender.
+
+    The samples of every frame_time milliseconds are resampled to the frame time of anim files if it is different.
+    """
+    frame_count = int(action.frame_end - action.frame_start) + 1
+
+    if frame_time != resample.TSO_FRAME_TIME:
+        samples = resample_samples(samples, frame_count, frame_time)
+        frame_count = resample.resampled_frame_count(frame_count, frame_time, resample.TSO_FRAME_TIME)
+
+    return AnimJob(
+        output_directory / (action.name + ".anim"),
+        action.name,
+        frame_count,
+        round((action.frame_end) * frame_time),
+        action.get("Distance", 0.0),
+        samples,
+        rest_pose.get(armature_object.data),
+        action_events(action, frame_time),
+    )
+
+
+def resample_samples(samples: list[BoneSamples], frame_count: int, frame_time: float) -> list[BoneSamples]:
+    """Resample the channels of every bone from frame_time milliseconds per frame to the frame time of anim files."""
+    positions = resample.sample_positions(frame_count, frame_time, resample.TSO_FRAME_TIME)
+    return [
+        BoneSamples(
+            bone_samples.bone_name,
+            resample.resample_linear(bone_samples.locations, positions) if bone_samples.locations is not None else None,
+            (
+                resample.resample_quaternions(bone_samples.rotations, positions)
+                if bone_samples.rotations is not None
+                else None
+            ),
         )
+        for bone_samples in samples
+    ]
+
+
+def convert_translations(rest: rest_pose.RestPose, bone_index: int, locations: np.ndarray) -> np.ndarray:
+    """Convert the pose locations of a bone to translations in the order they are stored in files."""
+    inverted_parent_matrix = np.linalg.inv(rest.parent_matrices[bone_index])
 
-        motions.append(motion)
+    # local locations are in the rest orientation of the bone, the others in the orientation of the armature
+    if rest.use_local_locations[bone_index]:
+        location_matrix = inverted_parent_matrix @ rest.matrices[bone_index]
+    else:
+        location_matrix = inverted_parent_matrix.copy()
+        location_matrix[:3, 3] += inverted_parent_matrix[:3, :3] @ rest.matrices[bone_index][:3, 3]
 
+    translations = transforms.transform_points(location_matrix, locations.astype(np.float64)) * utils.BONE_SCALE
+    return translations[:, [0, 2, 1]].astype(np.float32)  # swap y and z
+
+
+def convert_rotations(rest: rest_pose.RestPose, bone_index: int, rotations: np.ndarray) -> np.ndarray:
+    """Convert the pose quaternion rotations of a bone to rotations in the order they are stored in files."""
+    rotation_offset = transforms.matrices_to_quaternions(
+        np.linalg.inv(rest.parent_matrices[bone_index]) @ rest.matrices[bone_index],
+    )
+
+    rotations = rotations.astype(np.float64)
+    rotations = rotations / np.linalg.norm(rotations, axis=-1, keepdims=True)
+    rotations = transforms.multiply_quaternions(
+        transforms.multiply_quaternions(rotation_offset, rotations),
+        BONE_ROTATION_OFFSET_INVERTED_QUATERNION,
+    )
+    rotations = transforms.canonical_quaternions(rotations)
+    return rotations[:, [1, 3, 2, 0]].astype(np.float32)  # x, z, y, w
+
+
+def convert_anim(job: AnimJob, *, epsilon: float = 0.0) -> tuple[anim.CompactAnim, PoolStats]:
+    """Convert an action to an anim, only using numpy so it can run on any thread.
+
+    Channels which stay within epsilon of the rest pose on every frame are not written,
+    and motions with identical frames share the same run of the pools. Bones with events, or the first bone if all
+    of them stay at the rest pose, keep a motion without channels so the events and frame count are still written.
+    """
+    pool_stats = PoolStats()
+
+    translation_pool = anim.ArrayPool(3)
+    rotation_pool = anim.ArrayPool(4)
+    motions = []
+
+    for bone_samples in job.samples:
+        bone_index = job.rest.bone_indices[bone_samples.bone_name]
+
+        uses_positions = not is_rest_location(bone_samples.locations, epsilon)
+        uses_rotations = not is_rest_rotation(bone_samples.rotations, epsilon)
+
+        if not is_rest_location(bone_samples.locations, 0.0):
+            pool_stats.uncompressed_translation_count += len(bone_samples.locations)
+        if not is_rest_rotation(bone_samples.rotations, 0.0):
+            pool_stats.uncompressed_rotation_count += len(bone_samples.rotations)
+
+        if not uses_positions and not uses_rotations and bone_samples.bone_name not in job.events:
+            continue
+
+        position_offset = -1
         if uses_positions:
-            position_offset += motion.frame_count
+            translations = convert_translations(job.rest, bone_index, bone_samples.locations)
+            position_offset = translation_pool.add_run(translations.tobytes())
+
+        rotation_offset = -1
         if uses_rotations:
-            rotation_offset += motion.frame_count
+            rotations = convert_rotations(job.rest, bone_index, bone_samples.rotations)
+            rotation_offset = rotation_pool.add_run(rotations.tobytes())
 
-    distance = action.get("Distance", 0.0)
+        time_property_lists = []
+        if bone_samples.bone_name in job.events:
+            time_property_lists.append(anim.TimePropertyList(job.events[bone_samples.bone_name]))
+
+        motions.append(
+            anim.Motion(
+                bone_samples.bone_name,
+                job.frame_count,
+                job.duration,
+                uses_positions,
+                uses_rotations,
+                position_offset,
+                rotation_offset,
+                [],
+                time_property_lists,
+            ),
+        )
 
-    animation = anim.Anim(
-        action.name,
-        motions[0].duration,
-        distance,
-        distance != 0.0,
-        translations,
-        rotations,
+    # the frame count is only stored in motions
+    if not motions and job.samples:
+        motions.append(
+            anim.Motion(
+                job.samples[0].bone_name,
+                job.frame_count,
+                job.duration,
+                uses_positions=False,
+                uses_rotations=False,
+                position_offset=-1,
+                rotation_offset=-1,
+                property_lists=[],
+                time_property_lists=[],
+            ),
+        )
+
+    animation = anim.CompactAnim(
+        job.name,
+        job.duration,
+        job.distance,
+        job.distance != 0.0,
+        translation_pool.values,
+        rotation_pool.values,
         motions,
     )
 
-    anim.write_file(output_directory / (action.name + ".anim"), animation)
+    pool_stats.translation_count = len(translation_pool.values) // 3
+    pool_stats.rotation_count = len(rotation_pool.values) // 4
+
+    return animation, pool_stats
+
+
+def write_anim(job: AnimJob, *, epsilon: float = 0.0) -> PoolStats:
+    """Convert an action to an anim file and write it, without using Blender so it can run on any thread."""
+    animation, pool_stats = convert_anim(job, epsilon=epsilon)
+    anim.write_compact_file(job.file_path, animation)
+    return pool_stats
+
+
+class AnimWriter:
+    """Convert and write anim files on worker threads, while the caller samples the next actions.
+
+    With a single thread the files are written right away on the calling thread. The paths of the files are added to
+    written once they have been written.
+    """
+
+    def __init__(self, thread_count: int, *, epsilon: float = 0.0) -> None:
+        """Start the worker threads."""
+        self.thread_count = thread_count
+        self.epsilon = epsilon
+        self.pool_stats = PoolStats()
+        self.written: list[pathlib.Path] = []
+        self.pending: collections.deque[tuple[pathlib.Path, concurrent.futures.Future[PoolStats]]]
+        self.pending = collections.deque()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=thread_count) if thread_count > 1 else None
+
+    def write(self, job: AnimJob) -> None:
+        """Convert and write an anim file."""
+        if self.executor is None:
+            self.pool_stats.add(write_anim(job, epsilon=self.epsilon))
+            self.written.append(job.file_path)
+            return
+
+        self.pending.append((job.file_path, self.executor.submit(write_anim, job, epsilon=self.epsilon)))
+
+        # limit the number of sampled actions waiting in memory
+        while len(self.pending) > 2 * self.thread_count:
+            self.wait_for_next()
+
+    def wait_for_next(self) -> None:
+        """Wait for the oldest pending anim file to be written."""
+        file_path, future = self.pending.popleft()
+        self.pool_stats.add(future.result())
+        self.written.append(file_path)
+
+    def abort(self) -> None:
+        """Stop the worker threads without collecting the files they wrote, so an earlier error is not hidden."""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+        self.pending.clear()
+
+    def finish(self) -> PoolStats:
+        """Wait for all the anim files to be written and stop the worker threads, returning the pool counts."""
+        if self.executor is not None:
+            try:
+                while self.pending:
+                    self.wait_for_next()
+            finally:
+                self.executor.shutdown(cancel_futures=True)
+        return self.pool_stats
+
+
+def export_anim(
+    output_directory: pathlib.Path,
+    armature_object: bpy.types.Object,
+    action: bpy.types.Action,
+    samples: list[BoneSamples] | None = None,
+    *,
+    epsilon: float = 0.0,
+) -> PoolStats:
+    """Export an anim file.
+
+    Channels which stay within epsilon of the rest pose on every frame are not written,
+    and motions with identical frames share the same run of the pools.
+    """
+    if samples is None:
+        samples = sample_action(armature_object, action)
+
+    return write_anim(prepare_anim(output_directory, armature_object, action, samples), epsilon=epsilon)
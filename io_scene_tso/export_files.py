@@ -1,11 +1,79 @@
 """Export The Sims Online 3D files."""
 
 import bpy
+import dataclasses
+import fnmatch
 import logging
 import pathlib
 
 from . import export_anim
 from . import export_mesh
+from . import fingerprint
+from . import lazy_anim
+from . import manifest
+from . import profiling
+from . import resample
+from . import utils
+from . import validation
+from . import vertex_cache
+
+
+@dataclasses.dataclass
+class ExportResult:
+    """The files that were written or skipped because they had not changed, and the problems that stopped the export.
+
+    Failed files could not be exported after the scene was validated. Notes are statistics, skipped meshes and stale
+    files, which are worth reporting but are not failures.
+    """
+
+    written: list[str] = dataclasses.field(default_factory=list)
+    unchanged: list[str] = dataclasses.field(default_factory=list)
+    failed: list[str] = dataclasses.field(default_factory=list)
+    problems: list[validation.Problem] = dataclasses.field(default_factory=list)
+    notes: list[str] = dataclasses.field(default_factory=list)
+
+
+def matches(name: str, patterns: tuple[str, ...]) -> bool:
+    """Check if a name matches any of the fnmatch patterns, or there are no patterns."""
+    return not patterns or any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def validate_scene(
+    context: bpy.types.Context,
+    *,
+    export_meshes: bool,
+    export_animations: bool,
+    object_patterns: tuple[str, ...] = (),
+    action_patterns: tuple[str, ...] = (),
+    normalize_weights: bool = False,
+) -> validation.ValidationReport:
+    """Check all the meshes and actions that would be exported, before converting any of them."""
+    report = validation.ValidationReport()
+
+    if export_meshes:
+        for mesh_object in [obj for obj in context.scene.objects if obj.type == 'MESH']:
+            if matches(mesh_object.name, object_patterns):
+                report.mesh_count += 1
+                problems = validation.validate_mesh(mesh_object, normalize_weights=normalize_weights)
+                report.add("mesh", mesh_object.name, problems)
+
+    if export_animations:
+        validated_actions = set()
+        for armature_object in [obj for obj in context.scene.objects if obj.type == 'ARMATURE']:
+            if armature_object.animation_data is None or not matches(armature_object.name, object_patterns):
+                continue
+
+            for nla_track in armature_object.animation_data.nla_tracks:
+                for strip in nla_track.strips:
+                    if strip.action is None or not matches(strip.action.name, action_patterns):
+                        continue
+
+                    validated_actions.add(strip.action.name)
+                    report.add("action", strip.action.name, validation.validate_action(armature_object, strip.action))
+
+        report.action_count = len(validated_actions)
+
+    return report
 
 
 def export_files(
@@ -15,15 +83,211 @@ def export_files(
     *,
     export_meshes: bool,
     export_animations: bool,
-) -> None:
-    """Export all the meshes and animations in the scene."""
+    incremental: bool = False,
+    compression_epsilon: float = 0.0,
+    object_patterns: tuple[str, ...] = (),
+    action_patterns: tuple[str, ...] = (),
+    optimize_vertex_cache: bool = False,
+    normalize_weights: bool = False,
+    resample_frame_rate: bool = False,
+    tracer: profiling.Tracer | None = None,
+    thread_count: int = 1,
+) -> ExportResult:
+    """Export all the meshes and animations in the scene, or the ones whose object and action names match patterns.
+
+    Nothing is exported if any of them has problems, which are all reported at once. A tracer records the memory
+    used by each stage of each file. With more than one thread, anims are converted and written on that many worker
+    threads, and the export anim stage only records handing them over. Actions are exported frame for frame, or
+    resampled from the frame rate of the scene to that of anim files with resample_frame_rate.
+    """
+    result = ExportResult()
+
+    with profiling.stage(tracer, "validate"):
+        validation_report = validate_scene(
+            context,
+            export_meshes=export_meshes,
+            export_animations=export_animations,
+            object_patterns=object_patterns,
+            action_patterns=action_patterns,
+            normalize_weights=normalize_weights,
+        )
+    if validation_report.problems:
+        logger.info(validation_report.summary())
+        result.problems = validation_report.problems
+        return result
+
+    manifest_path = output_directory / manifest.MANIFEST_FILE_NAME
+    previous_manifest = manifest.read_file(manifest_path) if incremental else manifest.Manifest({})
+    current_manifest = manifest.Manifest({})
+    current_file_names = set()
+    filtered_file_names = set()
+    cache_stats = vertex_cache.CacheStats() if optimize_vertex_cache else None
+
+    def is_unchanged(file_name: str, file_fingerprint: str) -> bool:
+        return (
+            previous_manifest.fingerprints.get(file_name) == file_fingerprint
+            and (output_directory / file_name).is_file()
+        )
+
     if export_meshes:
         for mesh_object in [obj for obj in context.scene.objects if obj.type == 'MESH']:
-            export_mesh.export_mesh(logger, output_directory, mesh_object)
+            file_name = mesh_object.name + ".mesh"
 
-    if export_animations:
-        for armature_object in [obj for obj in context.scene.objects if obj.type == 'ARMATURE']:
-            if armature_object.animation_data is not None and armature_object.animation_data.nla_tracks is not None:
-                for nla_track in armature_object.animation_data.nla_tracks:
-                    for strip in nla_track.strips:
-                        export_anim.export_anim(output_directory, armature_object, strip.action)
+            if not matches(mesh_object.name, object_patterns):
+                filtered_file_names.add(file_name)
+                continue
+
+            if mesh_object.parent is None or mesh_object.parent.type != 'ARMATURE':
+                result.notes.append(f"Skipped {mesh_object.name} as it is not parented to an armature")
+                continue
+
+            if incremental:
+                current_file_names.add(file_name)
+                mesh_fingerprint = fingerprint.mesh_fingerprint(
+                    mesh_object,
+                    (optimize_vertex_cache, normalize_weights),
+                )
+                if is_unchanged(file_name, mesh_fingerprint):
+                    current_manifest.fingerprints[file_name] = mesh_fingerprint
+                    result.unchanged.append(file_name)
+                    continue
+
+            with profiling.stage(tracer, "export mesh", file_name):
+                is_written = export_mesh.export_mesh(
+                    logger,
+                    output_directory,
+                    mesh_object,
+                    vertex_cache_stats=cache_stats,
+                    normalize_weights=normalize_weights,
+                )
+            if is_written:
+                result.written.append(file_name)
+                if incremental:
+                    current_manifest.fingerprints[file_name] = mesh_fingerprint
+            else:
+                result.failed.append(file_name)
+
+    if cache_stats is not None and cache_stats.triangle_count:
+        result.notes.append(
+            f"Vertex cache optimization changed the average cache misses per triangle of "
+            f"{cache_stats.triangle_count} triangles from {cache_stats.acmr_before():.3f} to "
+            f"{cache_stats.acmr_after():.3f}",
+        )
+
+    # the rest pose each anim file was exported for, so actions used by several armatures or strips are only
+    # exported once, and an action used by armatures with different rest poses does not overwrite its own file
+    anim_rest_poses: dict[str, str] = {}
+
+    frame_time = resample.TSO_FRAME_TIME
+    action_settings: tuple[object, ...] = (compression_epsilon,)
+    if resample_frame_rate:
+        frame_time = resample.frame_time(context.scene.render.fps, context.scene.render.fps_base)
+        action_settings = (compression_epsilon, frame_time)
+
+    # anims are converted and written on worker threads while the next actions are sampled on this one
+    anim_writer = export_anim.AnimWriter(thread_count, epsilon=compression_epsilon)
+    anim_fingerprints: dict[str, str] = {}
+
+    try:
+        if export_animations:
+            for armature_object in [obj for obj in context.scene.objects if obj.type == 'ARMATURE']:
+                if armature_object.animation_data is not None and armature_object.animation_data.nla_tracks is not None:
+                    rest_pose_fingerprint = fingerprint.rest_pose_fingerprint(armature_object.data)
+                    is_armature_matched = matches(armature_object.name, object_patterns)
+
+                    for nla_track in armature_object.animation_data.nla_tracks:
+                        for strip in nla_track.strips:
+                            if strip.action is None:
+                                continue
+
+                            file_name = strip.action.name + ".anim"
+
+                            if not is_armature_matched or not matches(strip.action.name, action_patterns):
+                                filtered_file_names.add(file_name)
+                                continue
+
+                            exported_rest_pose = anim_rest_poses.get(file_name)
+                            if exported_rest_pose == rest_pose_fingerprint:
+                                continue
+                            if exported_rest_pose is not None:
+                                logger.info(
+                                    f"Did not export {file_name} for {armature_object.name}, it was already exported "  # noqa: G004
+                                    f"for an armature with a different rest pose",
+                                )
+                                continue
+                            anim_rest_poses[file_name] = rest_pose_fingerprint
+
+                            if lazy_anim.LAZY_ERROR_PROPERTY in strip.action:
+                                logger.info(strip.action[lazy_anim.LAZY_ERROR_PROPERTY])
+                                continue
+
+                            if lazy_anim.is_lazy(strip.action):
+                                try:
+                                    lazy_anim.create_lazy_action_data(armature_object, strip.action)
+                                except utils.FileReadError as _:
+                                    logger.info(f"Could not load the lazily imported action {strip.action.name}")  # noqa: G004
+                                    continue
+
+                            with profiling.stage(tracer, "sample action", file_name):
+                                samples = export_anim.sample_action(armature_object, strip.action)
+
+                            if incremental:
+                                current_file_names.add(file_name)
+                                action_fingerprint = fingerprint.action_fingerprint(
+                                    armature_object,
+                                    strip.action,
+                                    samples,
+                                    action_settings,
+                                )
+                                if is_unchanged(file_name, action_fingerprint):
+                                    current_manifest.fingerprints[file_name] = action_fingerprint
+                                    result.unchanged.append(file_name)
+                                    continue
+                                anim_fingerprints[file_name] = action_fingerprint
+
+                            with profiling.stage(tracer, "export anim", file_name):
+                                anim_writer.write(
+                                    export_anim.prepare_anim(
+                                        output_directory,
+                                        armature_object,
+                                        strip.action,
+                                        samples,
+                                        frame_time=frame_time,
+                                    ),
+                                )
+    except BaseException:
+        anim_writer.abort()
+        raise
+
+    pool_stats = anim_writer.finish()
+
+    # anims are only recorded once they have been written, so a failed write is exported again next time
+    for file_path in anim_writer.written:
+        result.written.append(file_path.name)
+        if incremental:
+            current_manifest.fingerprints[file_path.name] = anim_fingerprints[file_path.name]
+
+    if pool_stats.size() < pool_stats.uncompressed_size():
+        result.notes.append(
+            f"Animation compression reduced the translation and rotation pools from "
+            f"{pool_stats.uncompressed_size()} to {pool_stats.size()} bytes",
+        )
+
+    if not incremental:
+        return result
+
+    # keep tracking the files that were not exported this time, and report the ones nothing exports to anymore
+    for file_name, file_fingerprint in previous_manifest.fingerprints.items():
+        if file_name in current_file_names or not (output_directory / file_name).is_file():
+            continue
+
+        is_mesh = file_name.endswith(".mesh")
+        is_exported = (is_mesh and export_meshes) or (not is_mesh and export_animations)
+        if is_exported and file_name not in filtered_file_names:
+            result.notes.append(f"{file_name} is stale, nothing in the scene is exported to it anymore")
+
+        current_manifest.fingerprints[file_name] = file_fingerprint
+
+    manifest.write_file(manifest_path, current_manifest)
+
+    return result
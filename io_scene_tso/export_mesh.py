@@ -7,23 +7,38 @@ import pathlib
 
 from . import mesh
 from . import utils
-
-
-MAX_VERTEX_GROUP_COUNT = 2
+from . import vertex_cache
+from . import vertex_weights
 
 
 def export_mesh(
     logger: logging.Logger,
     output_directory: pathlib.Path,
     mesh_object: bpy.types.Object,
-) -> None:
-    """Export a mesh file."""
-    if mesh_object.parent is None or mesh_object.parent.type != 'ARMATURE':
-        logger.info(f"Skipping {mesh_object.name} as it is not parented to an armature")  # noqa: G004
-        return
-
+    *,
+    vertex_cache_stats: vertex_cache.CacheStats | None = None,
+    normalize_weights: bool = False,
+) -> bool:
+    """Export a mesh file, returning whether it was written.
+
+    With vertex cache stats, the faces and vertices are reordered for the vertex cache and the cache misses are added
+    to the stats. Normalizing weights limits the vertices to their two largest bone weights instead of refusing to
+    export meshes with more. The mesh object must be parented to an armature.
+    """
     mesh_data = mesh_object.data
     uv_layer = mesh_data.uv_layers[0]
+    armature = mesh_object.parent.data
+
+    influences, weight_report = vertex_weights.mesh_influences(mesh_object, normalize=normalize_weights)
+
+    weight_errors = weight_report.errors(mesh_object.name, normalize=normalize_weights)
+    if weight_errors:
+        logger.info("\n".join(weight_errors))
+        return False
+
+    weight_changes = weight_report.changes(mesh_object.name)
+    if weight_changes is not None:
+        logger.info(weight_changes)
 
     new_vertices = []
     new_faces = []
@@ -34,22 +49,13 @@ def export_mesh(
         for loop_index in triangle.loops:
             vertex_index = mesh_data.loops[loop_index].vertex_index
 
-            if len(mesh_data.vertices[vertex_index].groups) == 0:
-                logger.info(f"{mesh_object.name} mesh has vertices that are not in a vertex group")  # noqa: G004
-                return
-
-            if len(mesh_data.vertices[vertex_index].groups) > MAX_VERTEX_GROUP_COUNT:
-                logger.info(f"{mesh_object.name} mesh has vertices in more than 2 vertex groups")  # noqa: G004
-                return
-
             vertex = (
                 mesh_data.vertices[vertex_index].co,
                 mesh_data.loops[loop_index].normal,
                 uv_layer.data[loop_index].uv,
-                mesh_data.vertices[vertex_index].groups[0].group,
-                mesh_data.vertices[vertex_index].groups[1]
-                if len(mesh_data.vertices[vertex_index].groups) > 1
-                else None,
+                influences.primary_groups[vertex_index],
+                influences.secondary_groups[vertex_index],
+                influences.secondary_weights[vertex_index],
             )
 
             if vertex not in new_vertices:
@@ -67,25 +73,17 @@ def export_mesh(
     vertices: list[mesh.Vertex] = []
     blended_vertices: list[mesh.Vertex] = []
 
-    armature = mesh_object.parent.data
-
     vertex_index_map = []
 
+    # vertex groups that are not bones were reported, and no vertices are bound to them
+    bone_groups = [vertex_group for vertex_group in mesh_object.vertex_groups if vertex_group.name in armature.bones]
+
     # create main vertices
-    for vertex_group in mesh_object.vertex_groups:
+    for vertex_group in bone_groups:
         vertex_group_vertices = []
         vertex_group_uvs = []
 
-        armature_bone = armature.bones.get(vertex_group.name)
-        if armature_bone is None:
-            logger.info(
-                f"Vertex group {0} in {1} is not a bone in armature {2}",  # noqa: G004
-                vertex_group.name,
-                mesh_object.name,
-                mesh_object.parent.name,
-            )
-            return
-
+        armature_bone = armature.bones[vertex_group.name]
         bone_matrix = (armature_bone.matrix_local @ utils.BONE_ROTATION_OFFSET_INVERTED).inverted()
         normal_bone_matrix = bone_matrix.to_quaternion().to_matrix().to_4x4()
 
@@ -115,7 +113,7 @@ def export_mesh(
         uvs += vertex_group_uvs
 
     # create blended vertices
-    for vertex_group_index, vertex_group in enumerate(mesh_object.vertex_groups):
+    for binding_index, vertex_group in enumerate(bone_groups):
         vertex_group_vertices = []
 
         armature_bone = armature.bones[vertex_group.name]
@@ -123,17 +121,17 @@ def export_mesh(
         normal_bone_matrix = bone_matrix.to_quaternion().to_matrix().to_4x4()
 
         for vertex_index, vertex in enumerate(new_vertices):
-            if vertex[4] is not None and vertex[4].group == vertex_group_index:
+            if vertex[4] == vertex_group.index:
                 vertex_position = (bone_matrix @ vertex[0]) * utils.BONE_SCALE
                 vertex_normal = normal_bone_matrix @ vertex[1]
                 vertex_group_vertices.append(mesh.Vertex(vertex_position.xzy, vertex_normal.xzy))
 
-                weight = int(vertex[4].weight * math.pow(2, 15))
+                weight = int(vertex[5] * math.pow(2, 15))
                 blends.append(mesh.Blend(weight, vertex_index_map.index(vertex_index)))
 
         if len(vertex_group_vertices) > 0:
-            bone_bindings[vertex_group_index].blended_vertex_index = len(blended_vertices)
-            bone_bindings[vertex_group_index].blended_vertex_count = len(vertex_group_vertices)
+            bone_bindings[binding_index].blended_vertex_index = len(blended_vertices)
+            bone_bindings[binding_index].blended_vertex_count = len(vertex_group_vertices)
 
             blended_vertices += vertex_group_vertices
 
@@ -156,4 +154,9 @@ def export_mesh(
         blended_vertices,
     )
 
+    if vertex_cache_stats is not None:
+        mesh_file_description = vertex_cache.optimize_mesh(mesh_file_description, vertex_cache_stats)
+
     mesh.write_file(output_directory / (mesh_object.name + ".mesh"), mesh_file_description)
+
+    return True
@@ -0,0 +1,298 @@
+"""Read The Sims Online FAR archives.
+
+The directory of an archive is read once, and members are only decompressed when they are used.
+"""
+
+import dataclasses
+import mmap
+import pathlib
+import struct
+import typing
+
+from . import utils
+
+
+FAR_SIGNATURE = b"FAR!byAZ"
+
+# compressed FAR 3 members start with the compressed size, the RefPack signature and the decompressed size
+COMPRESSED_HEADER_SIZE = 9
+COMPRESSED_DATA_TYPE = 0x80
+REFPACK_SIGNATURE = b"\x10\xfb"
+
+
+@dataclasses.dataclass
+class Entry:
+    """An archive directory entry."""
+
+    name: str
+    offset: int
+    size: int  # the size of the member once decompressed
+    stored_size: int  # the size of the member in the archive
+    compressed: bool
+
+
+def check_entry_count(offset: int, count: int, entry_size: int, size: int) -> None:
+    """Check that the rest of an archive is big enough to hold count directory entries."""
+    if count * entry_size > size - offset:
+        message = f"Archive directory at offset {offset} has {count} entries, which do not fit in the archive"
+        raise utils.FileReadError(message)
+
+
+def read_entry_name(data: bytes | mmap.mmap, offset: int, length: int) -> str:
+    """Read the name of a directory entry."""
+    if offset + length > len(data):
+        message = f"Archive member name at offset {offset} ends after the end of the archive"
+        raise utils.FileReadError(message)
+    return utils.decode_string(data[offset : offset + length], offset)
+
+
+def read_entries_1(data: bytes | mmap.mmap, offset: int, *, long_name_lengths: bool) -> list[Entry]:
+    """Read the directory of a FAR 1a archive, or a FAR 1b archive when name lengths are 16 bit."""
+    count = struct.unpack_from('<I', data, offset)[0]
+    offset += 4
+    check_entry_count(offset, count, 16 if long_name_lengths else 14, len(data))
+
+    entries = []
+    for _ in range(count):
+        size, stored_size, data_offset = struct.unpack_from('<3I', data, offset)
+        offset += 12
+
+        if long_name_lengths:
+            name_length = struct.unpack_from('<I', data, offset)[0]
+            offset += 4
+        else:
+            name_length = struct.unpack_from('<H', data, offset)[0]
+            offset += 2
+
+        name = read_entry_name(data, offset, name_length)
+        offset += name_length
+
+        entries.append(Entry(name, data_offset, size, stored_size, compressed=False))
+
+    return entries
+
+
+def read_entries_3(data: bytes | mmap.mmap, offset: int) -> list[Entry]:
+    """Read the directory of a FAR 3 archive."""
+    count = struct.unpack_from('<I', data, offset)[0]
+    offset += 4
+    check_entry_count(offset, count, 24, len(data))
+
+    entries = []
+    for _ in range(count):
+        size, stored_size_low, stored_size_high, data_type, data_offset, name_length = struct.unpack_from(
+            '<IHBBI2xH',
+            data,
+            offset,
+        )
+        offset += 24  # including the type and file ids
+
+        name = read_entry_name(data, offset, name_length)
+        offset += name_length
+
+        stored_size = stored_size_low | (stored_size_high << 16)
+        compressed = data_type == COMPRESSED_DATA_TYPE or stored_size != size
+        entries.append(Entry(name, data_offset, size, stored_size, compressed=compressed))
+
+    return entries
+
+
+def is_valid(entries: list[Entry], size: int) -> bool:
+    """Check that the data of all entries is inside the archive."""
+    return all(entry.offset + entry.stored_size <= size for entry in entries)
+
+
+def decompress_refpack(data: bytes | memoryview, size: int) -> bytes:
+    """Decompress RefPack commands, without the RefPack header, to size bytes."""
+    output = bytearray()
+    position = 0
+
+    while position < len(data) and len(output) < size:
+        command = data[position]
+
+        if command < 0x80:
+            second = data[position + 1]
+            position += 2
+            literal_count = command & 0x03
+            copy_count = ((command & 0x1C) >> 2) + 3
+            copy_offset = ((command & 0x60) << 3) + second + 1
+        elif command < 0xC0:
+            second, third = data[position + 1], data[position + 2]
+            position += 3
+            literal_count = second >> 6
+            copy_count = (command & 0x3F) + 4
+            copy_offset = ((second & 0x3F) << 8) + third + 1
+        elif command < 0xE0:
+            second, third, fourth = data[position + 1], data[position + 2], data[position + 3]
+            position += 4
+            literal_count = command & 0x03
+            copy_count = ((command & 0x0C) << 6) + fourth + 5
+            copy_offset = ((command & 0x10) << 12) + (second << 8) + third + 1
+        elif command < 0xFC:
+            position += 1
+            literal_count = ((command & 0x1F) << 2) + 4
+            copy_count = 0
+            copy_offset = 0
+        else:
+            position += 1
+            literal_count = command & 0x03
+            copy_count = 0
+            copy_offset = 0
+
+        output += data[position : position + literal_count]
+        position += literal_count
+
+        if copy_count:
+            start = len(output) - copy_offset
+            if start < 0:
+                message = f"RefPack data copies from before the start of the output at offset {position}"
+                raise utils.FileReadError(message)
+
+            if copy_offset >= copy_count:
+                output += output[start : start + copy_count]
+            else:
+                # the copy overlaps the bytes it produces, so repeat the pattern
+                pattern = output[start:]
+                output += (pattern * (copy_count // copy_offset + 1))[:copy_count]
+
+        if command >= 0xFC:
+            break
+
+    if len(output) != size:
+        message = f"RefPack data decompressed to {len(output)} bytes instead of {size} bytes"
+        raise utils.FileReadError(message)
+
+    return bytes(output)
+
+
+def decode_member(entry: Entry, stored: bytes) -> bytes:
+    """Decompress the stored data of a member if it is compressed."""
+    if not entry.compressed:
+        return stored
+
+    if stored[4:6] != REFPACK_SIGNATURE:
+        message = f"{entry.name} is not compressed with RefPack"
+        raise utils.FileReadError(message)
+
+    try:
+        return decompress_refpack(memoryview(stored)[COMPRESSED_HEADER_SIZE:], entry.size)
+    except IndexError as exception:
+        message = f"The compressed data of {entry.name} ends unexpectedly"
+        raise utils.FileReadError(message) from exception
+
+
+class Archive:
+    """A FAR archive whose members are read when they are used."""
+
+    def __init__(self, name: str, data: bytes | mmap.mmap) -> None:
+        """Read the directory of an archive."""
+        self.name = name
+        self.data = data
+
+        try:
+            if data[: len(FAR_SIGNATURE)] != FAR_SIGNATURE:
+                message = "The file is not a FAR archive"
+                raise utils.FileReadError(message)
+
+            version, directory_offset = struct.unpack_from('<2I', data, len(FAR_SIGNATURE))
+
+            if version == 1:
+                # FAR 1a and 1b only differ in the size of name lengths, so use whichever makes sense
+                try:
+                    entries = read_entries_1(data, directory_offset, long_name_lengths=True)
+                    if not is_valid(entries, len(data)):
+                        entries = None
+                except (utils.FileReadError, struct.error):
+                    entries = None
+                if entries is None:
+                    entries = read_entries_1(data, directory_offset, long_name_lengths=False)
+            elif version == 3:
+                entries = read_entries_3(data, directory_offset)
+            else:
+                message = f"Unsupported FAR version {version}"
+                raise utils.FileReadError(message)
+
+        except struct.error as exception:
+            raise utils.FileReadError from exception
+
+        if not is_valid(entries, len(data)):
+            message = "The archive has members outside of the file"
+            raise utils.FileReadError(message)
+
+        self.entries = {entry.name: entry for entry in entries}
+
+    def __enter__(self) -> typing.Self:
+        """Use the archive until the end of a with statement."""
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Close the archive at the end of a with statement."""
+        self.close()
+
+    def close(self) -> None:
+        """Unmap the archive file, after which members that were not loaded can no longer be read."""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def read_stored(self, entry: Entry) -> bytes:
+        """Read the data of a member as it is stored in the archive."""
+        return self.data[entry.offset : entry.offset + entry.stored_size]
+
+    def read(self, entry: Entry) -> bytes:
+        """Read the data of a member, decompressing it if needed."""
+        return decode_member(entry, self.read_stored(entry))
+
+    def member(self, name: str) -> "Member":
+        """Get a member by its name."""
+        entry = self.entries.get(name)
+        if entry is None:
+            message = f"{self.name} has no member {name}"
+            raise utils.FileReadError(message)
+        return Member(self, entry)
+
+    def members(self) -> list["Member"]:
+        """Get all the members in the order of the directory."""
+        return [Member(self, entry) for entry in self.entries.values()]
+
+
+class Member(utils.MemoryFile):
+    """A member of an archive, which can be read like a file and is decompressed the first time it is read."""
+
+    def __init__(self, archive: Archive, entry: Entry) -> None:
+        """Create a member of an archive without reading it."""
+        super().__init__(entry.name, None)
+        self.archive = archive
+        self.entry = entry
+        self.stored: bytes | None = None
+
+    def load(self) -> None:
+        """Read the stored data of the member, so it can still be decompressed once the archive is closed."""
+        if self.data is None and self.stored is None:
+            self.stored = self.archive.read_stored(self.entry)
+
+    def read_bytes(self) -> bytes:
+        """Read the data of the member, decompressing it the first time."""
+        if self.data is None:
+            stored = self.stored if self.stored is not None else self.archive.read_stored(self.entry)
+            self.data = decode_member(self.entry, stored)
+            self.stored = None
+        return self.data
+
+    def __str__(self) -> str:
+        """Get the name of the archive and member."""
+        return f"{self.archive.name}/{self.name}"
+
+
+def read_file(file_path: pathlib.Path) -> Archive:
+    """Read the directory of an archive file, mapping the file into memory so members are read when used."""
+    try:
+        with file_path.open(mode='rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as exception:
+        raise utils.FileReadError from exception
+
+    try:
+        return Archive(file_path.name, data)
+    except utils.FileReadError:
+        data.close()
+        raise
@@ -0,0 +1,171 @@
+"""Fingerprint the Blender data that meshes and animations are exported from."""
+
+import bpy
+import hashlib
+import numpy as np
+
+from . import export_anim
+from . import mesh
+from . import skel
+from . import vertex_weights
+
+
+def update_string(hasher: "hashlib._Hash", string: str) -> None:
+    """Add a length prefixed string to a hash."""
+    encoded = string.encode("utf-8")
+    hasher.update(len(encoded).to_bytes(4, "little"))
+    hasher.update(encoded)
+
+
+def update_array(hasher: "hashlib._Hash", array: np.ndarray) -> None:
+    """Add the shape and contents of an array to a hash."""
+    hasher.update(str(array.shape).encode("ascii"))
+    hasher.update(np.ascontiguousarray(array).tobytes())
+
+
+def update_rest_pose(hasher: "hashlib._Hash", armature: bpy.types.Armature) -> None:
+    """Add the bone hierarchy and rest matrices of an armature to a hash."""
+    for bone in armature.bones:
+        update_string(hasher, bone.name)
+        update_string(hasher, bone.parent.name if bone.parent else "")
+
+    matrices = np.empty(len(armature.bones) * 16, dtype=np.float32)
+    armature.bones.foreach_get("matrix_local", matrices)
+    update_array(hasher, matrices)
+
+
+def rest_pose_fingerprint(armature: bpy.types.Armature) -> str:
+    """Fingerprint the rest pose of an armature."""
+    hasher = hashlib.sha256()
+    update_rest_pose(hasher, armature)
+    return hasher.hexdigest()
+
+
+def update_mesh_data(hasher: "hashlib._Hash", mesh_data: bpy.types.Mesh) -> None:
+    """Add the geometry, normals, uvs and weights of mesh data to a hash."""
+    positions = np.empty(len(mesh_data.vertices) * 3, dtype=np.float32)
+    mesh_data.vertices.foreach_get("co", positions)
+    update_array(hasher, positions)
+
+    loop_vertex_indices = np.empty(len(mesh_data.loops), dtype=np.int32)
+    mesh_data.loops.foreach_get("vertex_index", loop_vertex_indices)
+    update_array(hasher, loop_vertex_indices)
+
+    loop_normals = np.empty(len(mesh_data.loops) * 3, dtype=np.float32)
+    mesh_data.loops.foreach_get("normal", loop_normals)
+    update_array(hasher, loop_normals)
+
+    triangle_loops = np.empty(len(mesh_data.loop_triangles) * 3, dtype=np.int32)
+    mesh_data.loop_triangles.foreach_get("loops", triangle_loops)
+    update_array(hasher, triangle_loops)
+
+    if mesh_data.uv_layers:
+        uvs = np.empty(len(mesh_data.loops) * 2, dtype=np.float32)
+        mesh_data.uv_layers[0].data.foreach_get("uv", uvs)
+        update_array(hasher, uvs)
+
+    weights = vertex_weights.read_weights(mesh_data)
+    update_array(hasher, weights.vertex_indices)
+    update_array(hasher, weights.group_indices)
+    update_array(hasher, weights.weights)
+
+
+def mesh_fingerprint(mesh_object: bpy.types.Object, settings: tuple[object, ...] = ()) -> str:
+    """Fingerprint all the data of a mesh object that is used when exporting it, and the export settings."""
+    hasher = hashlib.sha256()
+    update_string(hasher, repr(settings))
+    update_mesh_data(hasher, mesh_object.data)
+
+    for vertex_group in mesh_object.vertex_groups:
+        update_string(hasher, vertex_group.name)
+
+    if mesh_object.parent is not None and mesh_object.parent.type == 'ARMATURE':
+        update_rest_pose(hasher, mesh_object.parent.data)
+
+    return hasher.hexdigest()
+
+
+def mesh_data_fingerprint(mesh_data: bpy.types.Mesh) -> str:
+    """Fingerprint the geometry, normals, uvs and weights of mesh data, to tell if it was edited."""
+    hasher = hashlib.sha256()
+    update_mesh_data(hasher, mesh_data)
+    return hasher.hexdigest()
+
+
+def action_fingerprint(
+    armature_object: bpy.types.Object,
+    action: bpy.types.Action,
+    samples: list[export_anim.BoneSamples],
+    settings: tuple[object, ...] = (),
+) -> str:
+    """Fingerprint the sampled channels, markers and target rest pose of an action, and the export settings."""
+    hasher = hashlib.sha256()
+    update_string(hasher, repr(settings))
+
+    update_array(hasher, np.array(action.frame_range, dtype=np.float32))
+    update_array(hasher, np.array([action.get("Distance", 0.0)], dtype=np.float32))
+
+    for bone_samples in samples:
+        update_string(hasher, bone_samples.bone_name)
+        for channel in (bone_samples.locations, bone_samples.rotations):
+            if channel is None:
+                update_string(hasher, "")
+            else:
+                update_array(hasher, channel)
+
+    for marker in action.pose_markers:
+        update_string(hasher, marker.name)
+        hasher.update(marker.frame.to_bytes(4, "little", signed=True))
+
+    update_rest_pose(hasher, armature_object.data)
+
+    return hasher.hexdigest()
+
+
+def mesh_content_fingerprint(
+    compact_mesh: mesh.CompactMesh,
+    armature: bpy.types.Armature,
+    settings: tuple[object, ...] = (),
+) -> str:
+    """Fingerprint the decoded contents of a mesh file, the rest pose it is imported onto and the import settings."""
+    hasher = hashlib.sha256()
+    update_string(hasher, repr(settings))
+
+    for bone_name in compact_mesh.bones:
+        update_string(hasher, bone_name)
+
+    for values in (
+        compact_mesh.faces,
+        compact_mesh.bone_bindings,
+        compact_mesh.uvs,
+        compact_mesh.blends,
+        compact_mesh.positions,
+        compact_mesh.normals,
+        compact_mesh.blend_positions,
+        compact_mesh.blend_normals,
+    ):
+        update_array(hasher, np.frombuffer(values, dtype=np.uint32 if values.typecode == 'I' else np.float32))
+
+    update_rest_pose(hasher, armature)
+
+    return hasher.hexdigest()
+
+
+def skel_content_fingerprint(skeleton: skel.Skel) -> str:
+    """Fingerprint the decoded contents of a skel file."""
+    hasher = hashlib.sha256()
+    update_string(hasher, skeleton.name)
+
+    for bone in skeleton.bones:
+        update_string(hasher, bone.name)
+        update_string(hasher, bone.parent)
+        update_array(hasher, np.array([*bone.translation, *bone.rotation], dtype=np.float32))
+        update_array(hasher, np.array([bone.can_translate, bone.can_rotate, bone.can_blend], dtype=np.int32))
+        update_array(hasher, np.array([bone.wiggle_value, bone.wiggle_power], dtype=np.float32))
+        for property_list in bone.property_lists:
+            update_string(hasher, "property list")
+            for prop in property_list.properties:
+                update_string(hasher, prop.name)
+                update_string(hasher, prop.value)
+
+    return hasher.hexdigest()
@@ -0,0 +1,239 @@
+"""Export .blend files without the user interface.
+
+Inside Blender, export the open .blend file:
+
+    blender -b scene.blend --python-expr "from io_scene_tso import headless; headless.export_main()" -- --output out
+
+or, without installing the add-on:
+
+    blender -b scene.blend -P io_scene_tso/headless.py -- --output out
+
+Outside of Blender, export many .blend files with one background Blender process each:
+
+    python -m io_scene_tso.headless --blender blender --output out --workers 4 *.blend
+
+Every export prints one JSON result line, and the exit code is 0 if all the .blend files were exported.
+"""
+
+import argparse
+import concurrent.futures
+import dataclasses
+import io
+import json
+import logging
+import pathlib
+import subprocess
+import sys
+
+
+RESULT_PREFIX = "TSO_EXPORT_RESULT "
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+
+
+def add_export_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the export options that are passed on to each Blender process."""
+    parser.add_argument("--output", type=pathlib.Path, required=True, help="the directory to export to")
+    parser.add_argument(
+        "--objects",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="only export meshes and the animations of armatures whose names match this pattern",
+    )
+    parser.add_argument(
+        "--actions",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="only export actions whose names match this pattern",
+    )
+    parser.add_argument("--no-meshes", action="store_true", help="do not export meshes")
+    parser.add_argument("--no-animations", action="store_true", help="do not export animations")
+    parser.add_argument("--incremental", action="store_true", help="only export what changed since the last export")
+    parser.add_argument("--compression-epsilon", type=float, default=0.0, help="the animation compression tolerance")
+    parser.add_argument(
+        "--optimize-vertex-cache",
+        action="store_true",
+        help="reorder the faces and vertices of meshes for the vertex cache",
+    )
+    parser.add_argument(
+        "--normalize-weights",
+        action="store_true",
+        help="limit vertices to their two largest bone weights instead of failing to export meshes with more",
+    )
+    parser.add_argument(
+        "--resample-frame-rate",
+        action="store_true",
+        help="resample animations from the frame rate of the scene to that of anim files",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="the number of threads converting animations in each Blender process",
+    )
+
+
+def export_arguments(args: argparse.Namespace, output: pathlib.Path) -> list[str]:
+    """Convert parsed export options back to arguments for a Blender process exporting to output."""
+    arguments = ["--output", str(output)]
+    for pattern in args.objects:
+        arguments += ["--objects", pattern]
+    for pattern in args.actions:
+        arguments += ["--actions", pattern]
+    if args.no_meshes:
+        arguments.append("--no-meshes")
+    if args.no_animations:
+        arguments.append("--no-animations")
+    if args.incremental:
+        arguments.append("--incremental")
+    arguments += ["--compression-epsilon", repr(args.compression_epsilon)]
+    if args.optimize_vertex_cache:
+        arguments.append("--optimize-vertex-cache")
+    if args.normalize_weights:
+        arguments.append("--normalize-weights")
+    if args.resample_frame_rate:
+        arguments.append("--resample-frame-rate")
+    arguments += ["--threads", str(args.threads)]
+    return arguments
+
+
+def export_blend(args: argparse.Namespace) -> dict:
+    """Export the open .blend file, returning the result."""
+    import bpy
+    from . import export_files
+
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.DEBUG)
+    log_stream = io.StringIO()
+    logger.addHandler(logging.StreamHandler(stream=log_stream))
+
+    args.output.mkdir(parents=True, exist_ok=True)
+
+    result = export_files.export_files(
+        bpy.context,
+        logger,
+        args.output,
+        export_meshes=not args.no_meshes,
+        export_animations=not args.no_animations,
+        incremental=args.incremental,
+        compression_epsilon=args.compression_epsilon,
+        object_patterns=tuple(args.objects),
+        action_patterns=tuple(args.actions),
+        optimize_vertex_cache=args.optimize_vertex_cache,
+        normalize_weights=args.normalize_weights,
+        resample_frame_rate=args.resample_frame_rate,
+        thread_count=args.threads,
+    )
+
+    return {
+        "blend": bpy.data.filepath,
+        "output": str(args.output),
+        "status": "invalid" if result.problems else "failed" if result.failed else "ok",
+        "written": result.written,
+        "unchanged": result.unchanged,
+        "failed": result.failed,
+        "problems": [dataclasses.asdict(problem) for problem in result.problems],
+        "notes": result.notes,
+        "messages": log_stream.getvalue().splitlines(),
+    }
+
+
+def export_main() -> int:
+    """Export the open .blend file with the options after -- on the Blender command line."""
+    parser = argparse.ArgumentParser(prog="blender -b file.blend -P headless.py --")
+    add_export_arguments(parser)
+    arguments = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    args = parser.parse_args(arguments)
+
+    try:
+        result = export_blend(args)
+    except Exception as exception:  # noqa: BLE001
+        import bpy
+
+        result = {"blend": bpy.data.filepath, "output": str(args.output), "status": "error", "error": repr(exception)}
+
+    print(RESULT_PREFIX + json.dumps(result), flush=True)  # noqa: T201
+
+    return EXIT_SUCCESS if result["status"] == "ok" else EXIT_FAILURE
+
+
+def run_blender(blender: str, blend_path: pathlib.Path, arguments: list[str]) -> dict:
+    """Export a .blend file in a background Blender process, returning its result."""
+    package_directory = pathlib.Path(__file__).resolve().parent.parent
+    expression = (
+        f"import sys; sys.path.insert(0, {str(package_directory)!r}); "
+        "from io_scene_tso import headless; sys.exit(headless.export_main())"
+    )
+    command = [blender, "-b", str(blend_path), "--python-exit-code", "1", "--python-expr", expression, "--", *arguments]
+
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, check=False)  # noqa: S603
+    except OSError as exception:
+        return {"blend": str(blend_path), "status": "error", "error": repr(exception)}
+
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line.removeprefix(RESULT_PREFIX))
+            result["blend"] = str(blend_path)
+            result["exit_code"] = process.returncode
+            return result
+
+    return {
+        "blend": str(blend_path),
+        "status": "error",
+        "error": "Blender exited without a result",
+        "exit_code": process.returncode,
+        "stderr": process.stderr[-4000:],
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Export .blend files in parallel background Blender processes, printing a JSON line per file."""
+    parser = argparse.ArgumentParser(prog="python -m io_scene_tso.headless", description=main.__doc__)
+    parser.add_argument("blend_files", nargs="+", type=pathlib.Path, help="the .blend files to export")
+    parser.add_argument("--blender", default="blender", help="the Blender executable")
+    parser.add_argument("--workers", type=int, default=1, help="the number of Blender processes to run at once")
+    add_export_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # each .blend file is exported to its own directory so the processes do not overwrite each other's files
+    blend_paths: dict[str, list[pathlib.Path]] = {}
+    for blend_path in args.blend_files:
+        blend_paths.setdefault(blend_path.stem.lower(), []).append(blend_path)
+    duplicates = [", ".join(map(str, paths)) for paths in blend_paths.values() if len(paths) > 1]
+    if duplicates:
+        parser.error(f"these .blend files would be exported to the same directory: {'; '.join(duplicates)}")
+
+    exit_code = EXIT_SUCCESS
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+        futures = [
+            executor.submit(
+                run_blender,
+                args.blender,
+                blend_path,
+                export_arguments(args, args.output / blend_path.stem),
+            )
+            for blend_path in args.blend_files
+        ]
+
+        for future in futures:
+            result = future.result()
+            if result["status"] != "ok":
+                exit_code = EXIT_FAILURE
+            print(json.dumps(result), flush=True)  # noqa: T201
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    if "bpy" in sys.modules:
+        # run with blender -P, so import the package to make the relative imports work
+        import importlib
+
+        sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+        sys.exit(importlib.import_module("io_scene_tso.headless").export_main())
+
+    sys.exit(main())
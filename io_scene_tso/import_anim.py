@@ -1,124 +1,353 @@
 """Import The Sims Online anim files."""
 
 import bpy
-import mathutils
+import dataclasses
+import numpy as np
 import pathlib
 
 from . import anim
+from . import profiling
+from . import resample
+from . import rest_pose
+from . import transforms
 from . import utils
 
 
-def create_fcurve_data(action: bpy.types.Action, data_path: str, index: int, count: int, data: list[float]) -> None:
-    """Create the fcurve data for all frames at once."""
+LINEAR_INTERPOLATION = 1  # the value of 'LINEAR' in the interpolation enum of keyframe points
+
+
+def create_fcurve_data(
+    action: bpy.types.Action,
+    data_path: str,
+    index: int,
+    count: int,
+    data: list[float] | np.ndarray,
+    *,
+    linear: bool = False,
+) -> None:
+    """Create the fcurve data for all frames at once, optionally interpolating linearly between them."""
     f_curve = action.fcurves.new(data_path, index=index)
     f_curve.keyframe_points.add(count=count)
     f_curve.keyframe_points.foreach_set("co", data)
+    if linear:
+        f_curve.keyframe_points.foreach_set("interpolation", np.full(count, LINEAR_INTERPOLATION, dtype=np.int32))
     f_curve.update()
 
 
+def reduce_keyframes(values: np.ndarray, error: float) -> np.ndarray:
+    """Get the indices of the frames to keep so linear interpolation between them stays within error of all values.
+
+    This is Douglas-Peucker, splitting every segment between kept frames at its worst frame at the same time.
+    """
+    count = len(values)
+    if count <= 2:
+        return np.arange(count)
+
+    frames = np.arange(count)
+    keep = np.zeros(count, dtype=bool)
+    keep[[0, -1]] = True
+
+    while True:
+        kept = np.flatnonzero(keep)
+        deviations = np.abs(np.interp(frames, kept, values[kept]) - values)
+
+        # the largest deviation of each segment, which starts at a kept frame and runs until the next one
+        segment_starts = kept[:-1]
+        segment_deviations = np.maximum.reduceat(deviations, segment_starts)
+        if not (segment_deviations > error).any():
+            return kept
+
+        segments = np.repeat(np.arange(len(segment_starts)), np.diff(np.append(segment_starts, count)))
+        worst = np.flatnonzero(
+            (deviations == segment_deviations[segments]) & (segment_deviations[segments] > error),
+        )
+        _, first_worst = np.unique(segments[worst], return_index=True)
+        keep[worst[first_worst]] = True
+
+
+def keyframe_data(frames: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Interleave frames and values into the co data of keyframe points."""
+    return np.column_stack((frames, values)).astype(np.float32).ravel()
+
+
+BONE_ROTATION_OFFSET_QUATERNION = np.array(utils.BONE_ROTATION_OFFSET.to_quaternion())
+
+
+def convert_motion(
+    animation: anim.CompactAnim,
+    motion: anim.Motion,
+    rest: rest_pose.RestPose,
+    bone_index: int,
+) -> tuple[np.ndarray | None, np.ndarray | None]:
+    """Convert all the frames of a motion to the pose locations and rotations of its bone."""
+    parent_matrix = rest.parent_matrices[bone_index]
+
+    # the bone matrix of each frame is parent @ translation @ rotation, in the pose space of the bone
+    rotation_offset = transforms.matrices_to_quaternions(rest.inverted_matrices[bone_index] @ parent_matrix)
+
+    if rest.use_local_locations[bone_index]:
+        location_matrix = rest.inverted_matrices[bone_index] @ parent_matrix
+    else:
+        location_matrix = parent_matrix.copy()
+        location_matrix[:3, 3] -= rest.matrices[bone_index][:3, 3]
+
+    locations = None
+    if motion.uses_positions:
+        translations = np.frombuffer(animation.translations, dtype=np.float32).reshape((-1, 3))
+        translations = translations[motion.position_offset : motion.position_offset + motion.frame_count]
+        translations = translations.astype(np.float64)
+        translations = translations[:, [0, 2, 1]] / utils.BONE_SCALE  # swap y and z
+        locations = transforms.transform_points(location_matrix, translations)
+
+    rotations = None
+    if motion.uses_rotations:
+        file_rotations = np.frombuffer(animation.rotations, dtype=np.float32).reshape((-1, 4))
+        file_rotations = file_rotations[motion.rotation_offset : motion.rotation_offset + motion.frame_count]
+        file_rotations = file_rotations.astype(np.float64)
+        file_rotations = file_rotations[:, [3, 0, 2, 1]]  # swap y and z
+        rotations = transforms.multiply_quaternions(
+            transforms.multiply_quaternions(rotation_offset, file_rotations),
+            BONE_ROTATION_OFFSET_QUATERNION,
+        )
+        rotations = transforms.canonical_quaternions(rotations)
+
+    return locations, rotations
+
+
+@dataclasses.dataclass
+class ChannelKeyframes:
+    """The keyframe points of a location or rotation channel of a bone."""
+
+    bone_name: str
+    property_name: str
+    index: int
+    count: int
+    data: np.ndarray  # interleaved frames and values
+    linear: bool
+
+
+def convert_animation(
+    animation: anim.CompactAnim,
+    rest: rest_pose.RestPose,
+    *,
+    keyframe_reduction_error: float = 0.0,
+    frame_time: float = resample.TSO_FRAME_TIME,
+) -> list[ChannelKeyframes]:
+    """Convert the motions of an anim to keyframes of the bones in a rest pose, without using Blender.
+
+    The motions are resampled to a keyframe every frame_time milliseconds if it is not the frame time of anim files.
+    This only uses numpy, so anims can be converted on other threads while actions are created on the main thread.
+    """
+    channel_keyframes = []
+
+    for motion in animation.motions:
+        bone_index = rest.bone_indices.get(motion.bone_name)
+        if bone_index is None:
+            continue
+
+        locations, rotations = convert_motion(animation, motion, rest, bone_index)
+        frame_count = motion.frame_count
+
+        if frame_time != resample.TSO_FRAME_TIME:
+            positions = resample.sample_positions(motion.frame_count, resample.TSO_FRAME_TIME, frame_time)
+            if locations is not None:
+                locations = resample.resample_linear(locations, positions)
+            if rotations is not None:
+                rotations = resample.resample_quaternions(rotations, positions)
+            frame_count = len(positions)
+
+        frames = np.arange(1, frame_count + 1, dtype=np.float32)
+
+        for channels, property_name in ((locations, "location"), (rotations, "rotation_quaternion")):
+            if channels is None:
+                continue
+
+            for index in range(channels.shape[1]):
+                values = channels[:, index]
+                if keyframe_reduction_error > 0.0:
+                    kept = reduce_keyframes(values, keyframe_reduction_error)
+                    data = keyframe_data(frames[kept], values[kept])
+                    count = len(kept)
+                else:
+                    data = keyframe_data(frames, values)
+                    count = frame_count
+                channel_keyframes.append(
+                    ChannelKeyframes(
+                        motion.bone_name,
+                        property_name,
+                        index,
+                        count,
+                        data,
+                        linear=keyframe_reduction_error > 0.0,
+                    ),
+                )
+
+    return channel_keyframes
+
+
+@dataclasses.dataclass
+class PreparedAnim:
+    """An anim file that was read and converted ahead of creating its action."""
+
+    animation: anim.CompactAnim
+    channel_keyframes: list[ChannelKeyframes]
+
+
+def prepare_anim(
+    file_path: utils.FilePath,
+    rest: rest_pose.RestPose,
+    *,
+    keyframe_reduction_error: float = 0.0,
+    frame_time: float = resample.TSO_FRAME_TIME,
+) -> PreparedAnim:
+    """Read an anim file and convert it for a rest pose, without using Blender so it can run on any thread."""
+    animation = anim.read_compact_file(file_path)
+    return PreparedAnim(
+        animation,
+        convert_animation(
+            animation,
+            rest,
+            keyframe_reduction_error=keyframe_reduction_error,
+            frame_time=frame_time,
+        ),
+    )
+
+
+def anim_frame_count(animation: anim.AnimHeader | anim.CompactAnim) -> int:
+    """Get the number of frames of an anim from its first motion, or from its duration if it has no motions."""
+    if animation.motions:
+        return animation.motions[0].frame_count
+    return max(round(animation.duration / resample.TSO_FRAME_TIME), 1)
+
+
 MAX_TIMELINE_MARKER_NAME_LENGTH = 63  # 64 - null
+EVENT_FRAME_TIME = 33.333333  # the frame time events were always imported with, slightly short so ties round up
+
+LAZY_PATH_PROPERTY = "tso_lazy_path"
+LAZY_REDUCTION_ERROR_PROPERTY = "tso_lazy_reduction_error"
+LAZY_FRAME_TIME_PROPERTY = "tso_lazy_frame_time"
 
 
 def import_anim(
     context: bpy.types.Context,
-    file_path: pathlib.Path,
+    file_path: utils.FilePath,
     armature_object: bpy.types.Object,
+    *,
+    lazy: bool = False,
+    keyframe_reduction_error: float = 0.0,
+    tracer: profiling.Tracer | None = None,
+    prepared: PreparedAnim | None = None,
+    resample_frame_rate: bool = False,
 ) -> None:
-    """Import an anim file."""
-    animation = anim.read_file(file_path)
+    """Import an anim file, or one that was read and converted ahead.
+
+    When lazy only the header of the file is read, and the action is left empty until it is used. Files in memory
+    are always read completely, as there is no path to load them from later.
+
+    When keyframe_reduction_error is above 0, keyframes that linear interpolation can recreate within that error
+    are not created. With a tracer, reading the file and creating the action data are recorded as separate stages.
+
+    The scene frame rate is set to that of anim files, unless resample_frame_rate is set and the motions are resampled
+    to the frame rate of the scene instead. Anims prepared ahead must be converted for the same frame rate.
+    """
+    lazy = lazy and prepared is None and isinstance(file_path, pathlib.Path)
+
+    if prepared is not None:
+        animation = prepared.animation
+    else:
+        with profiling.stage(tracer, "read anim", file_path):
+            animation = anim.read_header_file(file_path) if lazy else anim.read_compact_file(file_path)
 
     if animation.name in bpy.data.actions:
         return
 
     armature_object.animation_data_create()
 
-    armature_object.animation_data.action = bpy.data.actions.new(name=animation.name)
-    action = armature_object.animation_data.action
+    action = bpy.data.actions.new(name=animation.name)
+
+    frame_time = (
+        resample.frame_time(context.scene.render.fps, context.scene.render.fps_base)
+        if resample_frame_rate
+        else resample.TSO_FRAME_TIME
+    )
+    frame_count = resample.resampled_frame_count(anim_frame_count(animation), resample.TSO_FRAME_TIME, frame_time)
 
-    action.frame_range = (1.0, animation.motions[0].frame_count)
+    action.frame_range = (1.0, frame_count)
 
     action["Distance"] = animation.distance
 
-    for motion in animation.motions:
-        bone = armature_object.pose.bones.get(motion.bone_name)
-        if bone is None:
-            continue
+    if lazy:
+        action[LAZY_PATH_PROPERTY] = str(file_path.absolute())
+        if keyframe_reduction_error > 0.0:
+            action[LAZY_REDUCTION_ERROR_PROPERTY] = keyframe_reduction_error
+        if frame_time != resample.TSO_FRAME_TIME:
+            action[LAZY_FRAME_TIME_PROPERTY] = frame_time
+    else:
+        armature_object.animation_data.action = action
+        with profiling.stage(tracer, "create action data", file_path):
+            create_action_data(
+                armature_object,
+                action,
+                animation,
+                keyframe_reduction_error=keyframe_reduction_error,
+                channel_keyframes=prepared.channel_keyframes if prepared is not None else None,
+                frame_time=frame_time,
+            )
 
-        parent_bone_matrix = mathutils.Matrix()
-        if bone.parent:
-            parent_bone_matrix = bone.parent.bone.matrix_local @ utils.BONE_ROTATION_OFFSET_INVERTED
-
-        positions_x: list[float] = []
-        positions_y: list[float] = []
-        positions_z: list[float] = []
-        rotations_w: list[float] = []
-        rotations_x: list[float] = []
-        rotations_y: list[float] = []
-        rotations_z: list[float] = []
-
-        for frame in range(motion.frame_count):
-            translation = mathutils.Matrix()
-            if motion.uses_positions:
-                translation = animation.translations[motion.position_offset + frame]
-                translation = mathutils.Matrix.Translation(
-                    mathutils.Vector(
-                        (
-                            translation[0] / utils.BONE_SCALE,
-                            translation[2] / utils.BONE_SCALE,  # swap y and z
-                            translation[1] / utils.BONE_SCALE,
-                        ),
-                    ),
-                )
+    track = armature_object.animation_data.nla_tracks.new(prev=None)
+    track.name = animation.name
+    track.strips.new(animation.name, 1, action)
+    track.mute = True
 
-            rotation = mathutils.Matrix()
-            if motion.uses_rotations:
-                rotation = animation.rotations[motion.rotation_offset + frame]
-                rotation = (
-                    mathutils.Quaternion(
-                        (
-                            rotation[3],
-                            rotation[0],
-                            rotation[2],  # swap y and z
-                            rotation[1],
-                        ),
-                    )
-                    .to_matrix()
-                    .to_4x4()
-                )
+    # at the frame rate of anim files, so exporting or importing with resampling later does not resample again
+    if not resample_frame_rate:
+        context.scene.render.fps = resample.TSO_FPS
+        context.scene.render.fps_base = 1.0
+    context.scene.frame_end = max(context.scene.frame_end, frame_count)
 
-            bone_matrix = parent_bone_matrix @ (translation @ rotation)
-            bone_matrix = bone.bone.convert_local_to_pose(
-                bone_matrix,
-                bone.bone.matrix_local,
-                invert=True,
-            )
-            bone_matrix @= utils.BONE_ROTATION_OFFSET
-
-            if motion.uses_positions:
-                translation = bone_matrix.to_translation()
-                positions_x += (float(frame + 1), translation.x)
-                positions_y += (float(frame + 1), translation.y)
-                positions_z += (float(frame + 1), translation.z)
-
-            if motion.uses_rotations:
-                rotation = bone_matrix.to_quaternion()
-                rotations_w += (float(frame + 1), rotation.w)
-                rotations_x += (float(frame + 1), rotation.x)
-                rotations_y += (float(frame + 1), rotation.y)
-                rotations_z += (float(frame + 1), rotation.z)
-
-        if motion.uses_positions:
-            data_path = bone.path_from_id("location")
-            create_fcurve_data(action, data_path, 0, motion.frame_count, positions_x)
-            create_fcurve_data(action, data_path, 1, motion.frame_count, positions_y)
-            create_fcurve_data(action, data_path, 2, motion.frame_count, positions_z)
-
-        if motion.uses_rotations:
-            data_path = bone.path_from_id("rotation_quaternion")
-            create_fcurve_data(action, data_path, 0, motion.frame_count, rotations_w)
-            create_fcurve_data(action, data_path, 1, motion.frame_count, rotations_x)
-            create_fcurve_data(action, data_path, 2, motion.frame_count, rotations_y)
-            create_fcurve_data(action, data_path, 3, motion.frame_count, rotations_z)
+
+def event_frame(time: int, frame_time: float = resample.TSO_FRAME_TIME) -> int:
+    """Get the frame nearest to the time of an event in milliseconds, counting from frame 1.
+
+    Without resampling, events are placed on the same frames they have always been imported on.
+    """
+    if frame_time == resample.TSO_FRAME_TIME:
+        return round(time / EVENT_FRAME_TIME) + 1
+    return round(time / frame_time) + 1
+
+
+def create_action_data(
+    armature_object: bpy.types.Object,
+    action: bpy.types.Action,
+    animation: anim.CompactAnim,
+    *,
+    keyframe_reduction_error: float = 0.0,
+    channel_keyframes: list[ChannelKeyframes] | None = None,
+    frame_time: float = resample.TSO_FRAME_TIME,
+) -> None:
+    """Create the fcurves and pose markers of an action from an anim, optionally reducing the keyframes.
+
+    The keyframes are converted from the anim unless they were converted ahead, and events are placed on the frames
+    nearest to their times at frame_time milliseconds per frame.
+    """
+    if channel_keyframes is None:
+        channel_keyframes = convert_animation(
+            animation,
+            rest_pose.get(armature_object.data),
+            keyframe_reduction_error=keyframe_reduction_error,
+            frame_time=frame_time,
+        )
+
+    for keyframes in channel_keyframes:
+        data_path = armature_object.pose.bones[keyframes.bone_name].path_from_id(keyframes.property_name)
+        create_fcurve_data(
+            action,
+            data_path,
+            keyframes.index,
+            keyframes.count,
+            keyframes.data,
+            linear=keyframes.linear,
+        )
 
     # create a single default keyframe for any locations or rotations not used by the animation
     for bone in armature_object.pose.bones:
@@ -141,7 +370,7 @@ def import_anim(
                 for property_list in time_property.property_lists:
                     for event in property_list.properties:
                         event_string = f"{motion.bone_name} {event.name} {event.value}"
-                        frame = int(round(time_property.time / 33.333333)) + 1
+                        frame = event_frame(time_property.time, frame_time)
 
                         markers = [x for x in action.pose_markers if x.frame == frame]
 
@@ -155,11 +384,3 @@ def import_anim(
                             else:
                                 marker = action.pose_markers.new(name=event_string)
                                 marker.frame = frame
-
-    track = armature_object.animation_data.nla_tracks.new(prev=None)
-    track.name = animation.name
-    track.strips.new(animation.name, 1, action)
-    track.mute = True
-
-    context.scene.render.fps = 33
-    context.scene.frame_end = max(context.scene.frame_end, animation.motions[0].frame_count)
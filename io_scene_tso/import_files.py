@@ -1,23 +1,165 @@
 """Import The Sims Online 3D files."""
 
 import bpy
+import collections
+import concurrent.futures
+import fnmatch
+import itertools
 import logging
 import pathlib
+import typing
 
+from . import anim
+from . import far
 from . import import_anim
 from . import import_mesh
 from . import import_skel
+from . import mesh
+from . import prefetch
+from . import profiling
+from . import resample
+from . import rest_pose
 from . import utils
 
 
+ARCHIVE_SUFFIXES = (".far", ".dat")
+MEMBER_SUFFIXES = (".skel", ".mesh", ".anim")
+
+
+def expand_archives(
+    logger: logging.Logger,
+    file_paths: list[utils.FilePath],
+    member_patterns: tuple[str, ...] = (),
+) -> list[utils.FilePath]:
+    """Replace archives with their skel, mesh and anim members, or the ones whose names match patterns.
+
+    The stored data of the members is read before the archive is closed, and they are decompressed when they are
+    imported, without extracting them.
+    """
+    expanded_paths = []
+
+    for file_path in file_paths:
+        if file_path.suffix.lower() not in ARCHIVE_SUFFIXES:
+            expanded_paths.append(file_path)
+            continue
+
+        try:
+            archive = far.read_file(file_path)
+        except utils.FileReadError as _:
+            logger.info(f"Could not read the archive {file_path}")  # noqa: G004
+            continue
+
+        with archive:
+            for member in archive.members():
+                if member.suffix.lower() not in MEMBER_SUFFIXES:
+                    continue
+                if member_patterns and not any(fnmatch.fnmatchcase(member.name, glob) for glob in member_patterns):
+                    continue
+                member.load()
+                expanded_paths.append(member)
+
+    return expanded_paths
+
+
+def prepare_anims_ahead(
+    executor: concurrent.futures.Executor,
+    file_paths: list[utils.FilePath],
+    rest: rest_pose.RestPose,
+    *,
+    keyframe_reduction_error: float,
+    frame_time: float,
+    lookahead: int,
+) -> typing.Iterator[concurrent.futures.Future[import_anim.PreparedAnim]]:
+    """Read and convert anim files on worker threads, at most lookahead files ahead of the one being imported.
+
+    The futures are yielded in the order of the files.
+    """
+    remaining_paths = iter(file_paths)
+    pending = collections.deque()
+
+    def submit(file_path: utils.FilePath) -> None:
+        pending.append(
+            executor.submit(
+                import_anim.prepare_anim,
+                file_path,
+                rest,
+                keyframe_reduction_error=keyframe_reduction_error,
+                frame_time=frame_time,
+            ),
+        )
+
+    for file_path in itertools.islice(remaining_paths, lookahead):
+        submit(file_path)
+
+    while pending:
+        future = pending.popleft()
+        file_path = next(remaining_paths, None)
+        if file_path is not None:
+            submit(file_path)
+        yield future
+
+
 def import_files(
     context: bpy.types.Context,
     logger: logging.Logger,
-    file_paths: list[pathlib.Path],
+    file_paths: list[utils.FilePath],
     *,
     cleanup_meshes: bool,
+    lazy_animations: bool = False,
+    keyframe_reduction_error: float = 0.0,
+    resample_frame_rate: bool = False,
+    unique_mesh_data: bool = False,
+    unique_armature_data: bool = False,
+    import_textures: bool = False,
+    texture_directory: pathlib.Path | None = None,
+    tracer: profiling.Tracer | None = None,
+    thread_count: int = 1,
+    prefetch_count: int = 0,
 ) -> None:
-    """Import all the selected files."""
+    """Import all the selected files, recording the memory used by each with a tracer."""
+    for _ in import_files_iter(
+        context,
+        logger,
+        file_paths,
+        cleanup_meshes=cleanup_meshes,
+        lazy_animations=lazy_animations,
+        keyframe_reduction_error=keyframe_reduction_error,
+        resample_frame_rate=resample_frame_rate,
+        unique_mesh_data=unique_mesh_data,
+        unique_armature_data=unique_armature_data,
+        import_textures=import_textures,
+        texture_directory=texture_directory,
+        tracer=tracer,
+        thread_count=thread_count,
+        prefetch_count=prefetch_count,
+    ):
+        pass
+
+
+def import_files_iter(
+    context: bpy.types.Context,
+    logger: logging.Logger,
+    file_paths: list[utils.FilePath],
+    *,
+    cleanup_meshes: bool,
+    lazy_animations: bool = False,
+    keyframe_reduction_error: float = 0.0,
+    resample_frame_rate: bool = False,
+    unique_mesh_data: bool = False,
+    unique_armature_data: bool = False,
+    import_textures: bool = False,
+    texture_directory: pathlib.Path | None = None,
+    tracer: profiling.Tracer | None = None,
+    thread_count: int = 1,
+    prefetch_count: int = 0,
+) -> typing.Iterator[utils.FilePath]:
+    """Import the selected files one at a time, yielding the path of each file after it is processed.
+
+    Closing the generator early stops importing, and still sets up the meshes imported so far. With more than one
+    thread, anim files that are not lazily imported are read and converted on worker threads ahead of creating their
+    actions. With a prefetch count, up to that many of the next mesh and anim files are read in background threads
+    while the current one is imported.
+    """
     if bpy.ops.object.mode_set.poll():
         bpy.ops.object.mode_set(mode='OBJECT')
 
@@ -25,45 +167,179 @@ def import_files(
         bpy.ops.object.select_all(action='DESELECT')
 
     for file_path in file_paths:
+        if file_path.suffix.lower() != ".skel":
+            continue
+
         try:
-            if file_path.suffix == ".skel":
-                context.view_layer.objects.active = import_skel.import_skel(context, file_path)
+            with profiling.stage(tracer, "import skel", file_path):
+                context.view_layer.objects.active = import_skel.import_skel(
+                    context,
+                    file_path,
+                    unique_armature_data=unique_armature_data,
+                )
 
-        except utils.FileReadError as _:  # noqa: PERF203
+        except utils.FileReadError as _:
             logger.info(f"Could not import {file_path}")  # noqa: G004
 
+        yield file_path
+
     active_armature = context.view_layer.objects.active
 
+    executor = None
+    prepared_anims = iter(())
+    if thread_count > 1 and not lazy_animations and active_armature is not None and active_armature.type == 'ARMATURE':
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=thread_count)
+        prepared_anims = prepare_anims_ahead(
+            executor,
+            [file_path for file_path in file_paths if file_path.suffix.lower() == ".anim"],
+            rest_pose.get(active_armature.data),
+            keyframe_reduction_error=keyframe_reduction_error,
+            frame_time=(
+                resample.frame_time(context.scene.render.fps, context.scene.render.fps_base)
+                if resample_frame_rate
+                else resample.TSO_FRAME_TIME
+            ),
+            lookahead=2 * thread_count,
+        )
+
+    # anims converted on worker threads are read there, and lazy anims only need their headers
+    prefetch_suffixes = (".mesh",) if executor is not None or lazy_animations else (".mesh", ".anim")
+    prefetch_executor = None
+    read_paths = iter(file_paths)
+    if prefetch_count > 0:
+        prefetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=prefetch_count)
+        read_paths = prefetch.read_ahead(
+            prefetch_executor,
+            file_paths,
+            suffixes=prefetch_suffixes,
+            lookahead=prefetch_count,
+        )
+
     mesh_objects = []
+    missing_textures = []
+    # objects using the mesh data of an earlier import, which was already cleaned up
+    shared_mesh_objects = []
 
-    for file_path in file_paths:
-        if active_armature is not None and active_armature.type == 'ARMATURE':
-            try:
-                if file_path.suffix == ".mesh":
-                    mesh_objects.append(import_mesh.import_mesh(context, logger, file_path, active_armature))
+    try:
+        for file_path, read_path in zip(file_paths, read_paths, strict=True):
+            if file_path.suffix.lower() == ".skel":
+                continue
+
+            if active_armature is not None and active_armature.type == 'ARMATURE':
+                try:
+                    # take the prepared anim of every anim file, even the ones that are skipped
+                    prepared_anim = next(prepared_anims, None) if file_path.suffix.lower() == ".anim" else None
+
+                    if not can_import(logger, read_path, active_armature):
+                        yield file_path
+                        continue
+
+                    if file_path.suffix.lower() == ".mesh":
+                        with profiling.stage(tracer, "import mesh", file_path):
+                            mesh_object = import_mesh.import_mesh(
+                                context,
+                                logger,
+                                read_path,
+                                active_armature,
+                                cleanup_meshes=cleanup_meshes,
+                                unique_mesh_data=unique_mesh_data,
+                                import_textures=import_textures,
+                                texture_directory=texture_directory,
+                                missing_textures=missing_textures,
+                            )
+                        if mesh_object is not None and mesh_object.data.users > 1:
+                            shared_mesh_objects.append(mesh_object)
+                        mesh_objects.append(mesh_object)
+
+                    if file_path.suffix.lower() == ".anim":
+                        with profiling.stage(tracer, "import anim", file_path):
+                            import_anim.import_anim(
+                                context,
+                                read_path,
+                                active_armature,
+                                lazy=lazy_animations,
+                                keyframe_reduction_error=keyframe_reduction_error,
+                                tracer=tracer,
+                                prepared=prepared_anim.result() if prepared_anim is not None else None,
+                                resample_frame_rate=resample_frame_rate,
+                            )
+
+                except utils.FileReadError as _:
+                    logger.info(f"Could not import {file_path}")  # noqa: G004
+
+            else:
+                logger.info("Please select an armature to apply the mesh or animation to.")
+                break
+
+            yield file_path
+
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if prefetch_executor is not None:
+            prefetch_executor.shutdown(cancel_futures=True)
+
+        with profiling.stage(tracer, "finish meshes"):
+            finish_meshes(
+                context,
+                active_armature,
+                mesh_objects,
+                shared_mesh_objects,
+                cleanup_meshes=cleanup_meshes,
+            )
 
-                if file_path.suffix == ".anim":
-                    import_anim.import_anim(context, file_path, active_armature)
+        if missing_textures:
+            logger.info(f"Found no textures for meshes {', '.join(missing_textures)}")  # noqa: G004
 
-            except utils.FileReadError as _:
-                logger.info(f"Could not import {file_path}")  # noqa: G004
 
-        else:
-            logger.info("Please select an armature to apply the mesh or animation to.")
-            break
+def can_import(
+    logger: logging.Logger,
+    file_path: utils.FilePath,
+    armature_object: bpy.types.Object,
+) -> bool:
+    """Check if a mesh or anim file can be imported from its header, without decoding the rest of the file."""
+    if file_path.suffix.lower() == ".mesh":
+        header = mesh.read_header_file(file_path)
+        if not all(bone in armature_object.data.bones for bone in header.bones):
+            logger.info(
+                f"Could not apply mesh {file_path.stem} to armature {armature_object.name}. The bones do not match.",  # noqa: G004
+            )
+            return False
+
+    if file_path.suffix.lower() == ".anim":
+        header = anim.read_header_file(file_path)
+        if header.name in bpy.data.actions:
+            return False
+
+    return True
+
 
+def finish_meshes(
+    context: bpy.types.Context,
+    active_armature: bpy.types.Object | None,
+    mesh_objects: list[bpy.types.Object | None],
+    shared_mesh_objects: list[bpy.types.Object],
+    *,
+    cleanup_meshes: bool,
+) -> None:
+    """Clean up the imported meshes that do not share mesh data with earlier imports, and parent them to the armature.
+
+    Parenting gives each object its own armature modifier, including the objects that share mesh data. The geometry
+    fingerprint of cleaned up mesh data is updated, so later imports can still share it.
+    """
     mesh_objects = [obj for obj in mesh_objects if obj is not None]
+    cleanup_objects = [obj for obj in mesh_objects if obj not in shared_mesh_objects]
 
     if active_armature is not None and active_armature.type == 'ARMATURE' and mesh_objects:
         previous_active_object = context.view_layer.objects.active
 
         bpy.ops.object.select_all(action='DESELECT')
 
-        for mesh_object in mesh_objects:
+        for mesh_object in cleanup_objects:
             mesh_object.select_set(state=True)
 
-        if cleanup_meshes:
-            context.view_layer.objects.active = mesh_objects[0]
+        if cleanup_meshes and cleanup_objects:
+            context.view_layer.objects.active = cleanup_objects[0]
             bpy.ops.object.mode_set(mode='EDIT')
 
             bpy.ops.mesh.select_mode(use_extend=False, use_expand=False, type='VERT')
@@ -78,9 +354,14 @@ def import_files(
 
             bpy.ops.object.mode_set(mode='OBJECT')
 
-            for obj in mesh_objects:
+            for obj in cleanup_objects:
                 context.view_layer.objects.active = obj
                 bpy.ops.mesh.customdata_custom_splitnormals_clear()
+                if import_mesh.GEOMETRY_HASH_PROPERTY in obj.data:
+                    import_mesh.set_geometry_hash(obj.data)
+
+        for mesh_object in mesh_objects:
+            mesh_object.select_set(state=True)
 
         active_armature.select_set(state=True)
         context.view_layer.objects.active = active_armature
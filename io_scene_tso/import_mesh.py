@@ -4,83 +4,163 @@ import bmesh
 import bpy
 import logging
 import math
-import mathutils
+import numpy as np
 import pathlib
 
+from . import fingerprint
 from . import mesh
+from . import rest_pose
+from . import textures
+from . import transforms
 from . import utils
 
 
+CONTENT_HASH_PROPERTY = "tso_content_hash"
+GEOMETRY_HASH_PROPERTY = "tso_geometry_hash"
+GEOMETRY_SIZE_PROPERTY = "tso_geometry_size"
+
+
+def geometry_size(mesh_data: bpy.types.Mesh) -> list[int]:
+    """Get the element counts of mesh data, which are cheap to compare before fingerprinting it."""
+    return [len(mesh_data.vertices), len(mesh_data.edges), len(mesh_data.loops), len(mesh_data.polygons)]
+
+
+def set_geometry_hash(mesh_data: bpy.types.Mesh) -> None:
+    """Record the geometry of mesh data, so it can be shared by later imports until it is edited."""
+    mesh_data[GEOMETRY_HASH_PROPERTY] = fingerprint.mesh_data_fingerprint(mesh_data)
+    mesh_data[GEOMETRY_SIZE_PROPERTY] = geometry_size(mesh_data)
+
+
+def find_mesh(content_hash: str) -> bpy.types.Mesh | None:
+    """Find a mesh imported from the same content onto the same rest pose, which is used and has not been edited."""
+    for mesh_data in bpy.data.meshes:
+        if mesh_data.get(CONTENT_HASH_PROPERTY) != content_hash or mesh_data.users == 0:
+            continue
+        # only fingerprint the candidates whose element counts have not changed since they were imported
+        size = mesh_data.get(GEOMETRY_SIZE_PROPERTY)
+        if size is None or list(size) != geometry_size(mesh_data):
+            continue
+        if mesh_data.get(GEOMETRY_HASH_PROPERTY) == fingerprint.mesh_data_fingerprint(mesh_data):
+            return mesh_data
+    return None
+
+
 def import_mesh(
     context: bpy.types.Context,
     logger: logging.Logger,
-    file_path: pathlib.Path,
+    file_path: utils.FilePath,
     armature_object: bpy.types.Object,
+    *,
+    cleanup_meshes: bool = True,
+    unique_mesh_data: bool = False,
+    import_textures: bool = False,
+    texture_directory: pathlib.Path | None = None,
+    missing_textures: list[str] | None = None,
 ) -> bpy.types.Object | None:
-    """Import a mesh file."""
-    mesh_desc = mesh.read_file(file_path)
+    """Import a mesh file.
+
+    Unless unique_mesh_data is set, the mesh data of an earlier import of the same mesh onto the same rest pose is
+    shared instead of creating a copy. Shared mesh data is already cleaned up, so it has more than one user.
+
+    With import_textures, the image with the same name as the mesh is looked up in the texture directory and next to
+    the mesh file, and the names of meshes without one are added to missing_textures.
+    """
+    compact_mesh = mesh.read_compact_file(file_path)
 
     armature = armature_object.data
 
-    if not all(bone in armature.bones for bone in mesh_desc.bones):
+    if not all(bone in armature.bones for bone in compact_mesh.bones):
         logger.info(
             f"Could not apply mesh {file_path.stem} to armature {armature_object.name}. The bones do not match.",  # noqa: G004
         )
         return None
 
+    content_hash = fingerprint.mesh_content_fingerprint(compact_mesh, armature, (cleanup_meshes,))
+    shared_mesh = None if unique_mesh_data else find_mesh(content_hash)
+
+    if shared_mesh is not None:
+        obj = bpy.data.objects.new(file_path.stem, shared_mesh)
+        context.collection.objects.link(obj)
+
+        # the vertex group names are stored in the mesh data, so objects sharing it already have them
+        if not obj.vertex_groups:
+            for bone_index in compact_mesh.bone_bindings[::5]:
+                obj.vertex_groups.new(name=compact_mesh.bones[min(bone_index, len(compact_mesh.bones) - 1)])
+
+        obj.location = armature_object.location
+        obj.rotation_euler = armature_object.rotation_euler
+        obj.scale = armature_object.scale
+
+        if import_textures:
+            apply_texture(obj, file_path, texture_directory, missing_textures)
+
+        return obj
+
     obj_mesh = bpy.data.meshes.new(file_path.stem)
     obj = bpy.data.objects.new(file_path.stem, obj_mesh)
 
+    if not unique_mesh_data:
+        obj_mesh[CONTENT_HASH_PROPERTY] = content_hash
+
     context.collection.objects.link(obj)
 
+    bone_bindings = np.frombuffer(compact_mesh.bone_bindings, dtype=np.uint32).reshape((-1, 5)).tolist()
+    file_positions = np.frombuffer(compact_mesh.positions, dtype=np.float32).reshape((-1, 3)).astype(np.float64)
+    file_normals = np.frombuffer(compact_mesh.normals, dtype=np.float32).reshape((-1, 3)).astype(np.float64)
+    blends = np.frombuffer(compact_mesh.blends, dtype=np.uint32).reshape((-1, 2)).tolist()
+    uvs = np.frombuffer(compact_mesh.uvs, dtype=np.float32).reshape((-1, 2)).tolist()
+
     b_mesh = bmesh.new()
 
     normals = []
     deform_layer = b_mesh.verts.layers.deform.verify()
 
-    for bone_binding in mesh_desc.bone_bindings:
-        bone_name = mesh_desc.bones[min(bone_binding.bone_index, len(mesh_desc.bones) - 1)]
+    rest = rest_pose.get(armature)
+
+    for bone_binding_index, vertex_index, vertex_count, _, _ in bone_bindings:
+        bone_name = compact_mesh.bones[min(bone_binding_index, len(compact_mesh.bones) - 1)]
 
-        armature_bone = armature.bones[bone_name]
-        bone_matrix = armature_bone.matrix_local @ utils.BONE_ROTATION_OFFSET_INVERTED
+        bone_index = rest.bone_indices[bone_name]
 
         vertex_group = obj.vertex_groups.new(name=bone_name)
 
-        vertex_index_start = bone_binding.vertex_index
-        vertex_index_end = vertex_index_start + bone_binding.vertex_count
-        for vertex in mesh_desc.vertices[vertex_index_start:vertex_index_end]:
-            position = mathutils.Vector(vertex.position).xzy / utils.BONE_SCALE
-            b_mesh_vertex = b_mesh.verts.new(bone_matrix @ position)
+        vertex_index_end = vertex_index + vertex_count
 
-            bone_matrix_normal = bone_matrix.to_quaternion().to_matrix().to_4x4()
-            normal = bone_matrix_normal @ mathutils.Vector(vertex.normal).xzy
-            normals.append(normal)
+        positions = transforms.transform_points(
+            rest.bone_matrices[bone_index],
+            file_positions[vertex_index:vertex_index_end, [0, 2, 1]] / utils.BONE_SCALE,
+        )
 
+        binding_normals = transforms.transform_directions(
+            rest.normal_matrices[bone_index],
+            file_normals[vertex_index:vertex_index_end, [0, 2, 1]],
+        )
+        normals += binding_normals.tolist()
+
+        for position in positions.tolist():
+            b_mesh_vertex = b_mesh.verts.new(position)
             b_mesh_vertex[deform_layer][vertex_group.index] = 1.0
 
     b_mesh.verts.ensure_lookup_table()
     b_mesh.verts.index_update()
 
-    for bone_binding in mesh_desc.bone_bindings:
-        bone_name = mesh_desc.bones[min(bone_binding.bone_index, len(mesh_desc.bones) - 1)]
+    for bone_binding_index, _, _, blended_vertex_index, blended_vertex_count in bone_bindings:
+        bone_name = compact_mesh.bones[min(bone_binding_index, len(compact_mesh.bones) - 1)]
         vertex_group = obj.vertex_groups[bone_name]
 
-        blend_index_start = bone_binding.blended_vertex_index
-        blend_index_end = blend_index_start + bone_binding.blended_vertex_count
-        for blend in mesh_desc.blends[blend_index_start:blend_index_end]:
-            for inner_bone_binding in mesh_desc.bone_bindings:
-                vertex_index_start = inner_bone_binding.vertex_index
-                vertex_index_end = vertex_index_start + inner_bone_binding.vertex_count
-                if blend.vertex_index >= vertex_index_start and blend.vertex_index < vertex_index_end:
-                    original_bone_name = mesh_desc.bones[inner_bone_binding.bone_index]
+        blend_index_end = blended_vertex_index + blended_vertex_count
+        for blend_weight, blend_vertex_index in blends[blended_vertex_index:blend_index_end]:
+            for inner_bone_index, vertex_index, vertex_count, _, _ in bone_bindings:
+                if vertex_index <= blend_vertex_index < vertex_index + vertex_count:
+                    original_bone_name = compact_mesh.bones[inner_bone_index]
 
             original_vertex_group = obj.vertex_groups[original_bone_name]
-            weight = float(blend.weight) * math.pow(2, -15)
-            b_mesh.verts[blend.vertex_index][deform_layer][original_vertex_group.index] = 1 - weight
-            b_mesh.verts[blend.vertex_index][deform_layer][vertex_group.index] = weight
+            weight = float(blend_weight) * math.pow(2, -15)
+            b_mesh.verts[blend_vertex_index][deform_layer][original_vertex_group.index] = 1 - weight
+            b_mesh.verts[blend_vertex_index][deform_layer][vertex_group.index] = weight
 
     invalid_face_count = 0
-    for face in mesh_desc.faces:
+    for face in np.frombuffer(compact_mesh.faces, dtype=np.uint32).reshape((-1, 3)).tolist():
         try:
             b_mesh.faces.new((b_mesh.verts[face[2]], b_mesh.verts[face[1]], b_mesh.verts[face[0]]))
         except ValueError as _:  # noqa: PERF203
@@ -92,7 +172,7 @@ def import_mesh(
     uv_layer = b_mesh.loops.layers.uv.verify()
     for face in b_mesh.faces:
         for loop in face.loops:
-            uv = mesh_desc.uvs[loop.vert.index]
+            uv = uvs[loop.vert.index]
             loop[uv_layer].uv = (uv[0], 1 - uv[1])
 
     b_mesh.to_mesh(obj_mesh)
@@ -100,8 +180,25 @@ def import_mesh(
 
     obj_mesh.normals_split_custom_set_from_vertices(normals)
 
+    if not unique_mesh_data:
+        set_geometry_hash(obj_mesh)
+
     obj.location = armature_object.location
     obj.rotation_euler = armature_object.rotation_euler
     obj.scale = armature_object.scale
 
+    if import_textures:
+        apply_texture(obj, file_path, texture_directory, missing_textures)
+
     return obj
+
+
+def apply_texture(
+    obj: bpy.types.Object,
+    file_path: utils.FilePath,
+    texture_directory: pathlib.Path | None,
+    missing_textures: list[str] | None,
+) -> None:
+    """Give a mesh object the material of its texture, recording its name if it has none."""
+    if not textures.apply_texture(obj, file_path, texture_directory) and missing_textures is not None:
+        missing_textures.append(file_path.stem)
@@ -4,19 +4,51 @@ import bpy
 import copy
 import math
 import mathutils
-import pathlib
 
+from . import fingerprint
 from . import skel
 from . import utils
 
 
+CONTENT_HASH_PROPERTY = "tso_content_hash"
+REST_POSE_HASH_PROPERTY = "tso_rest_pose_hash"
+
+
+def find_armature(content_hash: str) -> bpy.types.Armature | None:
+    """Find an armature imported from the same content, which is used and whose rest pose has not been edited."""
+    for armature in bpy.data.armatures:
+        if armature.get(CONTENT_HASH_PROPERTY) != content_hash or armature.users == 0:
+            continue
+        if armature.get(REST_POSE_HASH_PROPERTY) == fingerprint.rest_pose_fingerprint(armature):
+            return armature
+    return None
+
+
 def import_skel(
     context: bpy.types.Context,
-    file_path: pathlib.Path,
+    file_path: utils.FilePath,
+    *,
+    unique_armature_data: bool = False,
 ) -> bpy.types.Object:
-    """Import a skel file."""
+    """Import a skel file.
+
+    Unless unique_armature_data is set, the armature data of an earlier import of the same skel file is shared instead
+    of building it again. Each object still has its own pose.
+    """
     skeleton = skel.read_file(file_path)
 
+    content_hash = fingerprint.skel_content_fingerprint(skeleton)
+    shared_armature = None if unique_armature_data else find_armature(content_hash)
+
+    if shared_armature is not None:
+        armature_object = bpy.data.objects.new(name=skeleton.name, object_data=shared_armature)
+        context.collection.objects.link(armature_object)
+
+        bpy.ops.object.select_all(action='DESELECT')
+        armature_object.select_set(state=True)
+
+        return armature_object
+
     armature = bpy.data.armatures.new(name=skeleton.name)
     armature_object = bpy.data.objects.new(name=skeleton.name, object_data=armature)
     context.collection.objects.link(armature_object)
@@ -28,7 +60,7 @@ def import_skel(
         armature_bone = armature.edit_bones.new(name=bone.name)
 
         parent_matrix = mathutils.Matrix()
-        if bone.parent != "NULL":
+        if bone.parent != skel.NULL_PARENT:
             armature_bone.parent = armature.edit_bones[bone.parent]
             parent_matrix = armature.edit_bones[bone.parent].matrix @ utils.BONE_ROTATION_OFFSET_INVERTED
 
@@ -68,6 +100,10 @@ def import_skel(
 
     bpy.ops.object.mode_set(mode='OBJECT')
 
+    if not unique_armature_data:
+        armature[CONTENT_HASH_PROPERTY] = content_hash
+        armature[REST_POSE_HASH_PROPERTY] = fingerprint.rest_pose_fingerprint(armature)
+
     bpy.ops.object.select_all(action='DESELECT')
     armature_object.select_set(state=True)
 
@@ -0,0 +1,119 @@
+"""Create the data of actions imported lazily once they are used."""
+
+import bpy
+import collections
+import pathlib
+
+from . import anim
+from . import import_anim
+from . import resample
+from . import utils
+
+
+LAZY_ERROR_PROPERTY = "tso_lazy_error"
+
+
+class AnimCache:
+    """A least recently used cache of decoded anim files, kept in their compact form."""
+
+    def __init__(self, max_size: int) -> None:
+        """Create an empty cache holding at most max_size anims."""
+        self.max_size = max_size
+        self.anims: collections.OrderedDict[tuple[str, int, int], anim.CompactAnim] = collections.OrderedDict()
+
+    def get(self, file_path: pathlib.Path) -> anim.CompactAnim:
+        """Get a decoded anim file, reading it if it is not cached or has changed on disk."""
+        try:
+            stat = file_path.stat()
+        except OSError as exception:
+            raise utils.FileReadError from exception
+
+        key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+
+        animation = self.anims.get(key)
+        if animation is not None:
+            self.anims.move_to_end(key)
+            return animation
+
+        animation = anim.read_compact_file(file_path)
+
+        self.anims[key] = animation
+        while len(self.anims) > self.max_size:
+            self.anims.popitem(last=False)
+
+        return animation
+
+    def clear(self) -> None:
+        """Evict all the cached anims."""
+        self.anims.clear()
+
+
+anim_cache = AnimCache(16)
+
+
+def is_lazy(action: bpy.types.Action) -> bool:
+    """Check if an action was imported lazily and its data has not been created yet."""
+    return import_anim.LAZY_PATH_PROPERTY in action
+
+
+def create_lazy_action_data(armature_object: bpy.types.Object, action: bpy.types.Action) -> None:
+    """Create the data of a lazily imported action from its anim file."""
+    animation = anim_cache.get(pathlib.Path(action[import_anim.LAZY_PATH_PROPERTY]))
+
+    import_anim.create_action_data(
+        armature_object,
+        action,
+        animation,
+        keyframe_reduction_error=action.get(import_anim.LAZY_REDUCTION_ERROR_PROPERTY, 0.0),
+        frame_time=action.get(import_anim.LAZY_FRAME_TIME_PROPERTY, resample.TSO_FRAME_TIME),
+    )
+
+    del action[import_anim.LAZY_PATH_PROPERTY]
+    action.pop(import_anim.LAZY_REDUCTION_ERROR_PROPERTY, None)
+    action.pop(import_anim.LAZY_FRAME_TIME_PROPERTY, None)
+
+
+def used_actions(armature_object: bpy.types.Object) -> list[bpy.types.Action]:
+    """Get the active action and the actions of unmuted nla strips of an object."""
+    animation_data = armature_object.animation_data
+
+    actions = []
+
+    if animation_data.action is not None:
+        actions.append(animation_data.action)
+
+    for track in animation_data.nla_tracks:
+        if track.mute:
+            continue
+        actions += [strip.action for strip in track.strips if strip.action is not None and not strip.mute]
+
+    return actions
+
+
+@bpy.app.handlers.persistent
+def create_used_lazy_actions(_: bpy.types.Scene, depsgraph: bpy.types.Depsgraph) -> None:
+    """Create the data of lazily imported actions when they are made active or their nla strips are unmuted."""
+    for update in depsgraph.updates:
+        if not isinstance(update.id, bpy.types.Object):
+            continue
+
+        armature_object = update.id.original
+        if armature_object.type != 'ARMATURE' or armature_object.animation_data is None:
+            continue
+
+        for action in used_actions(armature_object):
+            if not is_lazy(action):
+                continue
+
+            try:
+                create_lazy_action_data(armature_object, action)
+            except utils.FileReadError as _:
+                # stop trying to load it on every update
+                action[LAZY_ERROR_PROPERTY] = f"Could not read {action[import_anim.LAZY_PATH_PROPERTY]}"
+                del action[import_anim.LAZY_PATH_PROPERTY]
+
+
+@bpy.app.handlers.persistent
+def clear_anim_cache(*_: object) -> None:
+    """Evict the cached anims when a different blend file is loaded."""
+    anim_cache.clear()
@@ -0,0 +1,44 @@
+"""Read and write the manifest of an export directory."""
+
+import dataclasses
+import json
+import pathlib
+
+
+MANIFEST_FILE_NAME = "tso_manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclasses.dataclass
+class Manifest:
+    """The fingerprints of the data each file in an export directory was exported from."""
+
+    fingerprints: dict[str, str]
+
+
+def read_file(file_path: pathlib.Path) -> Manifest:
+    """Read a manifest file, or return an empty manifest if it is missing or unreadable."""
+    try:
+        with file_path.open(encoding="utf-8") as file:
+            manifest_json = json.load(file)
+    except (OSError, ValueError):
+        return Manifest({})
+
+    if not isinstance(manifest_json, dict) or manifest_json.get("version") != MANIFEST_VERSION:
+        return Manifest({})
+
+    fingerprints = manifest_json.get("fingerprints")
+    if not isinstance(fingerprints, dict):
+        return Manifest({})
+
+    return Manifest({str(name): str(fingerprint) for name, fingerprint in fingerprints.items()})
+
+
+def write_file(file_path: pathlib.Path, manifest: Manifest) -> None:
+    """Write a manifest file."""
+    manifest_json = {
+        "version": MANIFEST_VERSION,
+        "fingerprints": dict(sorted(manifest.fingerprints.items())),
+    }
+    with file_path.open("w", encoding="utf-8") as file:
+        json.dump(manifest_json, file, indent=4)
@@ -1,5 +1,6 @@
 """Read and write The Sims Online mesh files."""
 
+import array
 import dataclasses
 import pathlib
 import struct
@@ -8,7 +9,7 @@ import typing
 from . import utils
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class BoneBinding:
     """A mesh bone binding."""
 
@@ -22,11 +23,11 @@ class BoneBinding:
 def read_bone_binding(file: typing.BinaryIO) -> BoneBinding:
     """Read a mesh bone binding."""
     return BoneBinding(
-        struct.unpack('>I', file.read(4))[0],
-        struct.unpack('>I', file.read(4))[0],
-        struct.unpack('>I', file.read(4))[0],
-        struct.unpack('>I', file.read(4))[0],
-        struct.unpack('>I', file.read(4))[0],
+        utils.unpack(file, '>I', "Bone binding")[0],
+        utils.unpack(file, '>I', "Bone binding")[0],
+        utils.unpack(file, '>I', "Bone binding")[0],
+        utils.unpack(file, '>I', "Bone binding")[0],
+        utils.unpack(file, '>I', "Bone binding")[0],
     )
 
 
@@ -39,7 +40,7 @@ def write_bone_binding(file: typing.BinaryIO, bone_binding: BoneBinding) -> None
     file.write(struct.pack('>I', bone_binding.blended_vertex_count))
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Blend:
     """A mesh blend."""
 
@@ -50,8 +51,8 @@ class Blend:
 def read_blend(file: typing.BinaryIO) -> Blend:
     """Read a mesh blend."""
     return Blend(
-        struct.unpack('>I', file.read(4))[0],
-        struct.unpack('>I', file.read(4))[0],
+        utils.unpack(file, '>I', "Blend")[0],
+        utils.unpack(file, '>I', "Blend")[0],
     )
 
 
@@ -61,7 +62,7 @@ def write_blend(file: typing.BinaryIO, blend: Blend) -> None:
     file.write(struct.pack('>I', blend.vertex_index))
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Vertex:
     """mesh File Vertex."""
 
@@ -72,8 +73,8 @@ class Vertex:
 def read_vertex(file: typing.BinaryIO) -> Vertex:
     """Read a mesh vertex."""
     return Vertex(
-        struct.unpack('<3f', file.read(4 * 3)),
-        struct.unpack('<3f', file.read(4 * 3)),
+        utils.unpack(file, '<3f', "Vertex"),
+        utils.unpack(file, '<3f', "Vertex"),
     )
 
 
@@ -83,6 +84,26 @@ def write_vertex(file: typing.BinaryIO, vertex: Vertex) -> None:
     file.write(struct.pack('<3f', *vertex.normal))
 
 
+@dataclasses.dataclass
+class MeshHeader:
+    """The bones of a mesh, read without the rest of the mesh."""
+
+    bones: list[str]
+
+
+def read_mesh_header(file: typing.BinaryIO) -> MeshHeader:
+    """Read the version and bones of a mesh."""
+    version = utils.unpack(file, '>I', "Mesh header")[0]
+    if version != 0x02:
+        message = f"Unsupported mesh version {version}"
+        raise utils.FileReadError(message)
+
+    bone_count = utils.read_count(file, "Bones", 1)
+    bones = [utils.read_string(file) for _ in range(bone_count)]
+
+    return MeshHeader(bones)
+
+
 @dataclasses.dataclass
 class Mesh:
     """A mesh."""
@@ -98,41 +119,112 @@ class Mesh:
 
 def read_mesh(file: typing.BinaryIO) -> Mesh:
     """Read mesh."""
-    version = struct.unpack('>I', file.read(4))[0]
-    if version != 0x02:
-        raise utils.FileReadError
+    return expand_mesh(read_compact_mesh(file))
 
-    bone_count = struct.unpack('>I', file.read(4))[0]
-    bones = [utils.read_string(file) for _ in range(bone_count)]
 
-    face_count = struct.unpack('>I', file.read(4))[0]
-    faces = [struct.unpack('>3I', file.read(12)) for _ in range(face_count)]
+@dataclasses.dataclass
+class CompactMesh:
+    """A mesh stored in flat arrays instead of an object per face, vertex and blend."""
 
-    bone_binding_count = struct.unpack('>I', file.read(4))[0]
-    bone_bindings = [read_bone_binding(file) for _ in range(bone_binding_count)]
+    bones: list[str]
+    faces: array.array  # 3 vertex indices per face
+    bone_bindings: array.array  # 5 values per bone binding, in the order of the BoneBinding fields
+    uvs: array.array  # 2 per vertex
+    blends: array.array  # weight and vertex index per blend
+    positions: array.array  # 3 per vertex
+    normals: array.array  # 3 per vertex
+    blend_positions: array.array  # 3 per blended vertex
+    blend_normals: array.array  # 3 per blended vertex
 
-    vertex_count = struct.unpack('>I', file.read(4))[0]
 
-    uvs = [struct.unpack('<2f', file.read(8)) for _ in range(vertex_count)]
+def read_vertex_arrays(file: typing.BinaryIO, count: int, section: str) -> tuple[array.array, array.array]:
+    """Read the positions and normals of vertices into separate arrays."""
+    interleaved = utils.read_float_array(file, count * 6, section)
 
-    blend_vertex_count = struct.unpack('>I', file.read(4))[0]
+    positions = array.array('f', bytes(count * 3 * 4))
+    normals = array.array('f', bytes(count * 3 * 4))
+    for component in range(3):
+        positions[component::3] = interleaved[component::6]
+        normals[component::3] = interleaved[3 + component :: 6]
 
-    blends = [read_blend(file) for _ in range(blend_vertex_count)]
+    return positions, normals
 
-    file.read(4)  # total vertex count
 
-    vertices = [read_vertex(file) for _ in range(vertex_count)]
+def read_compact_mesh(file: typing.BinaryIO) -> CompactMesh:
+    """Read a mesh into flat arrays."""
+    header = read_mesh_header(file)
 
-    blend_vertices = [read_vertex(file) for _ in range(blend_vertex_count)]
+    face_count = utils.read_count(file, "Faces", 12)
+    faces = utils.read_uint_array_be(file, face_count * 3, "Faces")
 
-    return Mesh(
-        bones,
+    bone_binding_count = utils.read_count(file, "Bone bindings", 20)
+    bone_bindings = utils.read_uint_array_be(file, bone_binding_count * 5, "Bone bindings")
+
+    # every vertex has a uv, and a position and normal later in the file
+    vertex_count = utils.read_count(file, "Vertices", 8 + 24)
+    uvs = utils.read_float_array(file, vertex_count * 2, "Uvs")
+
+    # every blended vertex has a blend, and a position and normal later in the file
+    blend_vertex_count = utils.read_count(file, "Blended vertices", 8 + 24)
+    blends = utils.read_uint_array_be(file, blend_vertex_count * 2, "Blends")
+
+    utils.read_exact(file, 4, "Total vertex count")
+
+    positions, normals = read_vertex_arrays(file, vertex_count, "Vertices")
+    blend_positions, blend_normals = read_vertex_arrays(file, blend_vertex_count, "Blended vertices")
+
+    return CompactMesh(
+        header.bones,
         faces,
         bone_bindings,
         uvs,
         blends,
-        vertices,
-        blend_vertices,
+        positions,
+        normals,
+        blend_positions,
+        blend_normals,
+    )
+
+
+def compact_mesh(mesh: Mesh) -> CompactMesh:
+    """Convert a mesh to flat arrays."""
+    return CompactMesh(
+        list(mesh.bones),
+        array.array('I', [index for face in mesh.faces for index in face]),
+        array.array('I', [value for binding in mesh.bone_bindings for value in dataclasses.astuple(binding)]),
+        array.array('f', [value for uv in mesh.uvs for value in uv]),
+        array.array('I', [value for blend in mesh.blends for value in (blend.weight, blend.vertex_index)]),
+        array.array('f', [value for vertex in mesh.vertices for value in vertex.position]),
+        array.array('f', [value for vertex in mesh.vertices for value in vertex.normal]),
+        array.array('f', [value for vertex in mesh.blend_vertices for value in vertex.position]),
+        array.array('f', [value for vertex in mesh.blend_vertices for value in vertex.normal]),
+    )
+
+
+def expand_mesh(compact: CompactMesh) -> Mesh:
+    """Convert a mesh stored in flat arrays to a mesh."""
+
+    def groups(values: array.array, size: int) -> list[tuple]:
+        return list(zip(*[iter(values)] * size, strict=True))
+
+    return Mesh(
+        list(compact.bones),
+        groups(compact.faces, 3),
+        [BoneBinding(*values) for values in groups(compact.bone_bindings, 5)],
+        groups(compact.uvs, 2),
+        [Blend(*values) for values in groups(compact.blends, 2)],
+        [
+            Vertex(position, normal)
+            for position, normal in zip(groups(compact.positions, 3), groups(compact.normals, 3), strict=True)
+        ],
+        [
+            Vertex(position, normal)
+            for position, normal in zip(
+                groups(compact.blend_positions, 3),
+                groups(compact.blend_normals, 3),
+                strict=True,
+            )
+        ],
     )
 
 
@@ -171,14 +263,41 @@ def write_mesh(file: typing.BinaryIO, mesh: Mesh) -> None:
         write_vertex(file, vertex)
 
 
-def read_file(file_path: pathlib.Path) -> Mesh:
+def read_file(file_path: utils.FilePath) -> Mesh:
     """Read a mesh file."""
     try:
         with file_path.open(mode='rb') as file:
             mesh = read_mesh(file)
 
             if len(file.read(1)) != 0:
-                raise utils.FileReadError
+                message = f"Unexpected data after the end of the mesh at offset {file.tell() - 1}"
+                raise utils.FileReadError(message)
+
+            return mesh
+
+    except (OSError, struct.error) as exception:
+        raise utils.FileReadError from exception
+
+
+def read_header_file(file_path: utils.FilePath) -> MeshHeader:
+    """Read the header of a mesh file."""
+    try:
+        with file_path.open(mode='rb') as file:
+            return read_mesh_header(file)
+
+    except (OSError, struct.error) as exception:
+        raise utils.FileReadError from exception
+
+
+def read_compact_file(file_path: utils.FilePath) -> CompactMesh:
+    """Read a mesh file into flat arrays."""
+    try:
+        with file_path.open(mode='rb') as file:
+            mesh = read_compact_mesh(file)
+
+            if len(file.read(1)) != 0:
+                message = f"Unexpected data after the end of the mesh at offset {file.tell() - 1}"
+                raise utils.FileReadError(message)
 
             return mesh
 
@@ -0,0 +1,406 @@
+"""Import and export operators and menu entries."""
+
+import bpy
+import bpy_extras
+import typing
+
+
+class TSOIOImport(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
+    """Import The Sims Online files."""
+
+    bl_idname: str = "tsoblenderio.import"
+    bl_label: str = "The Sims Online (.skel/.mesh/.anim)"
+    bl_description: str = "Import skel, mesh or anim files from The Sims Online, or from FAR archives"
+    bl_options: typing.ClassVar[set[str]] = {'UNDO'}
+
+    filter_glob: bpy.props.StringProperty(  # type: ignore[valid-type]
+        default="*.skel;*.mesh;*.anim;*.far;*.dat",
+        options={'HIDDEN'},
+    )
+    files: bpy.props.CollectionProperty(  # type: ignore[valid-type]
+        name="File Path",
+        type=bpy.types.OperatorFileListElement,
+    )
+    directory: bpy.props.StringProperty(  # type: ignore[valid-type]
+        subtype='DIR_PATH',
+    )
+
+    cleanup_meshes: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Cleanup Meshes (Lossy)",
+        description="Merge the vertices of the mesh, add sharp edges, remove original normals and shade smooth",
+        default=True,
+    )
+
+    unique_mesh_data: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Unique Mesh Data",
+        description="Give each imported mesh its own copy of the mesh data, instead of sharing the data of an "
+        "earlier import of the same mesh onto the same rest pose",
+        default=False,
+    )
+
+    unique_armature_data: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Unique Armature Data",
+        description="Give each imported skeleton its own copy of the armature data, instead of sharing the data of an "
+        "earlier import of the same skel file",
+        default=False,
+    )
+
+    import_textures: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Import Textures",
+        description="Give meshes the image with the same name, found in the texture directory or next to the mesh file",
+        default=False,
+    )
+
+    texture_directory: bpy.props.StringProperty(  # type: ignore[valid-type]
+        name="Texture Directory",
+        description="Look for textures in this directory before the directory of each mesh file",
+        subtype='DIR_PATH',
+    )
+
+    lazy_animations: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Load Animations When Used",
+        description="Only read the headers of anim files, and load the rest once the action is made active, "
+        "its nla track is unmuted or it is exported",
+        default=False,
+    )
+
+    keyframe_reduction_error: bpy.props.FloatProperty(  # type: ignore[valid-type]
+        name="Keyframe Reduction Error",
+        description="Remove keyframes that linear interpolation recreates within this error. "
+        "0 keeps a keyframe on every frame",
+        default=0.0,
+        min=0.0,
+        precision=5,
+    )
+
+    resample_frame_rate: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Resample Frame Rate",
+        description="Resample animations to the frame rate of the scene, instead of setting the scene to 30 fps "
+        "and keying every frame of the anim files",
+        default=False,
+    )
+
+    thread_count: bpy.props.IntProperty(  # type: ignore[valid-type]
+        name="Threads",
+        description="Read and convert this many anim files at once on worker threads. "
+        "Does nothing when loading animations when used",
+        default=1,
+        min=1,
+        max=64,
+    )
+
+    prefetch_count: bpy.props.IntProperty(  # type: ignore[valid-type]
+        name="Read Ahead",
+        description="Read this many of the next mesh and anim files in the background while importing, "
+        "which hides the latency of network storage. 0 reads each file when it is imported",
+        default=0,
+        min=0,
+        max=64,
+    )
+
+    archive_members: bpy.props.StringProperty(  # type: ignore[valid-type]
+        name="Archive Members",
+        description="Only import the members of selected FAR archives whose names match these patterns, separated by ;",
+    )
+
+    catalog_path: bpy.props.StringProperty(  # type: ignore[valid-type]
+        name="Catalog",
+        description="A catalog database created with python -m io_scene_tso.tools index",
+        subtype='FILE_PATH',
+    )
+
+    catalog_query: bpy.props.StringProperty(  # type: ignore[valid-type]
+        name="Catalog Query",
+        description="Import the files whose paths are the first column of this query on the catalog, "
+        "instead of the selected files",
+    )
+
+    use_modal: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        default=False,
+        options={'HIDDEN', 'SKIP_SAVE'},
+    )
+
+    IMPORT_TIME_SLICE: typing.ClassVar[float] = 0.1
+
+    def invoke(self, context: bpy.context, event: bpy.types.Event) -> set[str]:
+        """Invoke the file selection window, importing in the background when it is confirmed."""
+        self.use_modal = True
+        return super().invoke(context, event)
+
+    def execute(self, context: bpy.context) -> set[str]:
+        """Execute the importing function."""
+        import io
+        import logging
+        import pathlib
+        from . import import_files
+
+        logger = logging.getLogger(__name__)
+        logger.setLevel(logging.DEBUG)
+        self.log_stream = io.StringIO()
+        logger.addHandler(logging.StreamHandler(stream=self.log_stream))
+
+        if self.catalog_query:
+            import sqlite3
+            from . import catalog
+
+            try:
+                paths = catalog.query_paths(pathlib.Path(bpy.path.abspath(self.catalog_path)), self.catalog_query)
+            except sqlite3.Error as exception:
+                self.report({'ERROR'}, f"Could not query the catalog: {exception}")
+                return {'CANCELLED'}
+        else:
+            directory = pathlib.Path(self.directory)
+            paths = [directory / file.name for file in self.files]
+
+        member_patterns = tuple(pattern.strip() for pattern in self.archive_members.split(";") if pattern.strip())
+        paths = import_files.expand_archives(logger, paths, member_patterns)
+        texture_directory = pathlib.Path(bpy.path.abspath(self.texture_directory)) if self.texture_directory else None
+
+        if not self.use_modal or context.window is None:
+            import_files.import_files(
+                context,
+                logger,
+                paths,
+                cleanup_meshes=self.cleanup_meshes,
+                lazy_animations=self.lazy_animations,
+                keyframe_reduction_error=self.keyframe_reduction_error,
+                resample_frame_rate=self.resample_frame_rate,
+                unique_mesh_data=self.unique_mesh_data,
+                unique_armature_data=self.unique_armature_data,
+                import_textures=self.import_textures,
+                texture_directory=texture_directory,
+                thread_count=self.thread_count,
+                prefetch_count=self.prefetch_count,
+            )
+            self.report_log()
+            return {'FINISHED'}
+
+        self.importer = import_files.import_files_iter(
+            context,
+            logger,
+            paths,
+            cleanup_meshes=self.cleanup_meshes,
+            lazy_animations=self.lazy_animations,
+            keyframe_reduction_error=self.keyframe_reduction_error,
+            resample_frame_rate=self.resample_frame_rate,
+            unique_mesh_data=self.unique_mesh_data,
+            unique_armature_data=self.unique_armature_data,
+            import_textures=self.import_textures,
+            texture_directory=texture_directory,
+            thread_count=self.thread_count,
+            prefetch_count=self.prefetch_count,
+        )
+        self.file_count = len(paths)
+        self.imported_count = 0
+
+        context.window_manager.progress_begin(0, self.file_count)
+        self.timer = context.window_manager.event_timer_add(0.01, window=context.window)
+        context.window_manager.modal_handler_add(self)
+
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context: bpy.context, event: bpy.types.Event) -> set[str]:
+        """Import the files a few at a time, until all of them are imported or escape is pressed.
+
+        Other events are consumed, so nothing can change the scene while it is being imported into.
+        """
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.cancel(context)
+            self.report({'WARNING'}, f"Import cancelled after {self.imported_count} of {self.file_count} files")
+            return {'FINISHED'}
+
+        if event.type != 'TIMER' or event.timer != self.timer:
+            return {'RUNNING_MODAL'}
+
+        import time
+
+        slice_start = time.perf_counter()
+        try:
+            while time.perf_counter() - slice_start < self.IMPORT_TIME_SLICE:
+                file_path = next(self.importer)
+                self.imported_count += 1
+        except StopIteration:
+            self.finish(context)
+            return {'FINISHED'}
+        except Exception:
+            self.cancel(context)
+            raise
+
+        context.window_manager.progress_update(self.imported_count)
+        context.workspace.status_text_set(
+            f"Imported {self.imported_count} of {self.file_count} files ({file_path.name}), press Esc to cancel",
+        )
+
+        return {'RUNNING_MODAL'}
+
+    def cancel(self, context: bpy.context) -> None:
+        """Stop importing, shutting down the threads of the importer."""
+        self.importer.close()
+        self.finish(context)
+
+    def finish(self, context: bpy.context) -> None:
+        """Remove the timer and progress display, and report anything that was logged."""
+        context.window_manager.event_timer_remove(self.timer)
+        context.window_manager.progress_end()
+        context.workspace.status_text_set(None)
+        self.report_log()
+
+    def report_log(self) -> None:
+        """Report anything that was logged while importing."""
+        log_output = self.log_stream.getvalue()
+        if log_output != "":
+            self.report({"ERROR"}, log_output)
+
+    def draw(self, _: bpy.context) -> None:
+        """Draw the import options ui."""
+        col = self.layout.column()
+        col.prop(self, "cleanup_meshes")
+        col.prop(self, "unique_mesh_data")
+        col.prop(self, "unique_armature_data")
+        col.prop(self, "import_textures")
+        col.prop(self, "texture_directory")
+        col.prop(self, "lazy_animations")
+        col.prop(self, "keyframe_reduction_error")
+        col.prop(self, "resample_frame_rate")
+        col.prop(self, "thread_count")
+        col.prop(self, "prefetch_count")
+        col.prop(self, "archive_members")
+        col.prop(self, "catalog_path")
+        col.prop(self, "catalog_query")
+
+
+class TSOIOExport(bpy.types.Operator):
+    """Import The Sims Online files."""
+
+    bl_idname = "tsoblenderio.export"
+    bl_label = "The Sims Online (.mesh/.anim)"
+    bl_description = "Export mesh and anim files for The Sims Online"
+
+    directory: bpy.props.StringProperty(  # type: ignore[valid-type]
+        name="Output Directory Path",
+        description="Output Directory Path",
+        subtype='DIR_PATH',
+    )
+
+    filter_folder: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        default=True, options={"HIDDEN"}
+    )
+
+    export_meshes: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Export Meshes",
+        default=True,
+    )
+
+    export_animations: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Export Animations",
+        default=True,
+    )
+
+    incremental: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Incremental",
+        description="Only export meshes and animations that changed since the last incremental export",
+        default=False,
+    )
+
+    compression_epsilon: bpy.props.FloatProperty(  # type: ignore[valid-type]
+        name="Compression Tolerance",
+        description="Do not write the locations or rotations of bones which stay this close to the rest pose",
+        default=0.0,
+        min=0.0,
+        precision=5,
+    )
+
+    optimize_vertex_cache: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Optimize Vertex Cache",
+        description="Reorder the faces and vertices of meshes so the game transforms fewer vertices",
+        default=False,
+    )
+
+    normalize_weights: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Normalize Weights",
+        description=(
+            "Keep the two largest bone weights of each vertex and scale them to add up to 1, ignoring vertex groups "
+            "that are not bones, instead of not exporting meshes with other weights"
+        ),
+        default=False,
+    )
+
+    resample_frame_rate: bpy.props.BoolProperty(  # type: ignore[valid-type]
+        name="Resample Frame Rate",
+        description="Resample animations from the frame rate of the scene to that of anim files, "
+        "instead of writing every frame of the scene as a frame of the anim file",
+        default=False,
+    )
+
+    thread_count: bpy.props.IntProperty(  # type: ignore[valid-type]
+        name="Threads",
+        description="Convert and write this many animations at once on worker threads",
+        default=1,
+        min=1,
+        max=64,
+    )
+
+    def execute(self, context: bpy.context) -> set[str]:
+        """Execute the exporting function."""
+        import io
+        import logging
+        import pathlib
+        from . import export_files
+
+        logger = logging.getLogger(__name__)
+        logger.setLevel(logging.DEBUG)
+        log_stream = io.StringIO()
+        logger.addHandler(logging.StreamHandler(stream=log_stream))
+
+        result = export_files.export_files(
+            context,
+            logger,
+            pathlib.Path(self.properties.directory),
+            export_meshes=self.export_meshes,
+            export_animations=self.export_animations,
+            incremental=self.incremental,
+            compression_epsilon=self.compression_epsilon,
+            optimize_vertex_cache=self.optimize_vertex_cache,
+            normalize_weights=self.normalize_weights,
+            resample_frame_rate=self.resample_frame_rate,
+            thread_count=self.thread_count,
+        )
+
+        log_output = log_stream.getvalue()
+        if log_output != "":
+            self.report({"ERROR"}, log_output)
+
+        if result.notes:
+            self.report({'INFO'}, "\n".join(result.notes))
+
+        return {'FINISHED'}
+
+    def invoke(self, context: bpy.context, _: bpy.types.Event) -> None:
+        """Invoke the file selection window."""
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def draw(self, _: bpy.context) -> None:
+        """Draw the export options ui."""
+        col = self.layout.column()
+        col.prop(self, "export_meshes")
+        col.prop(self, "export_animations")
+        col.prop(self, "incremental")
+        col.prop(self, "compression_epsilon")
+        col.prop(self, "optimize_vertex_cache")
+        col.prop(self, "normalize_weights")
+        col.prop(self, "resample_frame_rate")
+        col.prop(self, "thread_count")
+
+
+def menu_import(self: bpy.types.TOPBAR_MT_file_import, _: bpy.context) -> None:
+    """Add an entry to the import menu."""
+    self.layout.operator(TSOIOImport.bl_idname)
+
+
+def menu_export(self: bpy.types.TOPBAR_MT_file_export, _: bpy.context) -> None:
+    """Add an entry to the export menu."""
+    self.layout.operator(TSOIOExport.bl_idname)
+
+
+classes = (TSOIOImport, TSOIOExport)
@@ -0,0 +1,84 @@
+"""Read the next files to import in background threads, so network storage latency overlaps with importing.
+
+Files are read whole into memory files, which the read_file functions of skel, mesh and anim read in place of a path,
+and are delivered in the order they were selected in.
+"""
+
+import collections
+import concurrent.futures
+import pathlib
+import typing
+
+from . import utils
+
+
+MAX_PREFETCH_BYTES = 256 * 1024 * 1024
+
+
+class PrefetchedFile(utils.MemoryFile):
+    """A file that was read into memory ahead of being imported, which remembers where it was read from."""
+
+    def __init__(self, source: pathlib.Path, data: bytes) -> None:
+        """Create a file read from a path."""
+        super().__init__(source.name, data)
+        self.path = source
+
+
+def read_file(file_path: pathlib.Path) -> PrefetchedFile | None:
+    """Read a whole file, or return None if it cannot be read so it is read again and reported when importing."""
+    try:
+        return PrefetchedFile(file_path, file_path.read_bytes())
+    except OSError:
+        return None
+
+
+def read_bytes(pending: typing.Iterable[tuple[object, concurrent.futures.Future[PrefetchedFile | None] | None]]) -> int:
+    """Get the total size of the files that have been read but not yet yielded."""
+    total = 0
+    for _, future in pending:
+        if future is not None and future.done() and future.exception() is None:
+            prefetched = future.result()
+            if prefetched is not None:
+                total += len(prefetched.data)
+    return total
+
+
+def read_ahead(
+    executor: concurrent.futures.Executor,
+    file_paths: list[utils.FilePath],
+    *,
+    suffixes: tuple[str, ...],
+    lookahead: int,
+    max_bytes: int = MAX_PREFETCH_BYTES,
+) -> typing.Iterator[utils.FilePath]:
+    """Read files with the suffixes, in any case, ahead of when they are used, yielding every file in order.
+
+    At most lookahead files are read ahead, and no more are started while the files read but not yet yielded take
+    max_bytes or more. Sizes are only known once the worker threads have read the files, so nothing is read on this
+    thread. Files with other suffixes, files already in memory and files that could not be read are yielded as they
+    are.
+    """
+    remaining_paths = iter(file_paths)
+    pending: collections.deque[tuple[utils.FilePath, concurrent.futures.Future[PrefetchedFile | None] | None]]
+    pending = collections.deque()
+
+    def submit_next() -> bool:
+        file_path = next(remaining_paths, None)
+        if file_path is None:
+            return False
+        if isinstance(file_path, pathlib.Path) and file_path.suffix.lower() in suffixes:
+            pending.append((file_path, executor.submit(read_file, file_path)))
+        else:
+            pending.append((file_path, None))
+        return True
+
+    while True:
+        while len(pending) < lookahead and read_bytes(pending) < max_bytes and submit_next():
+            pass
+
+        if not pending:
+            return
+
+        file_path, future = pending.popleft()
+        prefetched = future.result() if future is not None else None
+        yield file_path if prefetched is None else prefetched
@@ -0,0 +1,359 @@
+"""Measure the memory used by each stage of importing and exporting files.
+
+Tracing is opt in, as tracemalloc slows Python down. Each stage records the peak and retained memory traced by
+tracemalloc, which only sees allocations made by Python, and the peak and retained resident set size of the process,
+which also includes the meshes, fcurves and undo steps Blender allocates. The resident set size is only sampled on
+Linux.
+
+Inside Blender, profile importing files or directories of files into an empty scene, or exporting a .blend file:
+
+    blender -b --factory-startup -P io_scene_tso/profiling.py -- import --output profile.json corpus/
+    blender -b scene.blend -P io_scene_tso/profiling.py -- export --output profile.json --export-directory out
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import json
+import logging
+import os
+import pathlib
+import sys
+import threading
+import time
+import tracemalloc
+import typing
+
+
+RSS_SAMPLE_INTERVAL = 0.005  # seconds
+STATM_PATH = pathlib.Path("/proc/self/statm")
+
+
+def current_rss() -> int | None:
+    """Get the resident set size of the process in bytes, or None if it cannot be read."""
+    try:
+        resident_pages = int(STATM_PATH.read_text().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class RssSampler:
+    """Sample the resident set size in a background thread to find its peak."""
+
+    def __init__(self) -> None:
+        """Start sampling."""
+        self.peak = current_rss()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """Sample until stopped."""
+        while not self.stopped.wait(RSS_SAMPLE_INTERVAL):
+            self.sample()
+
+    def sample(self) -> int | None:
+        """Sample the resident set size now, returning it."""
+        rss = current_rss()
+        if rss is not None:
+            with self.lock:
+                self.peak = max(self.peak or 0, rss)
+        return rss
+
+    def reset_peak(self) -> int | None:
+        """Reset the peak to the current resident set size, returning the peak before."""
+        rss = current_rss()
+        with self.lock:
+            peak = self.peak
+            self.peak = rss
+        return peak
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self.stopped.set()
+        self.thread.join()
+
+
+@dataclasses.dataclass
+class StageMemory:
+    """The time and memory used by a stage of importing or exporting a file.
+
+    Peaks are relative to the memory in use when the stage started, and retained memory is what was still in use
+    when it ended. Memory sizes are in bytes, and resident set sizes are None where they cannot be read.
+    """
+
+    stage: str
+    file: str
+    seconds: float
+    traced_peak: int
+    traced_retained: int
+    rss_peak: int | None
+    rss_retained: int | None
+    top_allocations: list[str]
+
+
+@dataclasses.dataclass
+class ActiveStage:
+    """A stage that has not ended yet, with the highest peaks of the stages inside it."""
+
+    start_time: float
+    traced_start: int
+    rss_start: int | None
+    snapshot: tracemalloc.Snapshot | None
+    child_traced_peak: int = 0
+    child_rss_peak: int | None = None
+
+
+def max_optional(a: int | None, b: int | None) -> int | None:
+    """Get the larger of two numbers that may be None."""
+    if a is None or b is None:
+        return b if a is None else a
+    return max(a, b)
+
+
+def difference_optional(a: int | None, b: int | None) -> int | None:
+    """Subtract two numbers that may be None."""
+    return None if a is None or b is None else a - b
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    """Take a snapshot of the memory allocated by Python, without the memory used to trace it."""
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__),
+            tracemalloc.Filter(inclusive=False, filename_pattern=__file__),
+        ),
+    )
+
+
+class Tracer:
+    """Record the memory used by stages, which can be nested."""
+
+    def __init__(self, *, top_allocation_count: int = 0) -> None:
+        """Create a tracer, which also lists the lines allocating the most memory in each stage if the count is set.
+
+        Listing allocations takes a tracemalloc snapshot before and after each stage, which is slow.
+        """
+        self.top_allocation_count = top_allocation_count
+        self.records: list[StageMemory] = []
+        self.active_stages: list[ActiveStage] = []
+        self.sampler: RssSampler | None = None
+        self.started_tracing = False
+
+    def start(self) -> None:
+        """Start tracing memory."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.sampler = RssSampler()
+
+    def stop(self) -> None:
+        """Stop tracing memory."""
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def __enter__(self) -> typing.Self:
+        """Start tracing memory."""
+        self.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Stop tracing memory."""
+        self.stop()
+
+    @contextlib.contextmanager
+    def stage(self, stage: str, file: str = "") -> typing.Iterator[None]:
+        """Record the memory used by the code inside the context."""
+        if self.sampler is None:
+            yield
+            return
+
+        # take the snapshot first so it is not counted as memory used by the stage
+        snapshot = take_snapshot() if self.top_allocation_count else None
+
+        traced_start, traced_peak_before = tracemalloc.get_traced_memory()
+        rss_peak_before = self.sampler.reset_peak()
+        tracemalloc.reset_peak()
+
+        # the peaks were reset, so keep the peak so far of the stage this one is inside
+        if self.active_stages:
+            parent = self.active_stages[-1]
+            parent.child_traced_peak = max(parent.child_traced_peak, traced_peak_before)
+            parent.child_rss_peak = max_optional(parent.child_rss_peak, rss_peak_before)
+
+        active_stage = ActiveStage(time.perf_counter(), traced_start, current_rss(), snapshot)
+        self.active_stages.append(active_stage)
+
+        try:
+            yield
+        finally:
+            self.active_stages.pop()
+            seconds = time.perf_counter() - active_stage.start_time
+            traced_end, traced_peak = tracemalloc.get_traced_memory()
+            traced_peak = max(traced_peak, active_stage.child_traced_peak)
+            rss_peak = max_optional(self.sampler.sample(), self.sampler.peak)
+            rss_peak = max_optional(rss_peak, active_stage.child_rss_peak)
+            rss_end = current_rss()
+
+            top_allocations = []
+            if active_stage.snapshot is not None:
+                differences = take_snapshot().compare_to(active_stage.snapshot, "lineno")
+                top_allocations = [
+                    str(difference)
+                    for difference in differences[: self.top_allocation_count]
+                    if difference.size_diff > 0
+                ]
+
+            self.records.append(
+                StageMemory(
+                    stage,
+                    file,
+                    seconds,
+                    traced_peak - active_stage.traced_start,
+                    traced_end - active_stage.traced_start,
+                    difference_optional(rss_peak, active_stage.rss_start),
+                    difference_optional(rss_end, active_stage.rss_start),
+                    top_allocations,
+                ),
+            )
+
+            if self.active_stages:
+                parent = self.active_stages[-1]
+                parent.child_traced_peak = max(parent.child_traced_peak, traced_peak)
+                parent.child_rss_peak = max_optional(parent.child_rss_peak, rss_peak)
+
+    def stage_totals(self) -> dict[str, dict]:
+        """Sum the time and retained memory of each stage over all files, with the highest peaks."""
+        totals: dict[str, dict] = {}
+        for record in self.records:
+            total = totals.setdefault(
+                record.stage,
+                {
+                    "count": 0,
+                    "seconds": 0.0,
+                    "traced_peak": 0,
+                    "traced_retained": 0,
+                    "rss_peak": None,
+                    "rss_retained": None,
+                },
+            )
+            total["count"] += 1
+            total["seconds"] += record.seconds
+            total["traced_peak"] = max(total["traced_peak"], record.traced_peak)
+            total["traced_retained"] += record.traced_retained
+            total["rss_peak"] = max_optional(total["rss_peak"], record.rss_peak)
+            if record.rss_retained is not None:
+                total["rss_retained"] = (total["rss_retained"] or 0) + record.rss_retained
+        return totals
+
+    def report(self) -> dict:
+        """Get the totals of each stage and the records of each file."""
+        return {
+            "stages": self.stage_totals(),
+            "files": [dataclasses.asdict(record) for record in self.records],
+        }
+
+
+def stage(tracer: Tracer | None, name: str, file: object = "") -> contextlib.AbstractContextManager:
+    """Record the memory used by a stage of a file if there is a tracer."""
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.stage(name, str(file))
+
+
+def profile_import(args: argparse.Namespace, tracer: Tracer, logger: logging.Logger) -> None:
+    """Import files into the open scene."""
+    import bpy
+    from . import import_files
+    from . import tools
+
+    with stage(tracer, "total"):
+        import_files.import_files(
+            bpy.context,
+            logger,
+            tools.find_files(args.paths),
+            cleanup_meshes=args.cleanup_meshes,
+            lazy_animations=args.lazy_animations,
+            keyframe_reduction_error=args.keyframe_reduction_error,
+            tracer=tracer,
+            thread_count=args.threads,
+            prefetch_count=args.read_ahead,
+        )
+
+
+def profile_export(args: argparse.Namespace, tracer: Tracer, logger: logging.Logger) -> None:
+    """Export the open .blend file."""
+    import bpy
+    from . import export_files
+
+    args.export_directory.mkdir(parents=True, exist_ok=True)
+
+    with stage(tracer, "total"):
+        export_files.export_files(
+            bpy.context,
+            logger,
+            args.export_directory,
+            export_meshes=True,
+            export_animations=True,
+            tracer=tracer,
+            thread_count=args.threads,
+        )
+
+
+def main() -> int:
+    """Profile importing or exporting with the options after -- on the Blender command line."""
+    parser = argparse.ArgumentParser(prog="blender -b -P profiling.py --")
+    parser.add_argument("--output", type=pathlib.Path, help="write the profile to this file instead of printing it")
+    parser.add_argument(
+        "--top-allocations",
+        type=int,
+        default=0,
+        metavar="COUNT",
+        help="list the lines allocating the most memory in each stage, which is slow",
+    )
+    parser.add_argument("--threads", type=int, default=1, help="the number of threads converting animations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="import files and directories into the open scene")
+    import_parser.add_argument("paths", nargs="+", type=pathlib.Path, help="the files and directories to import")
+    import_parser.add_argument("--cleanup-meshes", action="store_true", help="clean up imported meshes")
+    import_parser.add_argument("--lazy-animations", action="store_true", help="only read the headers of anim files")
+    import_parser.add_argument("--keyframe-reduction-error", type=float, default=0.0, help="reduce keyframes")
+    import_parser.add_argument("--read-ahead", type=int, default=0, metavar="COUNT", help="read files ahead")
+    import_parser.set_defaults(profile=profile_import)
+
+    export_parser = subparsers.add_parser("export", help="export the open .blend file")
+    export_parser.add_argument("--export-directory", type=pathlib.Path, required=True, help="where to export files")
+    export_parser.set_defaults(profile=profile_export)
+
+    arguments = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    args = parser.parse_args(arguments)
+
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(logging.StreamHandler(stream=sys.stderr))
+
+    with Tracer(top_allocation_count=args.top_allocations) as tracer:
+        args.profile(args, tracer, logger)
+
+    report = json.dumps(tracer.report(), indent=2)
+    if args.output is None:
+        print(report)  # noqa: T201
+    else:
+        args.output.write_text(report)
+
+    return 0
+
+
+if __name__ == "__main__":
+    # run with blender -P, so import the package to make the relative imports work
+    import importlib
+
+    sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+    sys.exit(importlib.import_module("io_scene_tso.profiling").main())
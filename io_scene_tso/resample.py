@@ -0,0 +1,72 @@
+"""Resample whole motions between the frame time of anim files and the frame rate of a scene.
+
+Anim files store a frame every 33.333 milliseconds. Translations are interpolated linearly and rotations are slerped,
+taking the shorter way around, for all the frames of a channel at once.
+"""
+
+import numpy as np
+
+
+TSO_FPS = 30  # the frame rate of anim files
+TSO_FRAME_TIME = 1000.0 / TSO_FPS  # milliseconds between the frames of anim files
+SLERP_LINEAR_THRESHOLD = 1e-6  # the sine of the angle below which quaternions are interpolated linearly
+
+
+def frame_time(fps: float, fps_base: float = 1.0) -> float:
+    """Get the milliseconds between frames at a frame rate, like the fps and fps base of a scene."""
+    return 1000.0 * fps_base / fps
+
+
+def resampled_frame_count(frame_count: int, source_frame_time: float, target_frame_time: float) -> int:
+    """Get the number of frames at the target frame time that cover the same time as the source frames."""
+    if frame_count <= 1:
+        return frame_count
+    return round((frame_count - 1) * source_frame_time / target_frame_time) + 1
+
+
+def sample_positions(frame_count: int, source_frame_time: float, target_frame_time: float) -> np.ndarray:
+    """Get the position of each target frame between the source frames, as fractional source frame indices."""
+    count = resampled_frame_count(frame_count, source_frame_time, target_frame_time)
+    positions = np.arange(count, dtype=np.float64) * (target_frame_time / source_frame_time)
+    return np.minimum(positions, max(frame_count - 1, 0))
+
+
+def split_positions(positions: np.ndarray, frame_count: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Get the source frames before and after each position, and how far the position is between them."""
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, frame_count - 1)
+    return lower, upper, (positions - lower)[:, np.newaxis]
+
+
+def resample_linear(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Interpolate the rows of values linearly at fractional frame positions."""
+    lower, upper, fractions = split_positions(positions, len(values))
+    start = values[lower].astype(np.float64)
+    end = values[upper].astype(np.float64)
+    return (start + (end - start) * fractions).astype(values.dtype)
+
+
+def resample_quaternions(quaternions: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Slerp quaternions at fractional frame positions, flipping the later one of each pair onto the same hemisphere."""
+    lower, upper, fractions = split_positions(positions, len(quaternions))
+    start = quaternions[lower].astype(np.float64)
+    end = quaternions[upper].astype(np.float64)
+
+    # q and -q are the same rotation, so go the shorter way around
+    dots = np.sum(start * end, axis=-1, keepdims=True)
+    end = np.where(dots < 0.0, -end, end)
+    dots = np.minimum(np.abs(dots), 1.0)
+
+    angles = np.arccos(dots)
+    sines = np.sin(angles)
+    is_linear = sines < SLERP_LINEAR_THRESHOLD
+
+    # close quaternions are interpolated linearly, as slerp divides by the sine of the angle between them
+    start_weights = 1.0 - fractions
+    end_weights = fractions.copy()
+    np.divide(np.sin((1.0 - fractions) * angles), sines, out=start_weights, where=~is_linear)
+    np.divide(np.sin(fractions * angles), sines, out=end_weights, where=~is_linear)
+
+    resampled = start * start_weights + end * end_weights
+    resampled /= np.linalg.norm(resampled, axis=-1, keepdims=True)
+    return resampled.astype(quaternions.dtype)
@@ -0,0 +1,106 @@
+"""Cache the rest matrices of the bones of armatures."""
+
+import bpy
+import dataclasses
+import numpy as np
+
+from . import transforms
+from . import utils
+
+
+@dataclasses.dataclass
+class RestPose:
+    """The rest matrices of the bones of an armature, indexed in the order of its bones."""
+
+    bone_indices: dict[str, int]
+    matrices: np.ndarray  # the matrix_local of each bone
+    inverted_matrices: np.ndarray
+    bone_matrices: np.ndarray  # the matrix of each bone in the orientation of tso bones
+    parent_matrices: np.ndarray  # the bone matrix of the parent of each bone, or identity
+    normal_matrices: np.ndarray  # the rotation of each bone matrix
+    use_local_locations: np.ndarray
+
+
+@dataclasses.dataclass
+class ArmatureState:
+    """The bone data of an armature that a rest pose is created from."""
+
+    names: tuple[str, ...]
+    parent_names: tuple[str, ...]
+    matrices: bytes
+    use_local_locations: bytes
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    """A rest pose and the armature state it was created from."""
+
+    state: ArmatureState
+    rest_pose: RestPose
+
+
+cache: dict[int, CacheEntry] = {}
+
+
+def armature_state(armature: bpy.types.Armature) -> ArmatureState:
+    """Get the bone data of an armature that a rest pose is created from."""
+    matrices = np.empty(len(armature.bones) * 16, dtype=np.float32)
+    armature.bones.foreach_get("matrix_local", matrices)
+
+    use_local_locations = np.empty(len(armature.bones), dtype=bool)
+    armature.bones.foreach_get("use_local_location", use_local_locations)
+
+    return ArmatureState(
+        tuple(bone.name for bone in armature.bones),
+        tuple(bone.parent.name if bone.parent else "" for bone in armature.bones),
+        matrices.tobytes(),
+        use_local_locations.tobytes(),
+    )
+
+
+def create_rest_pose(state: ArmatureState) -> RestPose:
+    """Create the rest pose of an armature from its state."""
+    bone_count = len(state.names)
+    bone_indices = {name: index for index, name in enumerate(state.names)}
+
+    # matrices are stored column major
+    matrices = np.frombuffer(state.matrices, dtype=np.float32)
+    matrices = matrices.reshape((bone_count, 4, 4)).transpose((0, 2, 1)).astype(np.float64)
+
+    bone_matrices = matrices @ np.array(utils.BONE_ROTATION_OFFSET_INVERTED)
+
+    parent_matrices = np.tile(np.identity(4), (bone_count, 1, 1))
+    for index, parent_name in enumerate(state.parent_names):
+        if parent_name:
+            parent_matrices[index] = bone_matrices[bone_indices[parent_name]]
+
+    normal_matrices = np.tile(np.identity(4), (bone_count, 1, 1))
+    normal_matrices[:, :3, :3] = transforms.quaternions_to_matrices(transforms.matrices_to_quaternions(bone_matrices))
+
+    return RestPose(
+        bone_indices,
+        matrices,
+        np.linalg.inv(matrices),
+        bone_matrices,
+        parent_matrices,
+        normal_matrices,
+        np.frombuffer(state.use_local_locations, dtype=bool),
+    )
+
+
+def get(armature: bpy.types.Armature) -> RestPose:
+    """Get the rest pose of an armature, creating it again if the bones have changed since it was cached."""
+    state = armature_state(armature)
+
+    entry = cache.get(armature.as_pointer())
+    if entry is None or entry.state != state:
+        entry = CacheEntry(state, create_rest_pose(state))
+        cache[armature.as_pointer()] = entry
+
+    return entry.rest_pose
+
+
+@bpy.app.handlers.persistent
+def clear_cache(*_: object) -> None:
+    """Clear the cached rest poses when a different blend file is loaded."""
+    cache.clear()
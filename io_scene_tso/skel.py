@@ -2,7 +2,6 @@
 
 import dataclasses
 import mathutils
-import pathlib
 import struct
 import typing
 
@@ -25,19 +24,23 @@ class Bone:
     wiggle_power: float
 
 
+NULL_PARENT = "NULL"  # the parent of root bones
+BONE_MIN_SIZE = 55  # a bone with empty names and no property lists
+
+
 def read_bone(file: typing.BinaryIO) -> Bone:
     """Read a skel bone from a file."""
-    file.read(4)
+    utils.read_exact(file, 4, "Bone")
 
     name = utils.read_string(file)
     parent = utils.read_string(file)
 
-    has_property_lists = struct.unpack('B', file.read(1))[0]
+    has_property_lists = utils.unpack(file, 'B', "Bone")[0]
     property_lists = utils.read_property_lists(file) if has_property_lists else []
 
-    translation = mathutils.Vector(struct.unpack('<3f', file.read(12))).xzy
+    translation = mathutils.Vector(utils.unpack(file, '<3f', "Bone")).xzy
 
-    rotation = struct.unpack('<4f', file.read(16))
+    rotation = utils.unpack(file, '<4f', "Bone")
     rotation = mathutils.Quaternion(
         (
             rotation[3],
@@ -47,12 +50,12 @@ def read_bone(file: typing.BinaryIO) -> Bone:
         ),
     )
 
-    can_translate = struct.unpack('>I', file.read(4))[0]
-    can_rotate = struct.unpack('>I', file.read(4))[0]
-    can_blend = struct.unpack('>I', file.read(4))[0]
+    can_translate = utils.unpack(file, '>I', "Bone")[0]
+    can_rotate = utils.unpack(file, '>I', "Bone")[0]
+    can_blend = utils.unpack(file, '>I', "Bone")[0]
 
-    wiggle_value = struct.unpack('<f', file.read(4))[0]
-    wiggle_power = struct.unpack('<f', file.read(4))[0]
+    wiggle_value = utils.unpack(file, '<f', "Bone")[0]
+    wiggle_power = utils.unpack(file, '<f', "Bone")[0]
 
     return Bone(
         name,
@@ -78,26 +81,30 @@ class Skel:
 
 def read_skel(file: typing.BinaryIO) -> Skel:
     """Read a skel from a file."""
-    version = struct.unpack('>I', file.read(4))[0]
+    version = utils.unpack(file, '>I', "Skel header")[0]
     if version != 1:
-        raise utils.FileReadError
+        message = f"Unsupported skel version {version}"
+        raise utils.FileReadError(message)
 
     name = utils.read_string(file)
 
-    bone_count = struct.unpack('>H', file.read(2))[0]
+    bone_count_offset = file.tell()
+    bone_count = utils.unpack(file, '>H', "Skel header")[0]
+    utils.check_count(file, "Bones", bone_count_offset, bone_count, BONE_MIN_SIZE)
     bones = [read_bone(file) for _ in range(bone_count)]
 
     return Skel(name, bones)
 
 
-def read_file(file_path: pathlib.Path) -> Skel:
+def read_file(file_path: utils.FilePath) -> Skel:
     """Read a skel file."""
     try:
         with file_path.open(mode='rb') as file:
             skel = read_skel(file)
 
             if len(file.read(1)) != 0:
-                raise utils.FileReadError
+                message = f"Unexpected data after the end of the skel at offset {file.tell() - 1}"
+                raise utils.FileReadError(message)
 
             return skel
 
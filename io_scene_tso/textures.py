@@ -0,0 +1,161 @@
+"""Find and load the textures of imported meshes.
+
+A texture is an image file with the same name as its mesh, next to the mesh file or in a texture directory. Images and
+materials are cached by the resolved path of the image until a different blend file is loaded, so meshes sharing a
+texture share one image and material. Blender only decodes an image the first time it is displayed, so loading one is
+cheap.
+"""
+
+import bpy
+import dataclasses
+import os
+import pathlib
+
+from . import prefetch
+from . import utils
+
+
+IMAGE_SUFFIXES = (".bmp", ".jpg", ".jpeg", ".png", ".tga")
+TEXTURE_PATH_PROPERTY = "tso_texture_path"
+
+
+@dataclasses.dataclass
+class DirectoryListing:
+    """The image files of a directory by their lower case names, and when the directory last changed."""
+
+    mtime_ns: int
+    images: dict[str, pathlib.Path]
+
+
+class TextureCache:
+    """The materials of loaded textures and the image files of searched directories."""
+
+    def __init__(self) -> None:
+        """Create an empty cache."""
+        self.material_names: dict[str, str] = {}
+        self.listings: dict[pathlib.Path, DirectoryListing] = {}
+
+    def list_images(self, directory: pathlib.Path) -> dict[str, pathlib.Path]:
+        """Get the image files of a directory by their lower case names, listing it again if it has changed."""
+        try:
+            mtime_ns = directory.stat().st_mtime_ns
+        except OSError:
+            return {}
+
+        listing = self.listings.get(directory)
+        if listing is None or listing.mtime_ns != mtime_ns:
+            try:
+                with os.scandir(directory) as entries:
+                    images = {
+                        entry.name.lower(): pathlib.Path(entry.path)
+                        for entry in entries
+                        if pathlib.Path(entry.name).suffix.lower() in IMAGE_SUFFIXES and entry.is_file()
+                    }
+            except OSError:
+                images = {}
+            listing = DirectoryListing(mtime_ns, images)
+            self.listings[directory] = listing
+
+        return listing.images
+
+    def find_texture(self, file_path: utils.FilePath, texture_directory: pathlib.Path | None) -> pathlib.Path | None:
+        """Find the image with the same name as a mesh file in the texture directory, then next to the mesh file.
+
+        Names are compared without case, as the game's files are not consistently cased. Archive members are only
+        looked up in the texture directory.
+        """
+        directories = []
+        if texture_directory is not None:
+            directories.append(texture_directory)
+        if isinstance(file_path, pathlib.Path):
+            directories.append(file_path.parent)
+        elif isinstance(file_path, prefetch.PrefetchedFile):
+            directories.append(file_path.path.parent)
+
+        stem = file_path.stem.lower()
+        for directory in directories:
+            images = self.list_images(directory)
+            for suffix in IMAGE_SUFFIXES:
+                image_path = images.get(stem + suffix)
+                if image_path is not None:
+                    return image_path.resolve()
+
+        return None
+
+    def get_material(self, image_path: pathlib.Path) -> bpy.types.Material:
+        """Get the material of a texture, creating it and loading its image the first time the texture is used."""
+        key = str(image_path)
+
+        material = bpy.data.materials.get(self.material_names.get(key, ""))
+        if material is None or material.get(TEXTURE_PATH_PROPERTY) != key:
+            # the material may have been renamed, or created in an earlier session of the same file
+            material = find_material(key) or create_material(image_path)
+            self.material_names[key] = material.name
+
+        return material
+
+    def clear(self) -> None:
+        """Forget all the materials and directory listings."""
+        self.material_names.clear()
+        self.listings.clear()
+
+
+texture_cache = TextureCache()
+
+
+@bpy.app.handlers.persistent
+def clear_cache(*_: object) -> None:
+    """Forget the cached materials and directory listings when a different blend file is loaded."""
+    texture_cache.clear()
+
+
+def find_material(key: str) -> bpy.types.Material | None:
+    """Find the material created for a texture."""
+    for material in bpy.data.materials:
+        if material.get(TEXTURE_PATH_PROPERTY) == key:
+            return material
+    return None
+
+
+def create_material(image_path: pathlib.Path) -> bpy.types.Material:
+    """Create a material showing a texture, without decoding the image yet."""
+    image = bpy.data.images.load(str(image_path), check_existing=True)
+
+    material = bpy.data.materials.new(image_path.stem)
+    material[TEXTURE_PATH_PROPERTY] = str(image_path)
+    material.use_nodes = True
+
+    nodes = material.node_tree.nodes
+    shader = next(node for node in nodes if node.type == 'BSDF_PRINCIPLED')
+    texture_node = nodes.new('ShaderNodeTexImage')
+    texture_node.image = image
+    texture_node.location = (shader.location[0] - 300, shader.location[1])
+    material.node_tree.links.new(texture_node.outputs["Color"], shader.inputs["Base Color"])
+
+    return material
+
+
+def apply_texture(
+    obj: bpy.types.Object,
+    file_path: utils.FilePath,
+    texture_directory: pathlib.Path | None,
+) -> bool:
+    """Give a mesh object the material of its texture, returning False if it has no texture.
+
+    Objects sharing mesh data with an earlier import get the material on their own material slot, as the same mesh can
+    be imported with different textures.
+    """
+    image_path = texture_cache.find_texture(file_path, texture_directory)
+    if image_path is None:
+        return False
+
+    material = texture_cache.get_material(image_path)
+    mesh_data = obj.data
+
+    if not mesh_data.materials:
+        mesh_data.materials.append(material)
+    elif mesh_data.materials[0] != material:
+        obj.material_slots[0].link = 'OBJECT'
+        obj.material_slots[0].material = material
+
+    return True
@@ -0,0 +1,363 @@
+"""Inspect The Sims Online skel, mesh and anim files from the command line, without Blender.
+
+    python -m io_scene_tso.tools info <files or directories>
+    python -m io_scene_tso.tools validate <files or directories>
+    python -m io_scene_tso.tools dump-json <files or directories>
+    python -m io_scene_tso.tools diff <file or directory> <file or directory>
+    python -m io_scene_tso.tools index <database> <directory>
+    python -m io_scene_tso.tools query <database> <sql>
+
+Directories are searched recursively, files are processed in parallel, and one JSON line is printed per file.
+The exit code is 1 if any file could not be read, is invalid or differs.
+
+The readers use mathutils, which outside of Blender is available from the mathutils package on PyPI.
+"""
+
+import argparse
+import array
+import collections.abc
+import concurrent.futures
+import dataclasses
+import json
+import math
+import pathlib
+import sqlite3
+import sys
+import typing
+
+from . import anim
+from . import catalog
+from . import mesh
+from . import skel
+from . import utils
+
+
+READERS: dict[str, typing.Callable[[pathlib.Path], object]] = {
+    ".skel": skel.read_file,
+    ".mesh": mesh.read_file,
+    ".anim": anim.read_file,
+}
+
+MAX_DIFFERENCES = 20
+
+
+def find_files(paths: list[pathlib.Path]) -> list[pathlib.Path]:
+    """Get the skel, mesh and anim files in a list of files and directories."""
+    file_paths = []
+    for path in paths:
+        if path.is_dir():
+            file_paths += sorted(
+                file_path
+                for file_path in path.rglob("*")
+                if file_path.suffix.lower() in READERS and file_path.is_file()
+            )
+        else:
+            file_paths.append(path)
+    return file_paths
+
+
+def read_file(file_path: pathlib.Path) -> object:
+    """Read a skel, mesh or anim file depending on its extension."""
+    reader = READERS.get(file_path.suffix.lower())
+    if reader is None:
+        message = f"Unknown file type {file_path.suffix}"
+        raise utils.FileReadError(message)
+    return reader(file_path)
+
+
+def to_json(value: object) -> object:
+    """Convert read file data to values that can be written as JSON."""
+    if dataclasses.is_dataclass(value):
+        return {field.name: to_json(getattr(value, field.name)) for field in dataclasses.fields(value)}
+    if isinstance(value, float):
+        return value if math.isfinite(value) else repr(value)
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    if isinstance(value, (collections.abc.Iterable, array.array)):
+        # lists, tuples and mathutils vectors and quaternions
+        return [to_json(item) for item in value]
+    return repr(value)
+
+
+def skel_info(skeleton: skel.Skel) -> dict:
+    """Summarize a skel."""
+    return {
+        "name": skeleton.name,
+        "bone_count": len(skeleton.bones),
+    }
+
+
+def mesh_info(mesh_data: mesh.Mesh) -> dict:
+    """Summarize a mesh."""
+    return {
+        "bone_count": len(mesh_data.bones),
+        "face_count": len(mesh_data.faces),
+        "bone_binding_count": len(mesh_data.bone_bindings),
+        "vertex_count": len(mesh_data.vertices),
+        "blend_count": len(mesh_data.blends),
+    }
+
+
+def anim_info(animation: anim.Anim) -> dict:
+    """Summarize an anim."""
+    return {
+        "name": animation.name,
+        "duration": animation.duration,
+        "distance": animation.distance,
+        "moves": animation.moves,
+        "motion_count": len(animation.motions),
+        "frame_count": max((motion.frame_count for motion in animation.motions), default=0),
+        "translation_count": len(animation.translations),
+        "rotation_count": len(animation.rotations),
+    }
+
+
+def skel_issues(skeleton: skel.Skel) -> list[str]:
+    """Find bones with missing parents and duplicate bone names in a skel.
+
+    Root bones have the parent NULL.
+    """
+    issues = []
+    names = set()
+    for bone in skeleton.bones:
+        if bone.name in names:
+            issues.append(f"Bone {bone.name} is defined more than once")
+        names.add(bone.name)
+
+    issues += [
+        f"Bone {bone.name} has a parent {bone.parent} which does not exist"
+        for bone in skeleton.bones
+        if bone.parent not in ("", skel.NULL_PARENT) and bone.parent not in names
+    ]
+
+    return issues
+
+
+def mesh_issues(mesh_data: mesh.Mesh) -> list[str]:
+    """Find out of range indices in a mesh."""
+    issues = []
+
+    vertex_count = len(mesh_data.vertices)
+    blend_vertex_count = len(mesh_data.blend_vertices)
+
+    if len(mesh_data.uvs) != vertex_count:
+        issues.append(f"The mesh has {len(mesh_data.uvs)} uvs for {vertex_count} vertices")
+
+    bad_faces = [index for index, face in enumerate(mesh_data.faces) if max(face) >= vertex_count]
+    if bad_faces:
+        issues.append(f"{len(bad_faces)} faces use vertices that do not exist, the first is face {bad_faces[0]}")
+
+    for index, binding in enumerate(mesh_data.bone_bindings):
+        if binding.bone_index >= len(mesh_data.bones):
+            issues.append(f"Bone binding {index} uses bone {binding.bone_index} which does not exist")
+        if binding.vertex_index + binding.vertex_count > vertex_count:
+            issues.append(f"Bone binding {index} uses vertices that do not exist")
+        if binding.blended_vertex_index + binding.blended_vertex_count > len(mesh_data.blends):
+            issues.append(f"Bone binding {index} uses blends that do not exist")
+
+    bad_blends = [index for index, blend in enumerate(mesh_data.blends) if blend.vertex_index >= vertex_count]
+    if bad_blends:
+        issues.append(f"{len(bad_blends)} blends use vertices that do not exist, the first is blend {bad_blends[0]}")
+
+    if blend_vertex_count != len(mesh_data.blends):
+        issues.append(f"The mesh has {len(mesh_data.blends)} blends for {blend_vertex_count} blended vertices")
+
+    return issues
+
+
+def anim_issues(animation: anim.Anim) -> list[str]:
+    """Find motions with frames outside of the translation and rotation pools of an anim."""
+    issues = []
+
+    for motion in animation.motions:
+        if motion.uses_positions and (
+            motion.position_offset < 0 or motion.position_offset + motion.frame_count > len(animation.translations)
+        ):
+            issues.append(f"The translations of {motion.bone_name} are outside of the translation pool")
+        if motion.uses_rotations and (
+            motion.rotation_offset < 0 or motion.rotation_offset + motion.frame_count > len(animation.rotations)
+        ):
+            issues.append(f"The rotations of {motion.bone_name} are outside of the rotation pool")
+
+    return issues
+
+
+INFO: dict[type, typing.Callable[[typing.Any], dict]] = {
+    skel.Skel: skel_info,
+    mesh.Mesh: mesh_info,
+    anim.Anim: anim_info,
+}
+
+ISSUES: dict[type, typing.Callable[[typing.Any], list[str]]] = {
+    skel.Skel: skel_issues,
+    mesh.Mesh: mesh_issues,
+    anim.Anim: anim_issues,
+}
+
+
+def info(file_path: pathlib.Path) -> dict:
+    """Summarize a file."""
+    try:
+        data = read_file(file_path)
+    except utils.FileReadError as exception:
+        return {"path": str(file_path), "error": utils.error_message(exception)}
+
+    return {"path": str(file_path), "type": file_path.suffix.lower()[1:], **INFO[type(data)](data)}
+
+
+def validate(file_path: pathlib.Path) -> dict:
+    """Check that a file can be read and its indices and offsets are in range."""
+    try:
+        data = read_file(file_path)
+    except utils.FileReadError as exception:
+        return {"path": str(file_path), "valid": False, "issues": [utils.error_message(exception)]}
+
+    issues = ISSUES[type(data)](data)
+    return {"path": str(file_path), "valid": not issues, "issues": issues}
+
+
+def dump_json(file_path: pathlib.Path) -> dict:
+    """Convert all the contents of a file to JSON."""
+    try:
+        data = read_file(file_path)
+    except utils.FileReadError as exception:
+        return {"path": str(file_path), "error": utils.error_message(exception)}
+
+    return {"path": str(file_path), "type": file_path.suffix.lower()[1:], "data": to_json(data)}
+
+
+def differences(a: object, b: object, path: str, tolerance: float, found: list[str]) -> None:
+    """Find the paths of values that differ between two JSON values, stopping after MAX_DIFFERENCES."""
+    if len(found) >= MAX_DIFFERENCES:
+        return
+
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in a.keys() | b.keys():
+            if key not in a or key not in b:
+                found.append(f"{path}.{key}")
+            else:
+                differences(a[key], b[key], f"{path}.{key}", tolerance, found)
+    elif isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            found.append(f"{path} has {len(a)} and {len(b)} items")
+        for index, (item_a, item_b) in enumerate(zip(a, b, strict=False)):
+            differences(item_a, item_b, f"{path}[{index}]", tolerance, found)
+    elif isinstance(a, float) and isinstance(b, float):
+        if not math.isclose(a, b, rel_tol=0.0, abs_tol=tolerance):
+            found.append(path)
+    elif a != b:
+        found.append(path)
+
+
+def diff(paths: tuple[pathlib.Path, pathlib.Path], tolerance: float) -> dict:
+    """Compare the contents of two files."""
+    path_a, path_b = paths
+
+    try:
+        data_a = to_json(read_file(path_a))
+        data_b = to_json(read_file(path_b))
+    except utils.FileReadError as exception:
+        return {"path": str(path_a), "other_path": str(path_b), "error": utils.error_message(exception)}
+
+    found: list[str] = []
+    differences(data_a, data_b, "", tolerance, found)
+
+    return {"path": str(path_a), "other_path": str(path_b), "same": not found, "differences": found}
+
+
+def diff_pairs(
+    path_a: pathlib.Path,
+    path_b: pathlib.Path,
+) -> tuple[list[tuple[pathlib.Path, pathlib.Path]], list[dict]]:
+    """Match the files of two files or directories by their relative paths, and report the unmatched ones."""
+    if not path_a.is_dir() or not path_b.is_dir():
+        return [(path_a, path_b)], []
+
+    relative_a = {file_path.relative_to(path_a) for file_path in find_files([path_a])}
+    relative_b = {file_path.relative_to(path_b) for file_path in find_files([path_b])}
+
+    pairs = [(path_a / relative, path_b / relative) for relative in sorted(relative_a & relative_b)]
+    unmatched = [
+        {"path": str(directory / relative), "only_in": str(directory)}
+        for directory, relatives in ((path_a, relative_a - relative_b), (path_b, relative_b - relative_a))
+        for relative in sorted(relatives)
+    ]
+
+    return pairs, unmatched
+
+
+def is_failure(result: dict) -> bool:
+    """Check if a result makes the command fail."""
+    return "error" in result or "only_in" in result or not result.get("valid", True) or not result.get("same", True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the command line tools."""
+    parser = argparse.ArgumentParser(prog="python -m io_scene_tso.tools", description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=None, help="the number of processes, by default one per cpu")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in (
+        ("info", "summarize files"),
+        ("validate", "check that files can be read and their indices are in range"),
+        ("dump-json", "print the full contents of files"),
+    ):
+        subparser = subparsers.add_parser(command, help=help_text)
+        subparser.add_argument("paths", nargs="+", type=pathlib.Path, help="files or directories")
+
+    diff_parser = subparsers.add_parser("diff", help="compare two files, or the files of two directories")
+    diff_parser.add_argument("path_a", type=pathlib.Path)
+    diff_parser.add_argument("path_b", type=pathlib.Path)
+    diff_parser.add_argument("--tolerance", type=float, default=0.0, help="the largest difference between floats")
+
+    index_parser = subparsers.add_parser("index", help="index the files of a directory in a catalog database")
+    index_parser.add_argument("database", type=pathlib.Path)
+    index_parser.add_argument("directory", type=pathlib.Path)
+
+    query_parser = subparsers.add_parser("query", help="print the rows of a query on a catalog database")
+    query_parser.add_argument("database", type=pathlib.Path)
+    query_parser.add_argument("sql")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "index":
+        stats = catalog.index_directory(args.database, args.directory)
+        sys.stdout.write(json.dumps(dataclasses.asdict(stats)) + "\n")
+        return 0
+
+    if args.command == "query":
+        try:
+            rows = catalog.query(args.database, args.sql)
+        except sqlite3.Error as exception:
+            sys.stderr.write(f"{exception}\n")
+            return 1
+        sys.stdout.writelines(json.dumps(dict(row)) + "\n" for row in rows)
+        return 0
+
+    exit_code = 0
+
+    def output(result: dict) -> None:
+        nonlocal exit_code
+        if is_failure(result):
+            exit_code = 1
+        sys.stdout.write(json.dumps(result) + "\n")
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        if args.command == "diff":
+            pairs, unmatched = diff_pairs(args.path_a, args.path_b)
+            for result in unmatched:
+                output(result)
+            tolerances = [args.tolerance] * len(pairs)
+            for result in executor.map(diff, pairs, tolerances, chunksize=16):
+                output(result)
+        else:
+            function = {"info": info, "validate": validate, "dump-json": dump_json}[args.command]
+            for result in executor.map(function, find_files(args.paths), chunksize=16):
+                output(result)
+
+    sys.stdout.flush()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Transform many matrices and quaternions at once.
+
+Quaternions are stored as (w, x, y, z) along the last axis, like mathutils.
+"""
+
+import numpy as np
+
+
+def multiply_quaternions(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Multiply quaternions, broadcasting over all but the last axis."""
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack(
+        (
+            aw * bw - ax * bx - ay * by - az * bz,
+            aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx,
+            aw * bz + ax * by - ay * bx + az * bw,
+        ),
+        axis=-1,
+    )
+
+
+def canonical_quaternions(quaternions: np.ndarray) -> np.ndarray:
+    """Normalize quaternions and flip them so w is not negative, like mathutils Matrix.to_quaternion."""
+    quaternions = quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    return np.where(quaternions[..., :1] < 0.0, -quaternions, quaternions)
+
+
+def matrices_to_quaternions(matrices: np.ndarray) -> np.ndarray:
+    """Convert the rotation of 3x3 or 4x4 matrices to quaternions."""
+    rotations = matrices[..., :3, :3]
+    rotations = rotations / np.linalg.norm(rotations, axis=-2, keepdims=True)
+
+    m00, m01, m02 = rotations[..., 0, 0], rotations[..., 0, 1], rotations[..., 0, 2]
+    m10, m11, m12 = rotations[..., 1, 0], rotations[..., 1, 1], rotations[..., 1, 2]
+    m20, m21, m22 = rotations[..., 2, 0], rotations[..., 2, 1], rotations[..., 2, 2]
+
+    # each candidate is accurate when its first component is large, so pick the largest
+    traces = np.stack(
+        (
+            1.0 + m00 + m11 + m22,
+            1.0 + m00 - m11 - m22,
+            1.0 - m00 + m11 - m22,
+            1.0 - m00 - m11 + m22,
+        ),
+        axis=-1,
+    )
+    candidates = np.stack(
+        (
+            np.stack((traces[..., 0], m21 - m12, m02 - m20, m10 - m01), axis=-1),
+            np.stack((m21 - m12, traces[..., 1], m01 + m10, m02 + m20), axis=-1),
+            np.stack((m02 - m20, m01 + m10, traces[..., 2], m12 + m21), axis=-1),
+            np.stack((m10 - m01, m02 + m20, m12 + m21, traces[..., 3]), axis=-1),
+        ),
+        axis=-2,
+    )
+
+    best = np.argmax(traces, axis=-1)[..., np.newaxis, np.newaxis]
+    quaternions = np.take_along_axis(candidates, best, axis=-2)[..., 0, :]
+
+    return canonical_quaternions(quaternions)
+
+
+def quaternions_to_matrices(quaternions: np.ndarray) -> np.ndarray:
+    """Convert quaternions to 3x3 rotation matrices."""
+    quaternions = quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    w, x, y, z = np.moveaxis(quaternions, -1, 0)
+    return np.stack(
+        (
+            np.stack((1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - w * z), 2.0 * (x * z + w * y)), axis=-1),
+            np.stack((2.0 * (x * y + w * z), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z - w * x)), axis=-1),
+            np.stack((2.0 * (x * z - w * y), 2.0 * (y * z + w * x), 1.0 - 2.0 * (x * x + y * y)), axis=-1),
+        ),
+        axis=-2,
+    )
+
+
+def transform_points(matrices: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Transform 3d points by 4x4 matrices."""
+    return np.einsum("...ij,...j->...i", matrices[..., :3, :3], points) + matrices[..., :3, 3]
+
+
+def transform_directions(matrices: np.ndarray, directions: np.ndarray) -> np.ndarray:
+    """Transform 3d directions by the rotation and scale of 3x3 or 4x4 matrices."""
+    return np.einsum("...ij,...j->...i", matrices[..., :3, :3], directions)
@@ -1,9 +1,13 @@
 """Utility functions and classes."""
 
+import array
 import dataclasses
+import io
 import math
 import mathutils
+import pathlib
 import struct
+import sys
 import typing
 
 
@@ -12,10 +16,92 @@ BONE_ROTATION_OFFSET = mathutils.Matrix.Rotation(math.radians(-90.0), 4, 'Z')
 BONE_ROTATION_OFFSET_INVERTED = BONE_ROTATION_OFFSET.inverted()
 
 
+def bytes_remaining(file: typing.BinaryIO) -> int:
+    """Get the number of bytes between the current position and the end of a file."""
+    position = file.tell()
+    end = file.seek(0, io.SEEK_END)
+    file.seek(position)
+    return end - position
+
+
+def check_count(file: typing.BinaryIO, section: str, offset: int, count: int, element_size: int) -> None:
+    """Check that the rest of a file is big enough to hold count elements of at least element_size bytes.
+
+    This stops a corrupt count from allocating a huge list before the file runs out.
+    """
+    available = bytes_remaining(file)
+    expected = count * element_size
+    if expected > available:
+        message = (
+            f"{section} at offset {offset} has {count} entries which need at least {expected} bytes, "
+            f"but only {available} bytes are available"
+        )
+        raise FileReadError(message)
+
+
+def read_count(file: typing.BinaryIO, section: str, element_size: int) -> int:
+    """Read the 32 bit count of a section, and check the rest of the file is big enough to hold it."""
+    offset = file.tell()
+    count = unpack(file, '>I', section)[0]
+    check_count(file, section, offset, count, element_size)
+    return count
+
+
+def read_exact(file: typing.BinaryIO, size: int, section: str) -> bytes:
+    """Read exactly size bytes from a file."""
+    offset = file.tell()
+    data = file.read(size)
+    if len(data) != size:
+        message = f"{section} at offset {offset} needs {size} bytes, but only {len(data)} bytes are available"
+        raise FileReadError(message)
+    return data
+
+
+def unpack(file: typing.BinaryIO, fmt: str, section: str) -> tuple:
+    """Read and unpack the fixed size values of a struct format from a file."""
+    return struct.unpack(fmt, read_exact(file, struct.calcsize(fmt), section))
+
+
+def read_uint_array_be(file: typing.BinaryIO, count: int, section: str) -> array.array:
+    """Read an array of big endian 32 bit unsigned integers."""
+    values = array.array('I')
+    values.frombytes(read_exact(file, count * 4, section))
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values
+
+
+def read_float_array(file: typing.BinaryIO, count: int, section: str) -> array.array:
+    """Read an array of little endian 32 bit floats."""
+    values = array.array('f')
+    values.frombytes(read_exact(file, count * 4, section))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def write_float_array(file: typing.BinaryIO, values: array.array) -> None:
+    """Write an array of 32 bit floats as little endian."""
+    if sys.byteorder == 'big':
+        values = array.array('f', values)
+        values.byteswap()
+    file.write(values.tobytes())
+
+
+def decode_string(data: bytes, offset: int) -> str:
+    """Decode a string read from a file."""
+    try:
+        return data.decode("windows-1252")
+    except UnicodeDecodeError as exception:
+        message = f"String at offset {offset} is not valid windows-1252 text"
+        raise FileReadError(message) from exception
+
+
 def read_string(file: typing.BinaryIO) -> str:
     """Read a pascal string from a file."""
-    length = struct.unpack('B', file.read(1))[0]
-    return file.read(length).decode("windows-1252")
+    offset = file.tell()
+    length = unpack(file, 'B', "String")[0]
+    return decode_string(read_exact(file, length, "String"), offset)
 
 
 def write_string(file: typing.BinaryIO, string: str) -> None:
@@ -26,8 +112,9 @@ def write_string(file: typing.BinaryIO, string: str) -> None:
 
 def read_string_16_bit_length_be(file: typing.BinaryIO) -> str:
     """Read a pascal string from a file."""
-    length = struct.unpack('>H', file.read(2))[0]
-    return file.read(length).decode("windows-1252")
+    offset = file.tell()
+    length = unpack(file, '>H', "String")[0]
+    return decode_string(read_exact(file, length, "String"), offset)
 
 
 def write_string_16_bit_length_be(file: typing.BinaryIO, string: str) -> None:
@@ -36,7 +123,7 @@ def write_string_16_bit_length_be(file: typing.BinaryIO, string: str) -> None:
     file.write(string.encode("windows-1252"))
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Property:
     """A property."""
 
@@ -44,9 +131,12 @@ class Property:
     value: str
 
 
+PROPERTY_MIN_SIZE = 2  # two empty strings
+
+
 def read_properties(file: typing.BinaryIO) -> list[Property]:
     """Read properties from a file."""
-    count = struct.unpack('>I', file.read(4))[0]
+    count = read_count(file, "Properties", PROPERTY_MIN_SIZE)
     return [
         Property(
             read_string(file),
@@ -64,16 +154,19 @@ def write_properties(file: typing.BinaryIO, properties: list[Property]) -> None:
         write_string(file, prop.value)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class PropertyList:
     """A property list."""
 
     properties: list[Property]
 
 
+PROPERTY_LIST_MIN_SIZE = 4  # an empty list of properties
+
+
 def read_property_lists(file: typing.BinaryIO) -> list[PropertyList]:
     """Read property lists from a file."""
-    count = struct.unpack('>I', file.read(4))[0]
+    count = read_count(file, "Property lists", PROPERTY_LIST_MIN_SIZE)
     return [
         PropertyList(
             read_properties(file),
@@ -89,5 +182,56 @@ def write_property_lists(file: typing.BinaryIO, property_lists: list[PropertyLis
         write_properties(file, property_list.properties)
 
 
+class MemoryFile:
+    """A file held in memory, which the readers can read in place of a path."""
+
+    def __init__(self, name: str, data: bytes | None) -> None:
+        """Create a file with a name and its contents."""
+        self.path = pathlib.PurePosixPath(name)
+        self.data = data
+
+    @property
+    def name(self) -> str:
+        """The name of the file."""
+        return self.path.name
+
+    @property
+    def stem(self) -> str:
+        """The name of the file without its extension."""
+        return self.path.stem
+
+    @property
+    def suffix(self) -> str:
+        """The extension of the file."""
+        return self.path.suffix
+
+    def read_bytes(self) -> bytes:
+        """Get the contents of the file."""
+        return self.data
+
+    def open(self, mode: str = 'rb') -> io.BytesIO:
+        """Open the contents of the file for reading."""
+        if mode != 'rb':
+            message = "Memory files can only be opened for reading in binary mode"
+            raise ValueError(message)
+        return io.BytesIO(self.read_bytes())
+
+    def __str__(self) -> str:
+        """Get the name of the file."""
+        return str(self.path)
+
+
+FilePath = pathlib.Path | MemoryFile
+
+
+def error_message(exception: "FileReadError") -> str:
+    """Get a description of why a file could not be read."""
+    if exception.args:
+        return str(exception.args[0])
+    if exception.__cause__ is not None:
+        return repr(exception.__cause__)
+    return "Could not read the file"
+
+
 class FileReadError(Exception):
     """General purpose file read error."""
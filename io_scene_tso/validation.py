@@ -0,0 +1,115 @@
+"""Check that meshes and actions can be exported before exporting anything."""
+
+import bpy
+import dataclasses
+import numpy as np
+
+from . import lazy_anim
+from . import vertex_weights
+
+
+LOCATION_CHANNEL_COUNT = 3
+ROTATION_CHANNEL_COUNT = 4
+EVENT_COMPONENT_COUNT = 3  # the bone, name and value of an event
+
+
+@dataclasses.dataclass
+class Problem:
+    """Something that stops a mesh or action from being exported."""
+
+    kind: str  # "mesh" or "action"
+    name: str
+    message: str
+
+
+@dataclasses.dataclass
+class ValidationReport:
+    """The problems of all the meshes and actions that are about to be exported."""
+
+    problems: list[Problem] = dataclasses.field(default_factory=list)
+    mesh_count: int = 0
+    action_count: int = 0
+
+    def add(self, kind: str, name: str, messages: list[str]) -> None:
+        """Add the problems found in a mesh or action, skipping the ones already reported."""
+        for message in messages:
+            problem = Problem(kind, name, message)
+            if problem not in self.problems:
+                self.problems.append(problem)
+
+    def summary(self) -> str:
+        """Describe all the problems, one per line."""
+        heading = (
+            f"Nothing was exported, {len(self.problems)} problems were found in {self.mesh_count} meshes and "
+            f"{self.action_count} actions:"
+        )
+        lines = [f"{problem.kind} {problem.name}: {problem.message}" for problem in self.problems]
+        return "\n".join([heading, *lines])
+
+
+def validate_mesh(mesh_object: bpy.types.Object, *, normalize_weights: bool) -> list[str]:
+    """Check a mesh object with whole array checks, returning its problems.
+
+    Meshes not parented to an armature have no problems, as they are skipped when exporting.
+    """
+    if mesh_object.parent is None or mesh_object.parent.type != 'ARMATURE':
+        return []
+
+    problems = []
+    mesh_data = mesh_object.data
+
+    if not mesh_data.uv_layers:
+        problems.append("it has no uv map")
+
+    positions = np.empty(len(mesh_data.vertices) * 3, dtype=np.float32)
+    mesh_data.vertices.foreach_get("co", positions)
+    if not np.isfinite(positions).all():
+        problems.append("it has vertices with positions that are not numbers")
+
+    _, weight_report = vertex_weights.mesh_influences(mesh_object, normalize=normalize_weights)
+    problems += weight_report.errors(mesh_object.name, normalize=normalize_weights)
+
+    return problems
+
+
+def validate_action(armature_object: bpy.types.Object, action: bpy.types.Action) -> list[str]:
+    """Check the bone channels, frame range and events of an action used by an armature, returning its problems."""
+    if lazy_anim.LAZY_ERROR_PROPERTY in action:
+        return [action[lazy_anim.LAZY_ERROR_PROPERTY]]
+
+    problems = []
+
+    if action.frame_end < action.frame_start:
+        problems.append(f"it ends on frame {action.frame_end:g} before it starts on frame {action.frame_start:g}")
+
+    # lazily imported actions have no channels until they are loaded, and were valid anim files
+    if not lazy_anim.is_lazy(action):
+        channels = {(fcurve.data_path, fcurve.array_index) for fcurve in action.fcurves}
+        animated_bone_count = 0
+
+        for bone in armature_object.pose.bones:
+            for property_name, channel_count in (
+                ("location", LOCATION_CHANNEL_COUNT),
+                ("rotation_quaternion", ROTATION_CHANNEL_COUNT),
+            ):
+                data_path = bone.path_from_id(property_name)
+                indices = [index for index in range(channel_count) if (data_path, index) in channels]
+                if not indices:
+                    continue
+
+                animated_bone_count += 1
+                if len(indices) != channel_count:
+                    problems.append(f"{property_name} of bone {bone.name} is missing some of its channels")
+
+        if animated_bone_count == 0:
+            problems.append(
+                f"it does not animate the location or quaternion rotation of any bone of {armature_object.name}",
+            )
+
+    for marker in action.pose_markers:
+        for event_string in marker.name.split(";"):
+            if len(event_string.split()) < EVENT_COMPONENT_COUNT:
+                problems.append(f"pose marker {marker.name} is not in the format <bone> <eventname> <eventvalue>")
+                break
+
+    return problems
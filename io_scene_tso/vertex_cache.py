@@ -0,0 +1,175 @@
+"""Reorder the faces and vertices of meshes so the game reuses more transformed vertices.
+
+Faces are reordered with Tom Forsyth's linear-speed vertex cache optimisation, then the vertices of each bone
+binding are renumbered in the order the faces first use them.
+"""
+
+import collections
+import dataclasses
+
+from . import mesh
+
+
+MAX_CACHE_SIZE = 32  # the size of the cache Forsyth scores vertices for
+CACHE_DECAY_POWER = 1.5
+LAST_TRIANGLE_SCORE = 0.75
+VALENCE_BOOST_SCALE = 2.0
+VALENCE_BOOST_POWER = 0.5
+
+SIMULATED_CACHE_SIZE = 16  # the first in first out cache used to measure the average cache miss ratio
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """The cache misses of meshes before and after optimizing them."""
+
+    triangle_count: int = 0
+    misses_before: int = 0
+    misses_after: int = 0
+
+    def acmr_before(self) -> float:
+        """Get the average number of cache misses per triangle before optimizing."""
+        return self.misses_before / self.triangle_count if self.triangle_count else 0.0
+
+    def acmr_after(self) -> float:
+        """Get the average number of cache misses per triangle after optimizing."""
+        return self.misses_after / self.triangle_count if self.triangle_count else 0.0
+
+
+def cache_misses(faces: list[tuple[int, int, int]], cache_size: int = SIMULATED_CACHE_SIZE) -> int:
+    """Count the vertices a first in first out cache of transformed vertices misses when drawing faces in order."""
+    cache: collections.deque[int] = collections.deque(maxlen=cache_size)
+    cached = set()
+    misses = 0
+
+    for face in faces:
+        for vertex_index in face:
+            if vertex_index in cached:
+                continue
+
+            misses += 1
+            if len(cache) == cache_size:
+                cached.discard(cache[0])
+            cache.append(vertex_index)
+            cached.add(vertex_index)
+
+    return misses
+
+
+def vertex_score(cache_position: int, remaining_valence: int) -> float:
+    """Score a vertex by its position in the cache and the number of faces still using it."""
+    if remaining_valence == 0:
+        return -1.0
+
+    score = 0.0
+    if cache_position >= 0:
+        if cache_position < 3:
+            # the vertices of the last face get a fixed score so a face using them all is not always best
+            score = LAST_TRIANGLE_SCORE
+        else:
+            score = (1.0 - (cache_position - 3) / (MAX_CACHE_SIZE - 3)) ** CACHE_DECAY_POWER
+
+    # prefer vertices with few faces left, so they are finished and leave the cache
+    return score + VALENCE_BOOST_SCALE * remaining_valence**-VALENCE_BOOST_POWER
+
+
+def reorder_faces(faces: list[tuple[int, int, int]], vertex_count: int) -> list[tuple[int, int, int]]:
+    """Reorder faces to use the vertices in the cache as much as possible."""
+    vertex_faces: list[list[int]] = [[] for _ in range(vertex_count)]
+    for face_index, face in enumerate(faces):
+        for vertex_index in dict.fromkeys(face):
+            vertex_faces[vertex_index].append(face_index)
+
+    remaining_valences = [len(face_indices) for face_indices in vertex_faces]
+    vertex_scores = [vertex_score(-1, valence) for valence in remaining_valences]
+    face_scores = [sum(vertex_scores[vertex_index] for vertex_index in face) for face in faces]
+    is_drawn = [False] * len(faces)
+
+    cache: list[int] = []
+    ordered_faces = []
+    best_face = max(range(len(faces)), key=face_scores.__getitem__, default=-1)
+    next_unscored_face = 0
+
+    while best_face >= 0:
+        is_drawn[best_face] = True
+        ordered_faces.append(faces[best_face])
+
+        face_vertices = list(dict.fromkeys(faces[best_face]))
+        for vertex_index in face_vertices:
+            remaining_valences[vertex_index] -= 1
+            vertex_faces[vertex_index].remove(best_face)
+
+        # move the vertices of the face to the front of the cache, keeping the ones pushed out to rescore them
+        cache = face_vertices + [vertex_index for vertex_index in cache if vertex_index not in face_vertices]
+        evicted = cache[MAX_CACHE_SIZE:]
+        cache = cache[:MAX_CACHE_SIZE]
+
+        changed_faces = set()
+        for cache_position, vertex_index in enumerate(cache):
+            new_score = vertex_score(cache_position, remaining_valences[vertex_index])
+            score_change = new_score - vertex_scores[vertex_index]
+            vertex_scores[vertex_index] = new_score
+            for face_index in vertex_faces[vertex_index]:
+                face_scores[face_index] += score_change
+                changed_faces.add(face_index)
+
+        for vertex_index in evicted:
+            new_score = vertex_score(-1, remaining_valences[vertex_index])
+            score_change = new_score - vertex_scores[vertex_index]
+            vertex_scores[vertex_index] = new_score
+            for face_index in vertex_faces[vertex_index]:
+                face_scores[face_index] += score_change
+
+        best_face = max(changed_faces, key=face_scores.__getitem__, default=-1)
+
+        if best_face < 0:
+            # nothing in the cache is used anymore, so continue with any face that is left
+            while next_unscored_face < len(faces) and is_drawn[next_unscored_face]:
+                next_unscored_face += 1
+            best_face = next_unscored_face if next_unscored_face < len(faces) else -1
+
+    return ordered_faces
+
+
+def renumber_vertices(mesh_data: mesh.Mesh, faces: list[tuple[int, int, int]]) -> mesh.Mesh:
+    """Renumber the vertices of each bone binding in the order faces first use them, keeping them in their binding."""
+    first_uses = {}
+    for face in faces:
+        for vertex_index in face:
+            first_uses.setdefault(vertex_index, len(first_uses))
+
+    vertex_map = list(range(len(mesh_data.vertices)))
+    for bone_binding in mesh_data.bone_bindings:
+        binding_range = range(bone_binding.vertex_index, bone_binding.vertex_index + bone_binding.vertex_count)
+        # vertices no faces use keep their order after the used ones
+        ordered = sorted(binding_range, key=lambda vertex_index: first_uses.get(vertex_index, len(first_uses)))
+        for new_index, old_index in zip(binding_range, ordered, strict=True):
+            vertex_map[old_index] = new_index
+
+    vertices = list(mesh_data.vertices)
+    uvs = list(mesh_data.uvs)
+    for old_index, new_index in enumerate(vertex_map):
+        vertices[new_index] = mesh_data.vertices[old_index]
+        uvs[new_index] = mesh_data.uvs[old_index]
+
+    return mesh.Mesh(
+        mesh_data.bones,
+        [tuple(vertex_map[vertex_index] for vertex_index in face) for face in faces],
+        mesh_data.bone_bindings,
+        uvs,
+        [mesh.Blend(blend.weight, vertex_map[blend.vertex_index]) for blend in mesh_data.blends],
+        vertices,
+        mesh_data.blend_vertices,
+    )
+
+
+def optimize_mesh(mesh_data: mesh.Mesh, stats: CacheStats) -> mesh.Mesh:
+    """Reorder the faces and vertices of a mesh for the vertex cache, adding the cache misses to stats."""
+    faces = reorder_faces(mesh_data.faces, len(mesh_data.vertices))
+    optimized = renumber_vertices(mesh_data, faces)
+
+    stats.triangle_count += len(mesh_data.faces)
+    stats.misses_before += cache_misses(mesh_data.faces)
+    stats.misses_after += cache_misses(optimized.faces)
+
+    return optimized
@@ -0,0 +1,188 @@
+"""Limit the vertex group weights of meshes to what mesh files can store.
+
+A mesh file binds every vertex to one bone, and optionally blends it with a second bone by a weight. The weights of all
+vertices are read into flat arrays once, and checked or pruned to the two largest bone influences as a whole.
+"""
+
+import bpy
+import dataclasses
+import numpy as np
+
+
+MAX_INFLUENCE_COUNT = 2
+NORMALIZED_TOLERANCE = 0.0001  # how far the bone weights of a vertex can add up from 1 without being reported
+
+
+@dataclasses.dataclass
+class Weights:
+    """The vertex group weights of a mesh, one element per vertex and group in the order Blender stores them."""
+
+    vertex_indices: np.ndarray
+    group_indices: np.ndarray
+    weights: np.ndarray
+
+
+@dataclasses.dataclass
+class Influences:
+    """The bones each vertex is bound to, with -1 as the secondary group of vertices that are not blended."""
+
+    primary_groups: list[int]
+    secondary_groups: list[int]
+    secondary_weights: list[float]
+
+
+@dataclasses.dataclass
+class WeightReport:
+    """What was wrong with the weights of a mesh, or what was changed to fix it."""
+
+    non_bone_groups: list[str] = dataclasses.field(default_factory=list)
+    unweighted_vertex_count: int = 0
+    pruned_vertex_count: int = 0
+    renormalized_vertex_count: int = 0
+    zero_weight_count: int = 0
+
+    def errors(self, mesh_name: str, *, normalize: bool) -> list[str]:
+        """Describe the problems that stop a mesh from being exported."""
+        messages = []
+        if self.unweighted_vertex_count:
+            messages.append(f"{self.unweighted_vertex_count} vertices of {mesh_name} are not weighted to any bone")
+        if not normalize and self.non_bone_groups:
+            messages.append(
+                f"Vertex groups {', '.join(self.non_bone_groups)} of {mesh_name} are not bones in its armature",
+            )
+        if not normalize and self.pruned_vertex_count:
+            messages.append(
+                f"{self.pruned_vertex_count} vertices of {mesh_name} are in more than "
+                f"{MAX_INFLUENCE_COUNT} vertex groups",
+            )
+        return messages
+
+    def changes(self, mesh_name: str) -> str | None:
+        """Describe what normalizing changed in the weights of a mesh, or None if nothing changed."""
+        changes = []
+        if self.non_bone_groups:
+            changes.append(f"ignored vertex groups {', '.join(self.non_bone_groups)} that are not bones")
+        if self.zero_weight_count:
+            changes.append(f"dropped {self.zero_weight_count} zero weights")
+        if self.pruned_vertex_count:
+            changes.append(
+                f"kept the {MAX_INFLUENCE_COUNT} largest weights of {self.pruned_vertex_count} vertices",
+            )
+        if self.renormalized_vertex_count:
+            changes.append(f"normalized the weights of {self.renormalized_vertex_count} vertices")
+        if not changes:
+            return None
+        return f"Normalizing the weights of {mesh_name} " + ", ".join(changes)
+
+
+def read_weights(mesh_data: bpy.types.Mesh) -> Weights:
+    """Read the vertex group weights of a mesh."""
+    vertex_indices = []
+    group_indices = []
+    weights = []
+    for vertex in mesh_data.vertices:
+        for group in vertex.groups:
+            vertex_indices.append(vertex.index)
+            group_indices.append(group.group)
+            weights.append(group.weight)
+
+    return Weights(
+        np.array(vertex_indices, dtype=np.int32),
+        np.array(group_indices, dtype=np.int32),
+        np.array(weights, dtype=np.float32),
+    )
+
+
+def rank_influences(vertex_indices: np.ndarray, vertex_count: int) -> np.ndarray:
+    """Get the position of each element among the elements of its vertex, for elements sorted by vertex."""
+    first_elements = np.searchsorted(vertex_indices, np.arange(vertex_count))
+    return np.arange(len(vertex_indices)) - first_elements[vertex_indices]
+
+
+def limit_influences(
+    weights: Weights,
+    vertex_count: int,
+    used_vertices: np.ndarray,
+    is_bone: np.ndarray,
+    group_names: list[str],
+    *,
+    normalize: bool,
+) -> tuple[Influences, WeightReport]:
+    """Find the primary and secondary bone of each vertex, and report what is wrong with the weights.
+
+    Without normalizing, vertices are bound to their first two groups as they are, and every problem is an error.
+    Normalizing drops zero weights and groups that are not bones, keeps the two largest weights of each vertex and
+    scales them to add up to 1, so only vertices without any bone weight are errors. Only vertices used by faces are
+    reported.
+    """
+    report = WeightReport()
+    element_count = len(weights.weights)
+    is_bone_element = is_bone[weights.group_indices] if element_count else np.zeros(0, dtype=bool)
+    is_used_element = used_vertices[weights.vertex_indices] if element_count else np.zeros(0, dtype=bool)
+
+    if normalize:
+        used_groups = np.unique(weights.group_indices[is_used_element & (weights.weights > 0.0)])
+        report.non_bone_groups = [group_names[group] for group in used_groups if not is_bone[group]]
+        report.zero_weight_count = int(np.count_nonzero(is_used_element & is_bone_element & (weights.weights <= 0.0)))
+        kept = is_bone_element & (weights.weights > 0.0)
+        # sort by vertex, then by descending weight, keeping the order of equal weights
+        order = np.lexsort((np.arange(element_count)[kept], -weights.weights[kept], weights.vertex_indices[kept]))
+        order = np.flatnonzero(kept)[order]
+    else:
+        report.non_bone_groups = [name for index, name in enumerate(group_names) if not is_bone[index]]
+        order = np.argsort(weights.vertex_indices, kind="stable")
+
+    vertex_indices = weights.vertex_indices[order]
+    group_indices = weights.group_indices[order]
+    element_weights = weights.weights[order]
+    ranks = rank_influences(vertex_indices, vertex_count)
+
+    influence_counts = np.bincount(vertex_indices, minlength=vertex_count)
+    report.unweighted_vertex_count = int(np.count_nonzero(used_vertices & (influence_counts == 0)))
+    report.pruned_vertex_count = int(np.count_nonzero(used_vertices & (influence_counts > MAX_INFLUENCE_COUNT)))
+
+    primary_groups = np.full(vertex_count, -1, dtype=np.int32)
+    primary_weights = np.zeros(vertex_count, dtype=np.float32)
+    secondary_groups = np.full(vertex_count, -1, dtype=np.int32)
+    secondary_weights = np.zeros(vertex_count, dtype=np.float32)
+
+    is_primary = ranks == 0
+    primary_groups[vertex_indices[is_primary]] = group_indices[is_primary]
+    primary_weights[vertex_indices[is_primary]] = element_weights[is_primary]
+    is_secondary = ranks == 1
+    secondary_groups[vertex_indices[is_secondary]] = group_indices[is_secondary]
+    secondary_weights[vertex_indices[is_secondary]] = element_weights[is_secondary]
+
+    if normalize:
+        totals = primary_weights + secondary_weights
+        report.renormalized_vertex_count = int(
+            np.count_nonzero(used_vertices & (influence_counts > 0) & (np.abs(totals - 1.0) > NORMALIZED_TOLERANCE)),
+        )
+        # the primary bone gets the rest of the weight, so only the secondary weight is stored
+        np.divide(secondary_weights, totals, out=secondary_weights, where=totals > 0.0)
+
+    influences = Influences(primary_groups.tolist(), secondary_groups.tolist(), secondary_weights.tolist())
+    return influences, report
+
+
+def mesh_influences(mesh_object: bpy.types.Object, *, normalize: bool) -> tuple[Influences, WeightReport]:
+    """Find the primary and secondary bone of each vertex of a mesh object parented to an armature."""
+    mesh_data = mesh_object.data
+
+    loop_vertex_indices = np.empty(len(mesh_data.loops), dtype=np.int32)
+    mesh_data.loops.foreach_get("vertex_index", loop_vertex_indices)
+    used_vertices = np.zeros(len(mesh_data.vertices), dtype=bool)
+    used_vertices[loop_vertex_indices] = True
+
+    armature = mesh_object.parent.data
+    group_names = [vertex_group.name for vertex_group in mesh_object.vertex_groups]
+    is_bone = np.array([name in armature.bones for name in group_names], dtype=bool)
+
+    return limit_influences(
+        read_weights(mesh_data),
+        len(mesh_data.vertices),
+        used_vertices,
+        is_bone,
+        group_names,
+        normalize=normalize,
+    )
@@ -0,0 +1,43 @@
+"""Tests of reading anim files and building their pools."""
+
+import array
+
+import pytest
+
+from io_scene_tso import anim
+from io_scene_tso import utils
+
+import tso_files
+
+
+def test_read_anim() -> None:
+    """The motions of an anim are read with their offsets into the pools."""
+    animation = anim.read_compact_file(utils.MemoryFile("walk.anim", tso_files.anim_bytes()))
+
+    assert [(motion.bone_name, motion.frame_count, motion.rotation_offset) for motion in animation.motions] == [
+        ("PELVIS", 3, 0),
+    ]
+
+
+@pytest.mark.parametrize("rotation_offset", [-1, 1])
+def test_read_anim_with_motion_outside_of_pool(rotation_offset: int) -> None:
+    """A motion using frames outside of the rotation pool is reported with its name and offset."""
+    file = utils.MemoryFile("walk.anim", tso_files.anim_bytes(rotation_offset=rotation_offset))
+
+    with pytest.raises(utils.FileReadError, match=r"^Motion PELVIS at offset \d+ uses rotations .* 3 rotations"):
+        anim.read_compact_file(file)
+
+    with pytest.raises(utils.FileReadError, match=r"^Motion PELVIS at offset \d+ uses rotations"):
+        anim.read_file(file)
+
+
+def test_array_pool_shares_runs() -> None:
+    """Runs identical to an earlier run get its offset, and other runs are appended in frames of the pool width."""
+    pool = anim.ArrayPool(3)
+    first = array.array('f', [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]).tobytes()
+    second = array.array('f', [7.0, 8.0, 9.0]).tobytes()
+
+    offsets = [pool.add_run(run) for run in (first, second, first, second, first[:12])]
+
+    assert offsets == [0, 2, 0, 2, 3]
+    assert pool.values.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 1.0, 2.0, 3.0]
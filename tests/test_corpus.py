@@ -0,0 +1,37 @@
+"""Tests of reading the truncated and corrupted files of the corpus.
+
+Each file of the corpus is a well-formed file from tso_files, cut short or with one of its counts inflated.
+"""
+
+import pathlib
+import pytest
+import re
+import time
+
+from io_scene_tso import anim
+from io_scene_tso import mesh
+from io_scene_tso import skel
+from io_scene_tso import utils
+
+
+CORPUS_DIRECTORY = pathlib.Path(__file__).parent / "corpus"
+MAX_READ_SECONDS = 1.0
+
+READERS = {
+    ".skel": [skel.read_file],
+    ".mesh": [mesh.read_file, mesh.read_compact_file],
+    ".anim": [anim.read_file, anim.read_compact_file],
+}
+
+
+@pytest.mark.parametrize("file_path", sorted(CORPUS_DIRECTORY.iterdir()), ids=lambda file_path: file_path.name)
+def test_read_corpus_file(file_path: pathlib.Path) -> None:
+    """Every reader fails quickly with the section and offset of the problem."""
+    for read_file in READERS[file_path.suffix]:
+        start = time.perf_counter()
+        with pytest.raises(utils.FileReadError) as exception_info:
+            read_file(file_path)
+
+        assert time.perf_counter() - start < MAX_READ_SECONDS
+        assert exception_info.value.args, f"{read_file.__module__} gave no message"
+        assert re.match(r"[A-Z][a-z ]* at offset \d+ ", utils.error_message(exception_info.value))
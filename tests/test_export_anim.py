@@ -0,0 +1,118 @@
+"""Tests of converting sampled actions to anim files."""
+
+import io
+import numpy as np
+import pathlib
+import pytest
+
+pytest.importorskip("bpy")
+
+from io_scene_tso import anim
+from io_scene_tso import export_anim
+from io_scene_tso import rest_pose
+
+
+FRAME_COUNT = 20
+TOLERANCE = 1e-4
+
+
+def anim_job(file_path: pathlib.Path = pathlib.Path("walk.anim")) -> export_anim.AnimJob:
+    """Build an anim job for a root bone that moves and a child bone that stays slightly off its rest pose."""
+    state = rest_pose.ArmatureState(
+        ("ROOT", "PELVIS"),
+        ("", "ROOT"),
+        np.tile(np.identity(4, dtype=np.float32), (2, 1, 1)).tobytes(),
+        np.ones(2, dtype=bool).tobytes(),
+    )
+    frames = np.linspace(0.0, 1.0, FRAME_COUNT, dtype=np.float32)[:, np.newaxis]
+
+    root_locations = np.hstack([np.sin(frames * 3.0), frames, np.zeros_like(frames)])
+    root_rotations = np.hstack([np.cos(frames), np.zeros_like(frames), np.zeros_like(frames), np.sin(frames)])
+    pelvis_locations = np.full((FRAME_COUNT, 3), TOLERANCE / 2, dtype=np.float32)
+    pelvis_rotations = np.tile(np.array([1.0, TOLERANCE / 2, 0.0, 0.0], dtype=np.float32), (FRAME_COUNT, 1))
+
+    return export_anim.AnimJob(
+        file_path,
+        file_path.stem,
+        FRAME_COUNT,
+        round(FRAME_COUNT * 1000.0 / 30.0),
+        0.0,
+        [
+            export_anim.BoneSamples("ROOT", root_locations, root_rotations),
+            export_anim.BoneSamples("PELVIS", pelvis_locations, pelvis_rotations),
+        ],
+        rest_pose.create_rest_pose(state),
+        {},
+    )
+
+
+def anim_file_bytes(animation: anim.CompactAnim) -> bytes:
+    """Write an anim to bytes."""
+    file = io.BytesIO()
+    anim.write_compact_anim(file, animation)
+    return file.getvalue()
+
+
+def test_lossless_by_default() -> None:
+    """Without a tolerance every channel is written exactly, as the default conversion writes it."""
+    job = anim_job()
+    animation, pool_stats = export_anim.convert_anim(job, epsilon=0.0)
+
+    assert anim_file_bytes(animation) == anim_file_bytes(export_anim.convert_anim(job)[0])
+    assert pool_stats.size() == pool_stats.uncompressed_size()
+
+    for motion, bone_samples in zip(animation.motions, job.samples, strict=True):
+        bone_index = job.rest.bone_indices[bone_samples.bone_name]
+        translations = export_anim.convert_translations(job.rest, bone_index, bone_samples.locations)
+        rotations = export_anim.convert_rotations(job.rest, bone_index, bone_samples.rotations)
+
+        start = motion.position_offset * 3
+        assert animation.translations[start : start + FRAME_COUNT * 3].tobytes() == translations.tobytes()
+        start = motion.rotation_offset * 4
+        assert animation.rotations[start : start + FRAME_COUNT * 4].tobytes() == rotations.tobytes()
+
+
+def test_compression_within_tolerance() -> None:
+    """With a tolerance only channels within it of the rest pose are left out, and the others are still exact."""
+    job = anim_job()
+    lossless, _ = export_anim.convert_anim(job, epsilon=0.0)
+    animation, pool_stats = export_anim.convert_anim(job, epsilon=TOLERANCE)
+
+    assert pool_stats.size() < pool_stats.uncompressed_size()
+    assert [motion.bone_name for motion in animation.motions] == ["ROOT"]
+    assert animation.translations.tobytes() == lossless.translations[: FRAME_COUNT * 3].tobytes()
+    assert animation.rotations.tobytes() == lossless.rotations[: FRAME_COUNT * 4].tobytes()
+
+    # the channels that were left out are read back as the rest pose
+    pelvis = job.samples[1]
+    assert np.abs(pelvis.locations).max() <= TOLERANCE
+    assert np.abs(pelvis.rotations - np.array([1.0, 0.0, 0.0, 0.0])).max() <= TOLERANCE
+
+
+@pytest.mark.parametrize("thread_count", [1, 2])
+def test_anim_writer(tmp_path: pathlib.Path, thread_count: int) -> None:
+    """Files are recorded as written once they have been written, in the order they were queued."""
+    file_paths = [tmp_path / f"walk{index}.anim" for index in range(5)]
+
+    anim_writer = export_anim.AnimWriter(thread_count)
+    for file_path in file_paths:
+        anim_writer.write(anim_job(file_path))
+    anim_writer.finish()
+
+    assert anim_writer.written == file_paths
+    assert all(anim.read_compact_file(file_path).motions for file_path in file_paths)
+
+
+def test_anim_writer_abort(tmp_path: pathlib.Path) -> None:
+    """A failed write is raised by finish, and abort stops the threads without raising it again."""
+    anim_writer = export_anim.AnimWriter(2)
+    anim_writer.write(anim_job(tmp_path / "missing" / "walk.anim"))
+
+    with pytest.raises(FileNotFoundError):
+        anim_writer.finish()
+
+    anim_writer = export_anim.AnimWriter(2)
+    anim_writer.write(anim_job(tmp_path / "missing" / "walk.anim"))
+    anim_writer.abort()
+
+    assert anim_writer.written == []
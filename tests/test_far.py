@@ -0,0 +1,162 @@
+"""Tests of reading FAR archives and decompressing RefPack data."""
+
+import pathlib
+import struct
+
+import pytest
+
+from io_scene_tso import far
+from io_scene_tso import utils
+
+
+# one command of each kind, including a copy that overlaps the bytes it produces
+REFPACK_COMMANDS = (
+    b"\xe0abcd"  # 4 literals
+    b"\x01\x04e"  # 1 literal, then copy 3 bytes from 5 back
+    b"\x80\x80\x09fg"  # 2 literals, then copy 4 bytes from 10 back
+    b"\xc0\x00\x00\x01"  # copy 6 bytes from 1 back
+    b"\xfdz"  # 1 literal and stop
+)
+REFPACK_OUTPUT = b"abcdeabcfgabcd" + b"d" * 6 + b"z"
+
+
+def far_1_bytes(members: dict[str, bytes], *, long_name_lengths: bool) -> bytes:
+    """Build a FAR 1a archive, or a FAR 1b archive when name lengths are 32 bit."""
+    data = bytearray(far.FAR_SIGNATURE + bytes(8))
+    offsets = []
+    for member_data in members.values():
+        offsets.append(len(data))
+        data += member_data
+
+    directory_offset = len(data)
+    data += struct.pack('<I', len(members))
+    for (name, member_data), offset in zip(members.items(), offsets, strict=True):
+        data += struct.pack('<3I', len(member_data), len(member_data), offset)
+        data += struct.pack('<I' if long_name_lengths else '<H', len(name))
+        data += name.encode("ascii")
+
+    struct.pack_into('<2I', data, len(far.FAR_SIGNATURE), 1, directory_offset)
+    return bytes(data)
+
+
+def far_3_bytes(members: dict[str, tuple[bytes, int]]) -> bytes:
+    """Build a FAR 3 archive from the stored data and decompressed size of each member."""
+    data = bytearray(far.FAR_SIGNATURE + bytes(8))
+    offsets = []
+    for stored, _ in members.values():
+        offsets.append(len(data))
+        data += stored
+
+    directory_offset = len(data)
+    data += struct.pack('<I', len(members))
+    for (name, (stored, size)), offset in zip(members.items(), offsets, strict=True):
+        data_type = far.COMPRESSED_DATA_TYPE if len(stored) != size else 0
+        data += struct.pack('<IHBBI2xH', size, len(stored) & 0xFFFF, len(stored) >> 16, data_type, offset, len(name))
+        data += bytes(8)  # the type and file ids
+        data += name.encode("ascii")
+
+    struct.pack_into('<2I', data, len(far.FAR_SIGNATURE), 3, directory_offset)
+    return bytes(data)
+
+
+def refpack_member(commands: bytes, size: int) -> bytes:
+    """Build the stored data of a compressed FAR 3 member."""
+    stored_size = far.COMPRESSED_HEADER_SIZE + len(commands)
+    return struct.pack('<I', stored_size) + far.REFPACK_SIGNATURE + size.to_bytes(3, 'big') + commands
+
+
+@pytest.mark.parametrize("long_name_lengths", [False, True])
+def test_far_1(*, long_name_lengths: bool) -> None:
+    """FAR 1a and 1b directories are read, whichever size the name lengths have."""
+    members = {"a.skel": b"skeleton", "body.mesh": b"", "walk.anim": b"animation"}
+    archive = far.Archive("test.far", far_1_bytes(members, long_name_lengths=long_name_lengths))
+
+    assert [(entry.name, entry.size, entry.compressed) for entry in archive.entries.values()] == [
+        (name, len(member_data), False) for name, member_data in members.items()
+    ]
+    assert {member.name: member.read_bytes() for member in archive.members()} == members
+
+
+def test_far_3() -> None:
+    """FAR 3 members are read as they are stored, or decompressed when they are compressed."""
+    archive = far.Archive(
+        "test.dat",
+        far_3_bytes(
+            {
+                "a.skel": (b"skeleton", 8),
+                "walk.anim": (refpack_member(REFPACK_COMMANDS, len(REFPACK_OUTPUT)), len(REFPACK_OUTPUT)),
+            }
+        ),
+    )
+
+    assert [entry.compressed for entry in archive.entries.values()] == [False, True]
+    assert archive.member("a.skel").read_bytes() == b"skeleton"
+    assert archive.member("walk.anim").read_bytes() == REFPACK_OUTPUT
+    assert str(archive.member("walk.anim")) == "test.dat/walk.anim"
+
+    with pytest.raises(utils.FileReadError):
+        archive.member("missing.anim")
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"NOT!FAR!" + bytes(8),
+        far.FAR_SIGNATURE + struct.pack('<2I', 2, 16) + bytes(4),
+        far.FAR_SIGNATURE + struct.pack('<2I', 3, 16) + struct.pack('<I', 1000),
+        far.FAR_SIGNATURE + struct.pack('<2I', 1, 100),
+    ],
+)
+def test_invalid_far(data: bytes) -> None:
+    """Files that are not FAR archives, or have unsupported versions or directories, are not read."""
+    with pytest.raises(utils.FileReadError):
+        far.Archive("test.far", data)
+
+
+def test_member_outside_of_archive() -> None:
+    """Archives with members past the end of the file are not read."""
+    data = bytearray(far_1_bytes({"a.skel": b"skeleton"}, long_name_lengths=False))
+    struct.pack_into('<3I', data, 28, 8, 8, 1000)
+
+    with pytest.raises(utils.FileReadError):
+        far.Archive("test.far", bytes(data))
+
+
+def test_refpack_commands() -> None:
+    """Each kind of RefPack command copies its literals and earlier output, including overlapping copies."""
+    assert far.decompress_refpack(REFPACK_COMMANDS, len(REFPACK_OUTPUT)) == REFPACK_OUTPUT
+
+
+@pytest.mark.parametrize(
+    ("commands", "size"),
+    [
+        (b"\x01\x04e", 4),  # copies from before the start of the output
+        (b"\xe0abcd\xfc", 5),  # stops before producing the size
+    ],
+)
+def test_invalid_refpack(commands: bytes, size: int) -> None:
+    """RefPack data that copies from before its output, or does not decompress to its size, is not read."""
+    with pytest.raises(utils.FileReadError):
+        far.decompress_refpack(commands, size)
+
+
+def test_truncated_refpack_member() -> None:
+    """Compressed members whose commands end early are reported as read errors."""
+    stored = refpack_member(b"\xe0ab", 4)
+    archive = far.Archive("test.dat", far_3_bytes({"a.anim": (stored, 4)}))
+
+    with pytest.raises(utils.FileReadError):
+        archive.member("a.anim").read_bytes()
+
+
+def test_read_file_closes(tmp_path: pathlib.Path) -> None:
+    """Archive files are unmapped once closed, and loaded members can still be read afterwards."""
+    file_path = tmp_path / "test.dat"
+    file_path.write_bytes(far_3_bytes({"walk.anim": (refpack_member(REFPACK_COMMANDS, 21), 21)}))
+
+    with far.read_file(file_path) as archive:
+        member = archive.member("walk.anim")
+        member.load()
+
+    assert archive.data.closed
+    assert member.read_bytes() == REFPACK_OUTPUT
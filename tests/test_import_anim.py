@@ -0,0 +1,52 @@
+"""Tests of importing anim files."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("bpy")
+
+from io_scene_tso import import_anim
+from io_scene_tso import resample
+
+
+@pytest.mark.parametrize(("time", "frame"), [(0, 1), (16, 1), (17, 2), (50, 3), (150, 6), (250, 9), (1000, 31)])
+def test_event_frame(time: int, frame: int) -> None:
+    """Without resampling, events are placed on the frames they were always imported on, with ties rounded up."""
+    assert import_anim.event_frame(time) == round(time / 33.333333) + 1 == frame
+
+
+def test_resampled_event_frame() -> None:
+    """Resampled events are placed on the nearest frame of the scene frame rate."""
+    frame_time = resample.frame_time(60.0)
+
+    assert import_anim.event_frame(100, frame_time) == 7
+    assert import_anim.event_frame(1000, frame_time) == 61
+
+
+def test_reduce_straight_line() -> None:
+    """Values on a straight line are reduced to the first and last frames."""
+    values = np.linspace(-1.0, 2.0, 50)
+
+    assert import_anim.reduce_keyframes(values, 0.0001).tolist() == [0, 49]
+
+
+@pytest.mark.parametrize("error", [0.0, 0.001, 0.01, 0.1, 1.0])
+def test_reduce_within_error(error: float) -> None:
+    """Interpolating between the kept frames stays within the error of every value, and keeps both ends."""
+    values = np.cumsum(np.random.default_rng(7).normal(0.0, 0.05, 200))
+
+    kept = import_anim.reduce_keyframes(values, error)
+
+    assert kept[0] == 0
+    assert kept[-1] == len(values) - 1
+    assert np.all(np.diff(kept) > 0)
+    assert np.abs(np.interp(np.arange(len(values)), kept, values[kept]) - values).max() <= error
+
+
+@pytest.mark.parametrize(
+    ("values", "frames"),
+    [([], []), ([1.0], [0]), ([1.0, 5.0], [0, 1]), ([3.0, 3.0, 3.0], [0, 2])],
+)
+def test_reduce_keeps_ends(values: list[float], frames: list[int]) -> None:
+    """The first and last frames are kept, even when there are too few frames to reduce."""
+    assert import_anim.reduce_keyframes(np.array(values), 0.5).tolist() == frames
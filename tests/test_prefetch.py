@@ -0,0 +1,58 @@
+"""Tests of reading files ahead of importing them."""
+
+import concurrent.futures
+import pathlib
+import typing
+
+from io_scene_tso import prefetch
+from io_scene_tso import utils
+
+
+def test_read_ahead(tmp_path: pathlib.Path) -> None:
+    """Files are yielded in order, and only the ones with the suffixes are read, whatever their case."""
+    file_paths: list[utils.FilePath] = []
+    for name in ("a.mesh", "B.MESH", "c.anim", "d.far"):
+        file_path = tmp_path / name
+        file_path.write_bytes(name.encode("ascii"))
+        file_paths.append(file_path)
+    file_paths.append(tmp_path / "missing.mesh")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        files = list(prefetch.read_ahead(executor, file_paths, suffixes=(".mesh",), lookahead=2))
+
+    assert [file.name for file in files] == [file_path.name for file_path in file_paths]
+    assert [isinstance(file, prefetch.PrefetchedFile) for file in files] == [True, True, False, False, False]
+    assert files[1].path == file_paths[1]
+    assert files[1].data == b"B.MESH"
+
+
+class ImmediateExecutor(concurrent.futures.Executor):
+    """An executor that runs each call as it is submitted, so the files read ahead are known at every step."""
+
+    def __init__(self) -> None:
+        """Create an executor that has not run anything."""
+        self.submitted: list[object] = []
+
+    def submit(self, fn: typing.Callable, /, *args: object, **kwargs: object) -> concurrent.futures.Future:
+        """Run a call and return its finished future."""
+        self.submitted.append(args[0])
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+def test_read_ahead_byte_limit(tmp_path: pathlib.Path) -> None:
+    """No more files are started while the files read but not yet yielded take max_bytes or more."""
+    file_paths: list[utils.FilePath] = []
+    for name in ("a.mesh", "b.mesh", "c.mesh", "d.mesh"):
+        file_path = tmp_path / name
+        file_path.write_bytes(bytes(8))
+        file_paths.append(file_path)
+
+    executor = ImmediateExecutor()
+    submitted_counts = [
+        len(executor.submitted)
+        for _ in prefetch.read_ahead(executor, file_paths, suffixes=(".mesh",), lookahead=4, max_bytes=10)
+    ]
+
+    assert submitted_counts == [2, 3, 4, 4]
@@ -0,0 +1,13 @@
+"""Tests of resampling motions between frame rates."""
+
+import numpy as np
+
+from io_scene_tso import resample
+
+
+def test_anim_frame_rate_is_not_resampled() -> None:
+    """A scene at the frame rate imports set is at the frame time of anim files, so nothing is resampled."""
+    assert resample.frame_time(resample.TSO_FPS) == resample.TSO_FRAME_TIME
+
+    positions = resample.sample_positions(10, resample.TSO_FRAME_TIME, resample.frame_time(resample.TSO_FPS))
+    np.testing.assert_array_equal(positions, np.arange(10))
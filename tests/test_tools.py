@@ -0,0 +1,36 @@
+"""Tests of the command line tools."""
+
+import json
+import pathlib
+import pytest
+
+from io_scene_tso import tools
+
+import tso_files
+
+
+def test_validate_well_formed_skel(tmp_path: pathlib.Path, capsys: pytest.CaptureFixture) -> None:
+    """A skel whose root bone has the parent NULL is valid."""
+    skel_path = tmp_path / "adult.skel"
+    skel_path.write_bytes(tso_files.skel_bytes())
+
+    assert tools.validate(skel_path) == {"path": str(skel_path), "valid": True, "issues": []}
+
+    assert tools.main(["--jobs", "1", "validate", str(skel_path)]) == 0
+    assert json.loads(capsys.readouterr().out)["valid"]
+
+
+def test_validate_skel_with_missing_parent(tmp_path: pathlib.Path) -> None:
+    """A bone whose parent is not in the skel is reported."""
+    skel_path = tmp_path / "adult.skel"
+    skel_path.write_bytes(tso_files.skel_bytes().replace(b"\x06PELVIS\x04ROOT", b"\x06PELVIS\x04HEAD"))
+
+    assert tools.validate(skel_path)["issues"] == ["Bone PELVIS has a parent HEAD which does not exist"]
+
+
+def test_validate_well_formed_mesh_and_anim(tmp_path: pathlib.Path) -> None:
+    """The mesh and anim the other tests start from are valid."""
+    for name, data in (("body.mesh", tso_files.mesh_bytes()), ("walk.anim", tso_files.anim_bytes())):
+        file_path = tmp_path / name
+        file_path.write_bytes(data)
+        assert tools.validate(file_path)["valid"], name
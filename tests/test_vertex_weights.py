@@ -0,0 +1,79 @@
+"""Tests of limiting vertex weights to what mesh files can store."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("bpy")
+
+from io_scene_tso import vertex_weights
+
+
+GROUP_NAMES = ["A", "B", "C", "Other"]
+IS_BONE = np.array([True, True, True, False])
+
+
+def weights(elements: list[tuple[int, int, float]]) -> vertex_weights.Weights:
+    """Build weights from (vertex, group, weight) elements."""
+    vertex_indices, group_indices, element_weights = zip(*elements, strict=True)
+    return vertex_weights.Weights(
+        np.array(vertex_indices, dtype=np.int32),
+        np.array(group_indices, dtype=np.int32),
+        np.array(element_weights, dtype=np.float32),
+    )
+
+
+WEIGHTS = weights(
+    [
+        (0, 0, 0.5),
+        (0, 1, 0.3),
+        (0, 2, 0.2),
+        (1, 0, 1.0),
+        (2, 1, 0.2),
+        (2, 3, 0.9),
+        (2, 2, 0.2),
+        (3, 0, 0.0),
+    ]
+)
+
+
+def test_limit_influences_renormalizes() -> None:
+    """Normalizing keeps the two largest bone weights of each vertex and scales them to add up to 1."""
+    influences, report = vertex_weights.limit_influences(
+        WEIGHTS,
+        4,
+        np.ones(4, dtype=bool),
+        IS_BONE,
+        GROUP_NAMES,
+        normalize=True,
+    )
+
+    assert influences.primary_groups == [0, 0, 1, -1]
+    assert influences.secondary_groups == [1, -1, 2, -1]
+    assert influences.secondary_weights == pytest.approx([0.3 / 0.8, 0.0, 0.5, 0.0])
+    assert report.non_bone_groups == ["Other"]
+    assert report.pruned_vertex_count == 1
+    assert report.renormalized_vertex_count == 2
+    assert report.zero_weight_count == 1
+    assert report.unweighted_vertex_count == 1
+
+
+def test_limit_influences_without_normalizing() -> None:
+    """Without normalizing, vertices keep their first two groups and weights, and every problem is reported."""
+    influences, report = vertex_weights.limit_influences(
+        WEIGHTS,
+        4,
+        np.array([True, True, True, False]),
+        IS_BONE,
+        GROUP_NAMES,
+        normalize=False,
+    )
+
+    assert influences.primary_groups == [0, 0, 1, 0]
+    assert influences.secondary_groups == [1, -1, 3, -1]
+    assert influences.secondary_weights == pytest.approx([0.3, 0.0, 0.9, 0.0])
+    assert report.pruned_vertex_count == 2
+    assert report.renormalized_vertex_count == 0
+    assert report.errors("body", normalize=False) == [
+        "Vertex groups Other of body are not bones in its armature",
+        "2 vertices of body are in more than 2 vertex groups",
+    ]
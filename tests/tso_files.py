@@ -0,0 +1,82 @@
+"""Build small well-formed skel, mesh and anim files for the tests."""
+
+import array
+import io
+import struct
+
+from io_scene_tso import anim
+from io_scene_tso import mesh
+from io_scene_tso import utils
+
+
+def skel_bytes() -> bytes:
+    """Build a skel with a root bone and a child bone, with a property list on the child."""
+    file = io.BytesIO()
+    file.write(struct.pack('>I', 1))
+    utils.write_string(file, "adult")
+    file.write(struct.pack('>H', 2))
+
+    for name, parent, property_lists in (
+        ("ROOT", "NULL", []),
+        ("PELVIS", "ROOT", [utils.PropertyList([utils.Property("tag", "pelvis")])]),
+    ):
+        file.write(struct.pack('>I', 1))
+        utils.write_string(file, name)
+        utils.write_string(file, parent)
+        file.write(struct.pack('B', len(property_lists) != 0))
+        if property_lists:
+            utils.write_property_lists(file, property_lists)
+        file.write(struct.pack('<3f', 0.0, 1.0, 0.0))
+        file.write(struct.pack('<4f', 0.0, 0.0, 0.0, 1.0))
+        file.write(struct.pack('>3I', 1, 1, 0))
+        file.write(struct.pack('<2f', 0.0, 0.0))
+
+    return file.getvalue()
+
+
+def mesh_bytes() -> bytes:
+    """Build a mesh with one triangle bound to one bone, and one blended vertex."""
+    vertices = [mesh.Vertex((0.0, 0.0, 0.0), (0.0, 1.0, 0.0)) for _ in range(3)]
+    mesh_data = mesh.Mesh(
+        ["ROOT", "PELVIS"],
+        [(0, 1, 2)],
+        [mesh.BoneBinding(1, 0, 3, 0, 1)],
+        [(0.0, 0.0), (1.0, 0.0), (0.0, 1.0)],
+        [mesh.Blend(0x4000, 0)],
+        vertices,
+        [mesh.Vertex((0.0, 0.0, 0.0), (0.0, 1.0, 0.0))],
+    )
+    file = io.BytesIO()
+    mesh.write_mesh(file, mesh_data)
+    return file.getvalue()
+
+
+def anim_bytes(*, rotation_offset: int = 0) -> bytes:
+    """Build an anim with one motion of three frames and an event."""
+    motion = anim.Motion(
+        "PELVIS",
+        3,
+        100.0,
+        uses_positions=True,
+        uses_rotations=True,
+        position_offset=0,
+        rotation_offset=rotation_offset,
+        property_lists=[],
+        time_property_lists=[
+            anim.TimePropertyList(
+                [anim.TimeProperty(33, [utils.PropertyList([utils.Property("footstep", "left")])])],
+            ),
+        ],
+    )
+    animation = anim.CompactAnim(
+        name="walk",
+        duration=100.0,
+        distance=0.0,
+        moves=False,
+        translations=array.array('f', [0.0, 1.0, 0.0] * 3),
+        rotations=array.array('f', [0.0, 0.0, 0.0, 1.0] * 3),
+        motions=[motion],
+    )
+    file = io.BytesIO()
+    anim.write_compact_anim(file, animation)
+    return file.getvalue()